@@ -6,14 +6,18 @@ from . import errors
 from . import log
 from . import value
 from .cmd_line_util import *
+from .counter_exporter import *
 from .file_util import *
+from .shared_counter_store import *
 from .time_util import *
 from .uid_util import *
 from .worker_thread import *
 
 __all__ = (('errors', 'log', 'value') +
            cmd_line_util.__all__ +
+           counter_exporter.__all__ +
            file_util.__all__ +
+           shared_counter_store.__all__ +
            time_util.__all__ +
            uid_util.__all__ +
            worker_thread.__all__)
@@ -17,6 +17,12 @@ ARG_CMD_LINE_CONFIG = "cmd-line-config"
 #: Argument section name in config file
 JF_CMD_LINE_ARGUMENTS = "arguments"
 
+#: Values of bool switches
+_BOOL_VALUES = {
+  "" : True, "1" : True, "true" : True, "yes" : True, "on" : True,
+  "0" : False, "false" : False, "no" : False, "off" : False,
+}
+
 #
 # Parses a command line and returns array of arrguments
 #
@@ -78,6 +84,22 @@ class CommandLine :
 
     return result
 
+  def get_switch_as_bool(self, name, default = False) -> bool :
+    """
+      Return switch as bool, a switch without value is True
+
+      :return: bool, default if there is no switch or None if it's invalid
+    """
+    if name not in self._switches :
+      return default
+
+    # Switches of config file can be json values
+    value = self._switches[name]
+    if isinstance(value, bool) :
+      return value
+
+    return _BOOL_VALUES.get(str(value).lower())
+
   @property
   def arguments(self) -> list :
     """ The switches of the command line """
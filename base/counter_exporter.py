@@ -0,0 +1,231 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module includes periodic export of activity counters into files
+"""
+
+import datetime
+import json
+import os
+import sys
+import threading
+
+from .errors import *
+from .file_util import *
+from .log import *
+from .worker_thread import *
+
+# Export
+__all__ = ('ActivityCounterExporter',)
+
+#: Extension of export files
+_EXPORT_FILE_EXT = ".counters.jsonl"
+
+# Json names
+_JSON_NAME_TIME = "time"
+_JSON_NAME_PID = "pid"
+_JSON_NAME_INTERVAL = "interval"
+_JSON_NAME_COUNTERS = "counters"
+_JSON_NAME_COUNTER = "counter"
+_JSON_NAME_ERROR_COUNTER = "error_counter"
+_JSON_NAME_TIMEOUT_COUNTER = "timeout_counter"
+_JSON_NAME_TOTAL_TIME = "total_time"
+_JSON_NAME_HISTOGRAM = "histogram"
+_JSON_NAME_IN_FLIGHT = "in_flight"
+
+#
+# Class ActivityCounterExporter
+#
+class ActivityCounterExporter (WorkerThread) :
+  """
+    Thread writes delta snapshots of all activity counters
+
+    Every ``export_interval`` seconds a line of compact json is appended to
+    a file in ``export_path`` (the log path by default). The line contains
+    only counters which have been changed since the previous snapshot.
+    A new file is started when the current one exceeds ``file_max_size``.
+
+    :param export_interval: interval between snapshots in seconds
+    :type export_interval: float
+    :param export_path: directory of export files
+    :type export_path: string
+    :param file_max_size: maximal size of an export file (-1 - unlimited)
+    :type file_max_size: int
+  """
+  def __init__(self, export_interval = 60.0, export_path = None,
+               file_max_size = 16 * 1024**2) :
+    WorkerThread.__init__(self, 0, 1, "ActivityCounterExporter")
+
+    self._export_interval = export_interval
+    self._export_path = export_path
+    self._file_max_size = file_max_size
+    self._file = None
+    self._file_name = None
+    self._file_size = 0
+    self._previous = dict()
+    self._previous_time = None
+    self._stop_event = threading.Event()
+
+  def stopping(self) :
+    WorkerThread.stopping(self)
+    self._stop_event.set()
+
+  def stop(self) :
+    """ Stop thread, the last snapshot is written before that """
+    self.stopping()
+    self.join()
+
+  def run(self) :
+    WorkerThread.run(self)
+
+    # Write the last snapshot
+    if self._file is not None :
+      self.export()
+      self._file.close()
+      self._file = None
+
+  def do_work(self) :
+    if self._file is None and err_failure(self._open_file()) :
+      return False
+
+    if self._stop_event.wait(self._export_interval) :
+      return False
+
+    self.export()
+    return True
+
+  def export(self) :
+    """ Write a delta snapshot of counters """
+    now = datetime.datetime.now(tz = datetime.timezone.utc)
+    snapshot = dict()
+    current = dict()
+    for name in ActivityCounter.get_all_counter_names() :
+      counter = ActivityCounter.get(name)
+      if counter is None :
+        continue
+
+      if isinstance(name, tuple) :
+        name = "/".join([ str(item) for item in name ])
+
+      counter.expire()
+      values = (counter.counter, counter.error_counter,
+                counter.timeout_counter,
+                counter.time_counter.total_seconds()
+                if counter.is_count_time() else None,
+                tuple(counter.histogram) if counter.is_count_time() else None)
+      current[name] = values
+      in_flight = counter.in_flight
+      delta = self._get_delta(self._previous.get(name), values)
+      if delta is None and in_flight == 0 :
+        continue
+
+      delta = delta or dict()
+      if in_flight > 0 :
+        delta[_JSON_NAME_IN_FLIGHT] = in_flight
+
+      snapshot[name] = delta
+
+    line = dict()
+    line[_JSON_NAME_TIME] = "{:%Y-%m-%d %H:%M:%S}.{:06d}{:%z}".format(
+        now, now.microsecond, now)
+    line[_JSON_NAME_PID] = os.getpid()
+    if self._previous_time is not None :
+      line[_JSON_NAME_INTERVAL] = (now - self._previous_time).total_seconds()
+
+    line[_JSON_NAME_COUNTERS] = snapshot
+    self._previous = current
+    self._previous_time = now
+    return self._write_line(
+        json.dumps(line, separators = (",", ":")).encode("utf-8") + b"\n")
+
+  @property
+  def export_interval(self) :
+    """ Interval between snapshots in seconds """
+    return self._export_interval
+
+  @property
+  def file_name(self) :
+    """ Current export file """
+    return self._file_name
+
+  def _get_delta(self, previous, current) :
+    if previous == current :
+      return None
+
+    if previous is None :
+      previous = (0, 0, 0, 0.0 if current[3] is not None else None,
+                  (0,) * len(current[4]) if current[4] is not None else None)
+
+    result = dict()
+    if current[0] != previous[0] :
+      result[_JSON_NAME_COUNTER] = current[0] - previous[0]
+
+    if current[1] != previous[1] :
+      result[_JSON_NAME_ERROR_COUNTER] = current[1] - previous[1]
+
+    if current[2] != previous[2] :
+      result[_JSON_NAME_TIMEOUT_COUNTER] = current[2] - previous[2]
+
+    if current[3] is not None and current[3] != previous[3] :
+      result[_JSON_NAME_TOTAL_TIME] = round(current[3] - previous[3], 9)
+
+    if current[4] is not None and current[4] != previous[4] :
+      result[_JSON_NAME_HISTOGRAM] = [
+          current_item - previous_item
+          for current_item, previous_item in zip(current[4], previous[4]) ]
+
+    return result if len(result) > 0 else None
+
+  def _open_file(self) :
+    export_path = self._export_path
+    if export_path is None or len(export_path) == 0 :
+      export_path = get_log_path()
+
+    if len(export_path) == 0 :
+      error = Error(errObjNotInit, "Export path isn't set")
+      log_print_err("Counters can't be exported", error_code = error)
+      return error
+
+    file_name = os.path.join(
+        export_path,
+        create_unique_file_name(
+            os.path.basename(sys.argv[0]), "%016x" % os.getpid(),
+            _EXPORT_FILE_EXT))
+    try :
+      os.makedirs(export_path, exist_ok = True)
+      self._file = open(file_name, "ab")
+    except :
+      error = Error(errCannotWriteFile, sys.exc_info()[1])
+      log_print_err("Opening file failed - {}", file_name, error_code = error)
+      return error
+
+    self._file_name = file_name
+    self._file_size = 0
+    log_print_inf("Counters are exported into file: {}", file_name)
+    return Error(errOk)
+
+  def _write_line(self, line) :
+    if self._file is None :
+      return Error(errObjNotInit, "Export file isn't opened")
+
+    if self._file_max_size != -1 and self._file_size > 0 and \
+       self._file_size + len(line) > self._file_max_size :
+      self._file.close()
+      self._file = None
+      error = self._open_file()
+      if err_failure(error) :
+        return error
+
+    try :
+      self._file.write(line)
+      self._file.flush()
+    except :
+      error = Error(errCannotWriteFile, sys.exc_info()[1])
+      log_print_err("Writing file failed - {}", self._file_name,
+                    error_code = error)
+      return error
+
+    self._file_size += len(line)
+    return Error(errOk)
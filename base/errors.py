@@ -104,10 +104,11 @@ class Error :
       self._module_name = error_code._module_name
       self._module_line = error_code._module_line
     elif self._error_code != errOk :
-      frame_info = inspect.getouterframes(inspect.currentframe())[1]
-      if not frame_info is None :
-        self._module_name = frame_info.filename
-        self._module_line = frame_info.lineno
+      # Only the caller's frame is needed, the stack isn't walked
+      frame = inspect.currentframe().f_back
+      if not frame is None :
+        self._module_name = frame.f_code.co_filename
+        self._module_line = frame.f_lineno
 
   def __bool__(self) :
     return err_success(self)
@@ -213,7 +214,9 @@ errMethodNotImplemented = NetErrorBaseNumber - 0x6         #: Error: Method hasn
 errMethodNotSupported = NetErrorBaseNumber - 0x7           #: Error: Method isn't supported (0x1007)
 errNotSupportUrl = NetErrorBaseNumber - 0x4                #: Error: Don't support URL (0x1004)
 errRequestFailed = NetErrorBaseNumber - 0x5                #: Error: Error occurs during url's requesting (0x1005)
-NetErrorLastNumber = NetErrorBaseNumber - 0xc              #: Error: Net error last number (0x100c)
+errServiceUnavailable = NetErrorBaseNumber - 0xc           #: Error: Service is overloaded (0x100c)
+errTooManyRequests = NetErrorBaseNumber - 0xd              #: Error: Rate limit of client is exceeded (0x100d)
+NetErrorLastNumber = NetErrorBaseNumber - 0xe              #: Error: Net error last number (0x100e)
 
 # DB error
 DBErrorBaseNumber = NetErrorBaseNumber - ErrorStepSize #: DB error base number (0x2000)
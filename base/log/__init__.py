@@ -5,7 +5,11 @@
 from .log import *
 from .log_util import *
 from .activity_counter import *
+from .activity_timing import *
+from .prometheus_util import *
 
 __all__ = (activity_counter.__all__ +
+           activity_timing.__all__ +
            log.__all__ +
-           log_util.__all__)
+           log_util.__all__ +
+           prometheus_util.__all__)
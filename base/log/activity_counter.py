@@ -2,14 +2,36 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
+import bisect
 import datetime
+import itertools
+import os
+import threading
+import time
 
 from ..errors import *
 from ..value import *
+from .activity_timing import *
 from .log_util import *
 
 # Export
-__all__ = ('ActivityCounter',)
+__all__ = ('ActivityCounter', 'DEFAULT_MAX_AGE', 'HISTOGRAM_BUCKETS',
+           'WINDOW_SIZE')
+
+#: Upper bounds of the time histogram buckets (in seconds)
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                     1.0, 2.5, 5.0, 10.0)
+
+#: Size of the window of recent calls
+WINDOW_SIZE = datetime.timedelta(seconds = 60)
+
+#: Default maximal age of a started call (in seconds)
+DEFAULT_MAX_AGE = 3600.0
+
+# Internal representation of the constants in nanoseconds
+_HISTOGRAM_BUCKETS_NS = \
+    tuple([ int(bound * 1e9) for bound in HISTOGRAM_BUCKETS ])
+_WINDOW_SIZE_NS = WINDOW_SIZE // datetime.timedelta(microseconds = 1) * 1000
 
 # Json names
 _JSON_NAME_STARTED_AT = "started_at"
@@ -19,17 +41,32 @@ _JSON_NAME_LAST_CALLED_AT = "last_called_at"
 _JSON_NAME_TOTAL_TIME = "total_time"
 _JSON_NAME_MIN_TIME = "min_time"
 _JSON_NAME_MAX_TIME = "max_time"
+_JSON_NAME_WINDOW = "window"
+_JSON_NAME_WINDOW_SIZE = "size"
+_JSON_NAME_IN_FLIGHT = "in_flight"
+_JSON_NAME_OLDEST_AGE = "oldest_age"
+_JSON_NAME_TIMEOUT_COUNTER = "timeout_counter"
+
+#
+# Help functions
+#
+def _ns_to_timedelta(ns) :
+  return datetime.timedelta(microseconds = ns / 1000)
+
+def _format_time(time) :
+  return "{:%Y-%m-%d %H:%M:%S}.{:06d}{:%z}".format(time, time.microsecond, time)
 
 class ActivityCounter :
   __create_key = object()
   __counters = dict()
 
   @classmethod
-  def add(cls, name, count_time_flag = True, count_error_flag = False) :
+  def add(cls, name, count_time_flag = True, count_error_flag = False,
+          max_age = DEFAULT_MAX_AGE) :
     counter = cls.__counters.get(name)
     if counter is None :
       cls.__counters[name] = cls(
-          cls.__create_key, name, count_time_flag, count_error_flag)
+          cls.__create_key, name, count_time_flag, count_error_flag, max_age)
 
     return cls.__counters.get(name)
 
@@ -61,95 +98,216 @@ class ActivityCounter :
   def stop(cls, name, id = "", error_flag = False) :
     item = cls.__counters.get(name)
     if item is not None :
-      return item.stop(id)
+      return item.stop(id, error_flag)
 
     return False
 
+  @classmethod
+  def _reinit_after_fork(cls) :
+    """ Recreate locks of counters which could be held by another thread """
+    for counter in cls.__counters.values() :
+      counter.__items_lock = threading.Lock()
+
   @staticmethod
   def now() :
     return datetime.datetime.now(tz = datetime.timezone.utc)
 
   def __init__(
       self, create_key, name, count_time_flag = True,
-      count_error_flag = False) :
+      count_error_flag = False, max_age = DEFAULT_MAX_AGE) :
     assert(create_key == ActivityCounter.__create_key), \
         "ActivityCounter objects must be created using ActivityCounter.add"
+    # Started calls: id -> start time (ns), ordered by start time. They are
+    # expired by exporters in other threads, so they're changed under lock.
     self.__items = dict()
+    self.__items_lock = threading.Lock()
     self.__started_at = ActivityCounter.now()
-    self.__last_called_at = None
+    self.__started_at_ns = time.monotonic_ns()
+    self.__last_called_at_ns = None
     self.__name = name
     self.__count_time_flag = count_time_flag
     self.__count_error_flag = count_error_flag
+    self.__id_sequence = itertools.count()
+    self.__max_age_ns = int(max_age * 1e9) if max_age is not None else None
+    self.__next_expire_ns = None
     self.__counter = 0
     self.__error_counter = 0
-    self.__time_counter = datetime.timedelta() if count_time_flag else None
+    self.__timeout_counter = 0
+    self.__time_counter = 0 if count_time_flag else None
     self.__min_time = None
     self.__max_time = None
+    self.__histogram = \
+        [ 0 ] * (len(HISTOGRAM_BUCKETS) + 1) if count_time_flag else None
+    # Current window and the last completed one
+    self.__window_end = self.__started_at_ns + _WINDOW_SIZE_NS
+    self.__window = [ 0, 0, 0 ]
+    self.__last_window = [ 0, 0, 0 ]
+
+  def begin(self) :
+    """ Start a call with a generated id and return the id """
+    id = next(self.__id_sequence)
+    self.start(id)
+    return id
+
+  def scope(self) :
+    """ Return a context manager counting a call """
+    return ActivityScope(self)
 
   def start(self, id = "") :
-    item = self.__items.get(id)
-    if item is not None :
-      return False
+    with self.__items_lock :
+      if id in self.__items :
+        return False
+
+      now = time.monotonic_ns()
+      if self.__next_expire_ns is not None and now >= self.__next_expire_ns :
+        self.__expire(now)
 
-    class ItemMock :
-      pass
+      self.__items[id] = now
+      if self.__next_expire_ns is None and self.__max_age_ns is not None :
+        self.__next_expire_ns = now + self.__max_age_ns
 
-    item = ItemMock()
-    item.started_at = ActivityCounter.now() if self.__count_time_flag else None
-    self.__items[id] = item
     return True
 
   def stop(self, id = "", error_flag = False) :
-    item = self.__items.pop(id, None)
-    if item is None :
+    with self.__items_lock :
+      started_at = self.__items.pop(id, None)
+
+    if started_at is None :
       return False
 
-    self.__counter += 1
-    self.__last_called_at = ActivityCounter.now()
-    if self.__count_time_flag and item.started_at is not None :
-      time_delta = self.__last_called_at - item.started_at
-      self.__time_counter += time_delta
-      if self.__min_time is None :
-        self.__min_time = time_delta
-        self.__max_time = time_delta
-      else :
-        self.__min_time = min([ self.__min_time, time_delta ])
-        self.__max_time = max([ self.__max_time, time_delta ])
+    self.__count(time.monotonic_ns(), started_at, error_flag)
+    return True
+
+  def record(self, time_delta_ns, error_flag = False) :
+    """ Count a call which has taken time_delta_ns nanoseconds """
+    now = time.monotonic_ns()
+    self.__count(now, now - time_delta_ns, error_flag)
 
+  def increment(self, error_flag = False) :
+    """ Count an instant event, its time isn't counted """
+    now = time.monotonic_ns()
+    self.__counter += 1
+    self.__last_called_at_ns = now
+    self.__roll_window(now)
+    self.__window[0] += 1
     if self.__count_error_flag and error_flag :
       self.__error_counter += 1
+      self.__window[1] += 1
 
-    del item
-    return True
+  def expire(self) :
+    """ Drop started calls which are older than max age, it's thread-safe """
+    with self.__items_lock :
+      self.__expire(time.monotonic_ns())
+
+  def is_count_error(self) :
+    return self.__count_error_flag
 
   def is_count_time(self) :
     return self.__count_time_flag
 
   def get_as_value(self) :
     result = Value(dict())
-    result[_JSON_NAME_STARTED_AT] = Value(
-        "{:%Y-%m-%d %H:%M:%S}.{:06d}{:%z}".format(
-            self.__started_at, self.__started_at.microsecond,
-            self.__started_at))
+    result[_JSON_NAME_STARTED_AT] = Value(_format_time(self.__started_at))
     result[_JSON_NAME_COUNTER] = Value(self.__counter)
 
-    if self.__last_called_at is not None :
-      result[_JSON_NAME_LAST_CALLED_AT] = Value(
-          "{:%Y-%m-%d %H:%M:%S}.{:06d}{:%z}".format(
-              self.__last_called_at, self.__last_called_at.microsecond,
-              self.__last_called_at))
+    last_called_at = self.last_called_at
+    if last_called_at is not None :
+      result[_JSON_NAME_LAST_CALLED_AT] = Value(_format_time(last_called_at))
 
     if self.__count_time_flag :
-      result[_JSON_NAME_TOTAL_TIME] = Value(self.__time_counter.total_seconds())
+      result[_JSON_NAME_TOTAL_TIME] = Value(self.__time_counter / 1e9)
       if self.__min_time is not None :
-        result[_JSON_NAME_MIN_TIME] = Value(self.__min_time.total_seconds())
-        result[_JSON_NAME_MAX_TIME] = Value(self.__max_time.total_seconds())
+        result[_JSON_NAME_MIN_TIME] = Value(self.__min_time / 1e9)
+        result[_JSON_NAME_MAX_TIME] = Value(self.__max_time / 1e9)
 
     if self.__count_error_flag :
       result[_JSON_NAME_ERROR_COUNTER] = Value(self.__error_counter)
 
+    self.expire()
+    result[_JSON_NAME_IN_FLIGHT] = Value(self.in_flight)
+    oldest_age = self.oldest_age
+    if oldest_age is not None :
+      result[_JSON_NAME_OLDEST_AGE] = Value(oldest_age.total_seconds())
+
+    if self.__max_age_ns is not None :
+      result[_JSON_NAME_TIMEOUT_COUNTER] = Value(self.__timeout_counter)
+
+    counter, error_counter, time_counter = self.last_window
+    window = Value(dict())
+    window[_JSON_NAME_WINDOW_SIZE] = Value(WINDOW_SIZE.total_seconds())
+    window[_JSON_NAME_COUNTER] = Value(counter)
+    if self.__count_time_flag :
+      window[_JSON_NAME_TOTAL_TIME] = Value(time_counter.total_seconds())
+
+    if self.__count_error_flag :
+      window[_JSON_NAME_ERROR_COUNTER] = Value(error_counter)
+
+    result[_JSON_NAME_WINDOW] = window
     return result
 
+  def __count(self, now, started_at, error_flag) :
+    self.__counter += 1
+    self.__last_called_at_ns = now
+    self.__roll_window(now)
+    self.__window[0] += 1
+    if self.__count_time_flag :
+      time_delta = now - started_at
+      self.__time_counter += time_delta
+      if self.__min_time is None :
+        self.__min_time = time_delta
+        self.__max_time = time_delta
+      elif time_delta < self.__min_time :
+        self.__min_time = time_delta
+      elif time_delta > self.__max_time :
+        self.__max_time = time_delta
+
+      self.__histogram[
+          bisect.bisect_left(_HISTOGRAM_BUCKETS_NS, time_delta)] += 1
+      self.__window[2] += time_delta
+
+    if self.__count_error_flag and error_flag :
+      self.__error_counter += 1
+      self.__window[1] += 1
+
+  def __expire(self, now) :
+    """ Expire started calls, it's called under lock of items """
+    if self.__max_age_ns is None :
+      return
+
+    # Items are ordered by start time so expired ones are at the beginning
+    oldest_allowed = now - self.__max_age_ns
+    expired = list()
+    for id, started_at in self.__items.items() :
+      if started_at > oldest_allowed :
+        break
+
+      expired.append(id)
+
+    for id in expired :
+      del self.__items[id]
+
+    self.__timeout_counter += len(expired)
+    if len(self.__items) > 0 :
+      self.__next_expire_ns = \
+          next(iter(self.__items.values())) + self.__max_age_ns
+    else :
+      self.__next_expire_ns = None
+
+  def __roll_window(self, now) :
+    if now < self.__window_end :
+      return
+
+    # The current window is over. If the next one is over too then nothing
+    # has been called during the last completed window.
+    if now < self.__window_end + _WINDOW_SIZE_NS :
+      self.__last_window = self.__window
+    else :
+      self.__last_window = [ 0, 0, 0 ]
+
+    self.__window = [ 0, 0, 0 ]
+    windows_passed = (now - self.__window_end) // _WINDOW_SIZE_NS + 1
+    self.__window_end += _WINDOW_SIZE_NS * windows_passed
+
   @property
   def started_at(self) :
     return self.__started_at
@@ -158,18 +316,82 @@ class ActivityCounter :
   def name(self) :
     return self.__name
 
+  @property
+  def error_counter(self) :
+    return self.__error_counter
+
+  @property
+  def histogram(self) :
+    """ Call counts by HISTOGRAM_BUCKETS, the last item is for +Inf """
+    return self.__histogram
+
+  @property
+  def in_flight(self) :
+    """ Number of started but not stopped calls """
+    return len(self.__items)
+
+  @property
+  def last_called_at(self) :
+    if self.__last_called_at_ns is None :
+      return None
+
+    return self.__started_at + _ns_to_timedelta(
+        self.__last_called_at_ns - self.__started_at_ns)
+
+  @property
+  def last_window(self) :
+    """ (counter, error counter, time counter) of the last completed window """
+    self.__roll_window(time.monotonic_ns())
+    counter, error_counter, time_counter = self.__last_window
+    return counter, error_counter, _ns_to_timedelta(time_counter)
+
+  @property
+  def max_age(self) :
+    """ Maximal age of a started call in seconds (None - unlimited) """
+    if self.__max_age_ns is None :
+      return None
+
+    return self.__max_age_ns / 1e9
+
+  @property
+  def oldest_age(self) :
+    """ Age of the oldest started call """
+    with self.__items_lock :
+      if len(self.__items) == 0 :
+        return None
+
+      oldest_started_at = next(iter(self.__items.values()))
+
+    return _ns_to_timedelta(time.monotonic_ns() - oldest_started_at)
+
   @property
   def counter(self) :
     return self.__counter
 
   @property
   def time_counter(self) :
-    return self.__time_counter
+    if self.__time_counter is None :
+      return None
+
+    return _ns_to_timedelta(self.__time_counter)
+
+  @property
+  def timeout_counter(self) :
+    """ Number of started calls which have been dropped by max age """
+    return self.__timeout_counter
 
   @property
   def min_time(self) :
-    return self.__min_time
+    if self.__min_time is None :
+      return None
+
+    return _ns_to_timedelta(self.__min_time)
 
   @property
   def max_time(self) :
-    return self.__max_time
+    if self.__max_time is None :
+      return None
+
+    return _ns_to_timedelta(self.__max_time)
+
+os.register_at_fork(after_in_child = ActivityCounter._reinit_after_fork)
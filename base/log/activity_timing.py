@@ -0,0 +1,124 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module includes context managers and decorators counting calls by
+  activity counters
+"""
+
+import inspect
+
+from functools import wraps
+from ..errors import *
+
+# Export
+__all__ = ('ActivityScope', 'activity_scope', 'count_activity')
+
+#
+# Class ActivityScope
+#
+class ActivityScope :
+  """
+    Context manager counts a call by the activity counter
+
+    It can be used by ``with`` and ``async with`` statements. The call is
+    counted as failed if an exception (including cancellation) leaves the
+    block or if ``error_flag`` has been set inside it.
+
+    :param counter: activity counter or None (nothing is counted)
+    :type counter: ActivityCounter
+  """
+  __slots__ = ('_counter', '_id', 'error_flag')
+
+  def __init__(self, counter) :
+    self._counter = counter
+    self._id = None
+    self.error_flag = False
+
+  def __enter__(self) :
+    if self._counter is not None :
+      self._id = self._counter.begin()
+
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback) :
+    if self._counter is not None :
+      self._counter.stop(self._id, self.error_flag or exc_type is not None)
+
+    return False
+
+  async def __aenter__(self) :
+    return self.__enter__()
+
+  async def __aexit__(self, exc_type, exc_value, traceback) :
+    return self.__exit__(exc_type, exc_value, traceback)
+
+  @property
+  def counter(self) :
+    """ Activity counter """
+    return self._counter
+
+#
+# Function activity_scope
+#
+def activity_scope(counter) :
+  """ Return a context manager counting a call by the counter """
+  return ActivityScope(counter)
+
+#
+# Decorator count_activity
+#
+# Example:
+# @count_activity(counter)
+# async def my_func(...) :
+#   ...
+#
+def count_activity(counter) :
+  """
+    Decorator counts calls of function by the activity counter
+
+    The call is counted as failed if the function raises an exception or
+    returns a failed Error (or a tuple beginning with it).
+  """
+  def wrapper(func) :
+    if counter is None :
+      return func
+
+    if inspect.iscoroutinefunction(func) :
+      @wraps(func)
+      async def wrapped(*args, **kwargs) :
+        id = counter.begin()
+        error_flag = True
+        try :
+          result = await func(*args, **kwargs)
+          error_flag = _is_failed_result(result)
+          return result
+        finally :
+          counter.stop(id, error_flag)
+
+      return wrapped
+
+    @wraps(func)
+    def wrapped(*args, **kwargs) :
+      id = counter.begin()
+      error_flag = True
+      try :
+        result = func(*args, **kwargs)
+        error_flag = _is_failed_result(result)
+        return result
+      finally :
+        counter.stop(id, error_flag)
+
+    return wrapped
+
+  return wrapper
+
+#
+# Help functions
+#
+def _is_failed_result(result) :
+  if isinstance(result, tuple) and len(result) > 0 :
+    result = result[0]
+
+  return isinstance(result, Error) and err_failure(result)
@@ -92,6 +92,26 @@ def _update_log_file() :
     _log_file.write(bytes(
         "***** Previous file: {} *****\n\n".format(previous_name), "utf-8"))
 
+#
+# Reinitializes logging system in a forked process
+#
+def _reinit_log_after_fork() :
+  global _log_file
+  global _log_lock
+
+  if _log_lock is None :
+    return
+
+  # The lock could be held by another thread of the parent
+  _log_lock = threading.RLock()
+
+  # The child writes into own file
+  if _log_file is not None :
+    _log_file = None
+    _update_log_file()
+
+os.register_at_fork(after_in_child = _reinit_log_after_fork)
+
 #
 # Initializes logging system
 #
@@ -121,7 +121,8 @@ def log_print(level, msg, *args, error_code = None, exec_time = 0.0,
               without_prefix = False, out_frame_index = 1, **kwargs) :
   global _log_file_size
 
-  if log._log_lock is None :
+  # Check level without the lock, the message is dropped more often
+  if log._log_lock is None or level > log._log_level :
     return False
 
   with log._log_lock :
@@ -209,6 +210,9 @@ def log_async_function_body() :
   def wrapper(func) :
     @wraps(func)
     async def wrapped(*args, **kwargs) :
+      if log._log_level < log.LOG_LEVEL_VERBOSE :
+        return await func(*args, **kwargs)
+
       begin_time = datetime.datetime.now()
       func_id = "{:%Y%m%d%H%M%S}-{:06d}".format(begin_time,
                                                 begin_time.microsecond)
@@ -237,6 +241,9 @@ def log_async_function_body() :
 def log_function_body(func) :
   @wraps(func)
   def wrapper(*args, **kwargs) :
+    if log._log_level < log.LOG_LEVEL_VERBOSE :
+      return func(*args, **kwargs)
+
     begin_time = datetime.datetime.now()
     log_print_vrb("Function begin - {}", func.__qualname__, out_frame_index = 1)
     result = func(*args, **kwargs)
@@ -0,0 +1,149 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module includes exposition of activity counters in Prometheus text format
+"""
+
+from .activity_counter import *
+
+# Export
+__all__ = ('PROMETHEUS_CONTENT_TYPE', 'get_counters_as_prometheus')
+
+#: Content type of Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#: Prefix of metric names
+_METRIC_PREFIX = "activity_counter"
+
+#
+# Function get_counters_as_prometheus
+#
+def get_counters_as_prometheus(owner = None) :
+  """
+    Return activity counters in Prometheus text exposition format
+
+    :param owner: if it is set then only counters of the owner (web-server or
+                  db-connector UID) are returned
+    :rtype: string
+  """
+  counters = list()
+  for name in ActivityCounter.get_all_counter_names() :
+    counter = ActivityCounter.get(name)
+    if counter is None :
+      continue
+
+    if isinstance(name, tuple) :
+      if len(name) == 0 or owner is not None and name[0] != owner :
+        continue
+
+      labels = "owner=\"{}\",counter=\"{}\"".format(
+          _escape_label_value(name[0]),
+          _escape_label_value("/".join([ str(item) for item in name[1:] ])))
+    else :
+      if owner is not None :
+        continue
+
+      labels = "counter=\"{}\"".format(_escape_label_value(name))
+
+    counter.expire()
+    counters.append((labels, counter, counter.last_window))
+
+  lines = list()
+  _add_family(
+      lines, "calls_total", "counter", "Number of completed calls",
+      [ (labels, counter.counter) for labels, counter, _ in counters ])
+  _add_family(
+      lines, "errors_total", "counter", "Number of failed calls",
+      [ (labels, counter.error_counter)
+        for labels, counter, _ in counters if counter.is_count_error() ])
+  _add_family(
+      lines, "timeouts_total", "counter",
+      "Number of started calls which have been dropped by max age",
+      [ (labels, counter.timeout_counter)
+        for labels, counter, _ in counters if counter.max_age is not None ])
+  _add_family(
+      lines, "in_flight", "gauge", "Number of started but not stopped calls",
+      [ (labels, counter.in_flight) for labels, counter, _ in counters ])
+  _add_family(
+      lines, "oldest_in_flight_seconds", "gauge",
+      "Age of the oldest started call",
+      [ (labels, counter.oldest_age.total_seconds())
+        for labels, counter, _ in counters if counter.in_flight > 0 ])
+  _add_family(
+      lines, "last_called_at_seconds", "gauge",
+      "Unix time of the last completed call",
+      [ (labels, counter.last_called_at.timestamp())
+        for labels, counter, _ in counters
+        if counter.last_called_at is not None ])
+
+  timed = [ item for item in counters if item[1].is_count_time() ]
+  if len(timed) > 0 :
+    _add_header(lines, "seconds", "histogram", "Duration of calls")
+    for labels, counter, _ in timed :
+      _add_histogram(lines, labels, counter)
+
+  _add_family(
+      lines, "min_seconds", "gauge", "Minimal duration of a call",
+      [ (labels, counter.min_time.total_seconds())
+        for labels, counter, _ in timed if counter.min_time is not None ])
+  _add_family(
+      lines, "max_seconds", "gauge", "Maximal duration of a call",
+      [ (labels, counter.max_time.total_seconds())
+        for labels, counter, _ in timed if counter.max_time is not None ])
+
+  window_help = " during the last {:g} seconds window".format(
+      WINDOW_SIZE.total_seconds())
+  _add_family(
+      lines, "window_calls", "gauge", "Number of calls" + window_help,
+      [ (labels, window[0]) for labels, _, window in counters ])
+  _add_family(
+      lines, "window_errors", "gauge", "Number of failed calls" + window_help,
+      [ (labels, window[1])
+        for labels, counter, window in counters if counter.is_count_error() ])
+  _add_family(
+      lines, "window_seconds", "gauge", "Total duration of calls" + window_help,
+      [ (labels, window[2].total_seconds()) for labels, _, window in timed ])
+
+  lines.append("")
+  return "\n".join(lines)
+
+#
+# Help functions
+#
+def _escape_label_value(value) :
+  return str(value).replace("\\", "\\\\").replace("\"", "\\\"").\
+      replace("\n", "\\n")
+
+def _format_number(value) :
+  return "{:d}".format(value) if isinstance(value, int) else repr(value)
+
+def _add_header(lines, name, metric_type, help) :
+  lines.append("# HELP {}_{} {}".format(_METRIC_PREFIX, name, help))
+  lines.append("# TYPE {}_{} {}".format(_METRIC_PREFIX, name, metric_type))
+
+def _add_family(lines, name, metric_type, help, samples) :
+  if len(samples) == 0 :
+    return
+
+  _add_header(lines, name, metric_type, help)
+  for labels, value in samples :
+    lines.append("{}_{}{{{}}} {}".format(
+        _METRIC_PREFIX, name, labels, _format_number(value)))
+
+def _add_histogram(lines, labels, counter) :
+  cumulative = 0
+  histogram = counter.histogram
+  for index, bound in enumerate(HISTOGRAM_BUCKETS) :
+    cumulative += histogram[index]
+    lines.append("{}_seconds_bucket{{{},le=\"{:g}\"}} {:d}".format(
+        _METRIC_PREFIX, labels, bound, cumulative))
+
+  cumulative += histogram[-1]
+  lines.append("{}_seconds_bucket{{{},le=\"+Inf\"}} {:d}".format(
+      _METRIC_PREFIX, labels, cumulative))
+  lines.append("{}_seconds_sum{{{}}} {}".format(
+      _METRIC_PREFIX, labels, repr(counter.time_counter.total_seconds())))
+  lines.append("{}_seconds_count{{{}}} {:d}".format(
+      _METRIC_PREFIX, labels, cumulative))
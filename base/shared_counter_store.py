@@ -0,0 +1,341 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module includes a store of activity counters in shared memory
+
+  Several processes publish their counters into own regions of one shared
+  memory block, any process can aggregate the counters of all of them
+  without IPC round-trips.
+"""
+
+import datetime
+import os
+import struct
+import threading
+import time
+
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+from .errors import *
+from .log import *
+from .value import *
+from .worker_thread import *
+
+# Export
+__all__ = ('SharedCounterStore', 'SharedCounterPublisher')
+
+#
+# Memory layout
+#
+# Header: magic, maximal number of workers, maximal number of counters
+_HEADER = struct.Struct("<8sII")
+_MAGIC = b"PUCNTR01"
+# Worker region header: sequence, pid, published at (unix time), counters
+_REGION_HEADER = struct.Struct("<QqdI4x")
+# Counter slot: name, counter, error counter, timeout counter, total time,
+# minimal time, maximal time (ns), in flight
+_NAME_SIZE = 192
+_SLOT = struct.Struct("<{:d}sqqqqqqq".format(_NAME_SIZE))
+
+# Json names
+_JSON_NAME_WORKERS = "__workers__"
+_JSON_NAME_COUNTER = "counter"
+_JSON_NAME_ERROR_COUNTER = "error_counter"
+_JSON_NAME_TIMEOUT_COUNTER = "timeout_counter"
+_JSON_NAME_TOTAL_TIME = "total_time"
+_JSON_NAME_MIN_TIME = "min_time"
+_JSON_NAME_MAX_TIME = "max_time"
+_JSON_NAME_IN_FLIGHT = "in_flight"
+
+#: Number of attempts to read a region which is being written
+_READ_ATTEMPTS = 100
+
+#
+# Class SharedCounterStore
+#
+class SharedCounterStore :
+  """
+    Store of activity counters in shared memory
+
+    The store is created once (``create = True``) usually by the parent
+    process before forking workers. Every worker attaches to its region by
+    ``attach(worker_index)`` and publishes its counters by ``publish``. Names
+    of counters which belong to an owner (web-server or db-connector) contain
+    its UID which is different in every process, so the UID is replaced by
+    an alias set by ``set_owner_alias``. Counters of owners without alias
+    keep the UID, so they aren't mixed up with counters of other owners, but
+    they aren't aggregated across workers.
+
+    :param name: name of shared memory block (None - generate on creation)
+    :type name: string
+    :param create: flag of creating a new block
+    :type create: bool
+    :param max_workers: maximal number of worker processes
+    :type max_workers: int
+    :param max_counters: maximal number of counters of one worker
+    :type max_counters: int
+  """
+  def __init__(self, name = None, create = False, max_workers = 16,
+               max_counters = 1024) :
+    self._worker_index = None
+    self._slots = dict()
+    self._owner_aliases = dict()
+    if create :
+      self._memory = shared_memory.SharedMemory(
+          name, True,
+          _HEADER.size +
+          max_workers * _get_region_size(max_counters))
+      _HEADER.pack_into(self._memory.buf, 0, _MAGIC, max_workers, max_counters)
+    else :
+      self._memory = shared_memory.SharedMemory(name)
+      # The block isn't owned by this process so it mustn't be unlinked
+      # by the resource tracker at exit
+      resource_tracker.unregister(self._memory._name, "shared_memory")
+      magic, max_workers, max_counters = \
+          _HEADER.unpack_from(self._memory.buf, 0)
+      if magic != _MAGIC :
+        self._memory.close()
+        raise ValueError("Shared memory '{}' isn't a counter store".format(
+            name))
+
+    self._max_workers = max_workers
+    self._max_counters = max_counters
+    self._region_size = _get_region_size(max_counters)
+
+  def attach(self, worker_index) :
+    """ Attach the process to its region and clear it """
+    if worker_index < 0 or worker_index >= self._max_workers :
+      error = Error(errInvalidParameter,
+                    "Worker index is out of range ({})".format(worker_index))
+      log_print_err(None, error_code = error)
+      return error
+
+    self._worker_index = worker_index
+    self._slots = dict()
+    offset = self._get_region_offset(worker_index)
+    self._memory.buf[offset : offset + self._region_size] = \
+        bytes(self._region_size)
+    _REGION_HEADER.pack_into(self._memory.buf, offset, 0, os.getpid(), 0.0, 0)
+    return Error(errOk)
+
+  def close(self) :
+    """ Close the block in the process """
+    self._memory.close()
+
+  def unlink(self) :
+    """ Destroy the block, it has to be called by the creator """
+    self._memory.unlink()
+
+  def set_owner_alias(self, uid, alias) :
+    """ Set an alias published instead of the owner UID """
+    self._owner_aliases[uid] = alias
+
+  def publish(self) :
+    """ Write counters of the process into its region """
+    if self._worker_index is None :
+      return Error(errObjNotInit, "Store isn't attached to a worker region")
+
+    buffer = self._memory.buf
+    offset = self._get_region_offset(self._worker_index)
+    sequence = _REGION_HEADER.unpack_from(buffer, offset)[0]
+    # Odd sequence means the region is being written
+    _REGION_HEADER.pack_into(
+        buffer, offset, sequence + 1, os.getpid(), time.time(),
+        len(self._slots))
+    error = Error(errOk)
+    for name in ActivityCounter.get_all_counter_names() :
+      counter = ActivityCounter.get(name)
+      if counter is None :
+        continue
+
+      name = self._get_published_name(name)
+      slot = self._slots.get(name)
+      if slot is None :
+        if len(self._slots) >= self._max_counters :
+          error = Error(wrnObjNotSaved, "Too many counters")
+          continue
+
+        slot = len(self._slots)
+        self._slots[name] = slot
+
+      counter.expire()
+      _SLOT.pack_into(
+          buffer,
+          offset + _REGION_HEADER.size + slot * _SLOT.size,
+          name.encode("utf-8")[:_NAME_SIZE],
+          counter.counter, counter.error_counter, counter.timeout_counter,
+          _to_ns(counter.time_counter), _to_ns(counter.min_time, -1),
+          _to_ns(counter.max_time, -1), counter.in_flight)
+
+    _REGION_HEADER.pack_into(
+        buffer, offset, sequence + 2, os.getpid(), time.time(),
+        len(self._slots))
+    return error
+
+  def get_counters(self) :
+    """
+      Return counters aggregated across all workers
+
+      :return: dictionary: name -> [ counter, error counter, timeout counter,
+               total time, minimal time, maximal time (ns), in flight ]
+               and number of workers
+    """
+    result = dict()
+    workers = 0
+    for worker_index in range(self._max_workers) :
+      slots = self._read_region(worker_index)
+      if slots is None :
+        continue
+
+      workers += 1
+      for name, counter, error_counter, timeout_counter, total_time, \
+          min_time, max_time, in_flight in slots :
+        item = result.get(name)
+        if item is None :
+          result[name] = [ counter, error_counter, timeout_counter,
+                           total_time, min_time, max_time, in_flight ]
+          continue
+
+        item[0] += counter
+        item[1] += error_counter
+        item[2] += timeout_counter
+        item[3] += total_time
+        if min_time != -1 :
+          item[4] = min_time if item[4] == -1 else min(item[4], min_time)
+          item[5] = max(item[5], max_time)
+
+        item[6] += in_flight
+
+    return result, workers
+
+  def get_counters_as_value(self) :
+    """ Return counters aggregated across all workers as Value """
+    counters, workers = self.get_counters()
+    result = Value(dict())
+    result[_JSON_NAME_WORKERS] = Value(workers)
+    for name, item in counters.items() :
+      counter = Value(dict())
+      counter[_JSON_NAME_COUNTER] = Value(item[0])
+      counter[_JSON_NAME_ERROR_COUNTER] = Value(item[1])
+      counter[_JSON_NAME_TIMEOUT_COUNTER] = Value(item[2])
+      counter[_JSON_NAME_TOTAL_TIME] = Value(item[3] / 1e9)
+      if item[4] != -1 :
+        counter[_JSON_NAME_MIN_TIME] = Value(item[4] / 1e9)
+        counter[_JSON_NAME_MAX_TIME] = Value(item[5] / 1e9)
+
+      counter[_JSON_NAME_IN_FLIGHT] = Value(item[6])
+      result.set_path(name.split("/"), counter)
+
+    return result
+
+  @property
+  def max_counters(self) :
+    return self._max_counters
+
+  @property
+  def max_workers(self) :
+    return self._max_workers
+
+  @property
+  def name(self) :
+    """ Name of shared memory block """
+    return self._memory.name
+
+  @property
+  def worker_index(self) :
+    return self._worker_index
+
+  def _get_published_name(self, name) :
+    if not isinstance(name, tuple) :
+      return str(name)
+
+    if len(name) > 0 and name[0] in self._owner_aliases :
+      name = (self._owner_aliases[name[0]],) + name[1:]
+
+    return "/".join([ str(item) for item in name ])
+
+  def _get_region_offset(self, worker_index) :
+    return _HEADER.size + worker_index * self._region_size
+
+  def _read_region(self, worker_index) :
+    buffer = self._memory.buf
+    offset = self._get_region_offset(worker_index)
+    for attempt in range(_READ_ATTEMPTS) :
+      sequence, pid, published_at, count = \
+          _REGION_HEADER.unpack_from(buffer, offset)
+      if pid == 0 :
+        return None
+
+      if sequence % 2 == 1 :
+        time.sleep(0)
+        continue
+
+      slots = list()
+      for slot in range(min(count, self._max_counters)) :
+        item = _SLOT.unpack_from(
+            buffer, offset + _REGION_HEADER.size + slot * _SLOT.size)
+        slots.append(
+            (item[0].rstrip(b"\0").decode("utf-8", "ignore"),) + item[1:])
+
+      if _REGION_HEADER.unpack_from(buffer, offset)[0] == sequence :
+        return slots
+
+    log_print_wrn("Region of worker {} is busy", worker_index)
+    return None
+
+#
+# Class SharedCounterPublisher
+#
+class SharedCounterPublisher (WorkerThread) :
+  """
+    Thread publishes counters of the process into the store periodically
+
+    :param store: attached store
+    :type store: SharedCounterStore
+    :param publish_interval: interval of publishing in seconds
+    :type publish_interval: float
+  """
+  def __init__(self, store, publish_interval = 1.0) :
+    WorkerThread.__init__(self, 0, 1, "SharedCounterPublisher")
+
+    self._store = store
+    self._publish_interval = publish_interval
+    self._stop_event = threading.Event()
+
+  def stopping(self) :
+    WorkerThread.stopping(self)
+    self._stop_event.set()
+
+  def stop(self) :
+    """ Stop thread, counters are published before that """
+    self.stopping()
+    self.join()
+
+  def run(self) :
+    WorkerThread.run(self)
+    self._store.publish()
+
+  def do_work(self) :
+    if self._stop_event.wait(self._publish_interval) :
+      return False
+
+    self._store.publish()
+    return True
+
+  @property
+  def store(self) :
+    return self._store
+
+#
+# Help functions
+#
+def _get_region_size(max_counters) :
+  return _REGION_HEADER.size + max_counters * _SLOT.size
+
+def _to_ns(time_delta, default = 0) :
+  if time_delta is None :
+    return default
+
+  return time_delta // datetime.timedelta(microseconds = 1) * 1000
@@ -0,0 +1,10 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Benchmarks of the web-server
+
+  Benchmarks are run as modules of the package, for example:
+  ``python -m python_utilities.benchmark.web_server_scaling``
+"""
@@ -0,0 +1,141 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module includes common functions of benchmarks
+"""
+
+import aiohttp
+import asyncio
+import itertools
+import multiprocessing
+import time
+
+from ..base.errors import *
+from ..net.api_session import *
+
+# Export
+__all__ = ('ARG_CLIENTS', 'ARG_CONCURRENCY', 'ARG_DURATION', 'ARG_HOST',
+           'ARG_PORT', 'echo_session_factory', 'get_percentile',
+           'run_clients')
+
+#
+# Command line argument names
+#
+ARG_CLIENTS = "clients"
+ARG_CONCURRENCY = "concurrency"
+ARG_DURATION = "duration"
+ARG_HOST = "host"
+ARG_PORT = "port"
+
+#: Request body
+_REQUEST_BODY = b"{\"echo\":{\"text\":\"Hello, world!\"}}"
+
+#: Request content type
+_REQUEST_CONTENT_TYPE = "application/json; api_version=1"
+
+#
+# Web-server with echo function
+#
+async def _echo(session, arguments) :
+  return Error(errOk), arguments
+
+async def echo_session_factory(web_server, request) :
+  """ Session factory of web-server with ApiSession function 'echo' """
+  return ApiSession(web_server, 1, "api", { "echo" : _echo }, dict())
+
+#
+# Client
+#
+async def _load(url, concurrency, duration, body, rate) :
+  latencies = list()
+  error_counter = 0
+  deadline = time.monotonic() + duration
+  connector = aiohttp.TCPConnector(limit = concurrency)
+  async with aiohttp.ClientSession(connector = connector) as session :
+    async def send(begin_time) :
+      nonlocal error_counter
+      try :
+        async with session.post(
+            url, data = body,
+            headers = { "Content-Type" : _REQUEST_CONTENT_TYPE }) \
+            as response :
+          await response.read()
+          if response.status == 200 :
+            latencies.append(time.monotonic() - begin_time)
+          else :
+            error_counter += 1
+      except aiohttp.ClientError :
+        error_counter += 1
+
+    async def worker() :
+      while True :
+        begin_time = time.monotonic()
+        if begin_time >= deadline :
+          break
+
+        await send(begin_time)
+
+    if rate is None :
+      await asyncio.gather(*[ worker() for i in range(concurrency) ])
+      return latencies, error_counter
+
+    # Requests are sent on schedule, latency is counted from the scheduled
+    # time, so waiting for a free connection is counted too
+    tasks = list()
+    begin_time = time.monotonic()
+    for index in itertools.count() :
+      scheduled_time = begin_time + index / rate
+      if scheduled_time >= deadline :
+        break
+
+      delay = scheduled_time - time.monotonic()
+      if delay > 0 :
+        await asyncio.sleep(delay)
+
+      tasks.append(asyncio.ensure_future(send(scheduled_time)))
+
+    await asyncio.gather(*tasks)
+
+  return latencies, error_counter
+
+def _run_client(url, concurrency, duration, body, rate) :
+  return asyncio.run(_load(url, concurrency, duration, body, rate))
+
+def run_clients(url, clients, concurrency, duration, body = _REQUEST_BODY,
+                rate = None) :
+  """
+    Load url by requests from client processes
+
+    Every client keeps ``concurrency`` requests in flight, or if ``rate`` is
+    set then clients send ``rate`` requests per second in total by at most
+    ``concurrency`` connections of a client.
+
+    :return: sorted latencies of successful requests and number of failed
+             requests
+  """
+  client_rate = rate / clients if rate is not None else None
+  context = multiprocessing.get_context("spawn")
+  with context.Pool(clients) as pool :
+    results = pool.starmap(
+        _run_client,
+        [ (url, concurrency, duration, body, client_rate) ] * clients)
+
+  latencies = list()
+  error_counter = 0
+  for client_latencies, client_error_counter in results :
+    latencies.extend(client_latencies)
+    error_counter += client_error_counter
+
+  latencies.sort()
+  return latencies, error_counter
+
+def get_percentile(sorted_values, percent) :
+  """ Return percentile of sorted values """
+  if len(sorted_values) == 0 :
+    return 0.0
+
+  index = min(len(sorted_values) - 1,
+              int(len(sorted_values) * percent / 100.0))
+  return sorted_values[index]
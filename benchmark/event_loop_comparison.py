@@ -0,0 +1,67 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Benchmark compares asyncio and uvloop event loops of web-server
+
+  Web-server with an echo ApiSession function is run with every event loop
+  and is loaded by client processes. Requests per second and latency
+  percentiles are printed.
+
+  Example:
+  ``python -m python_utilities.benchmark.event_loop_comparison``
+"""
+
+import time
+
+from ..base.cmd_line_util import *
+from ..base.errors import *
+from ..net.web_server import *
+from .bench_util import *
+
+#
+# Benchmark
+#
+def run_benchmark(use_uvloop, host, port, clients, concurrency, duration) :
+  """ Return requests per second, sorted latencies and number of errors """
+  result = run_web_server(host, port, echo_session_factory,
+                          use_uvloop = use_uvloop)
+  if err_failure(result) :
+    return None, None, None
+
+  uvloop_used = WebServer.web_server().uvloop_used
+  latencies, error_counter = run_clients(
+      "http://{}:{}/api".format(host, port), clients, concurrency, duration)
+  stop_web_server()
+  if use_uvloop and not uvloop_used :
+    return None, None, None
+
+  return len(latencies) / duration, latencies, error_counter
+
+def main() :
+  cmd_line = CommandLine()
+  clients = cmd_line.get_switch_as_int(ARG_CLIENTS, 2)
+  concurrency = cmd_line.get_switch_as_int(ARG_CONCURRENCY, 32)
+  duration = cmd_line.get_switch_as_int(ARG_DURATION, 10)
+  host = cmd_line.get_switch(ARG_HOST, "127.0.0.1")
+  port = cmd_line.get_switch_as_int(ARG_PORT, 8080)
+
+  print("{:>8} {:>12} {:>10} {:>10} {:>8}".format(
+      "loop", "rps", "p50, ms", "p99, ms", "errors"))
+  for name, use_uvloop in (("asyncio", False), ("uvloop", True)) :
+    rps, latencies, error_counter = run_benchmark(
+        use_uvloop, host, port, clients, concurrency, duration)
+    if rps is None :
+      print("{:>8} {:>12}".format(name, "unavailable"))
+      continue
+
+    print("{:>8} {:>12.1f} {:>10.3f} {:>10.3f} {:>8d}".format(
+        name, rps, get_percentile(latencies, 50) * 1000,
+        get_percentile(latencies, 99) * 1000, error_counter))
+
+    # Let the port be released
+    time.sleep(0.5)
+
+if __name__ == "__main__" :
+  main()
@@ -0,0 +1,250 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Load test of web-server with ApiSession
+
+  Web-server is run with ApiSession functions of typical load:
+
+  * ``echo`` - returns arguments
+  * ``sleep`` - waits for ``--sleep-ms`` milliseconds
+  * ``cpu`` - hashes a buffer ``--cpu-rounds`` times
+  * ``db`` - executes a query by a mock DB-connector which answers
+    ``--db-rows`` rows in ``--db-latency-ms`` milliseconds
+
+  Client processes call the function of ``--function`` and keep
+  ``--concurrency`` requests in flight, or send ``--rate`` requests per
+  second in total. Requests per second and latency percentiles are printed
+  and are saved to json file of ``--output`` with the commit of the package,
+  so results of commits can be compared.
+
+  Example:
+  ``python -m python_utilities.benchmark.load_test --function=sleep
+  --rate=2000 --output=load_test.json``
+"""
+
+import asyncio
+import datetime
+import hashlib
+import os
+import platform
+import subprocess
+import time
+
+from ..base.cmd_line_util import *
+from ..base.errors import *
+from ..base.uid_util import *
+from ..base.value import *
+from ..net.api_session import *
+from ..net.web_server import *
+from .bench_util import *
+
+#
+# Command line argument names
+#
+ARG_FUNCTION = "function"
+ARG_RATE = "rate"
+ARG_OUTPUT = "output"
+ARG_SLEEP_MS = "sleep-ms"
+ARG_CPU_ROUNDS = "cpu-rounds"
+ARG_DB_ROWS = "db-rows"
+ARG_DB_LATENCY_MS = "db-latency-ms"
+
+#: Percentiles of latency
+_PERCENTILES = (50, 90, 99, 99.9)
+
+#: Buffer hashed by function 'cpu'
+_CPU_BUFFER = b"x" * 1024
+
+#
+# Class _MockDBConnector
+#
+class _MockDBConnector :
+  """
+    DB-connector answers queries by generated rows after a delay, it has the
+    interface of DBConnector without its database drivers
+  """
+  def __init__(self) :
+    self._uid = create_uid()
+
+  async def deinit(self) :
+    return Error(errOk)
+
+  async def execute(self, query) :
+    await asyncio.sleep(query["latency_ms"] / 1000.0)
+    return Error(errOk), [ { "id" : index, "name" : "row {}".format(index) }
+                           for index in range(query["rows"]) ]
+
+  async def init(self) :
+    return Error(errOk)
+
+  @property
+  def uid(self) :
+    return self._uid
+
+#
+# ApiSession functions
+#
+async def _echo(session, arguments) :
+  return Error(errOk), arguments
+
+async def _sleep(session, arguments) :
+  await asyncio.sleep(arguments["ms"].value / 1000.0)
+  return Error(errOk), Value(dict())
+
+async def _cpu(session, arguments) :
+  digest = _CPU_BUFFER
+  for index in range(arguments["rounds"].value) :
+    digest = hashlib.sha256(digest).digest()
+
+  return Error(errOk), Value({ "digest" : Value(digest.hex()) })
+
+async def _db(session, arguments) :
+  error, rows = await session.web_server.db.execute({
+      "rows" : arguments["rows"].value,
+      "latency_ms" : arguments["latency_ms"].value })
+  if err_failure(error) :
+    return error, None
+
+  return Error(errOk), Value(
+      [ Value({ name : Value(value) for name, value in row.items() })
+        for row in rows ])
+
+_FUNCTION_MAP = {
+  "echo" : _echo,
+  "sleep" : _sleep,
+  "cpu" : _cpu,
+  "db" : _db,
+}
+
+async def _load_test_session_factory(web_server, request) :
+  return ApiSession(web_server, 1, "api", _FUNCTION_MAP)
+
+#
+# Benchmark
+#
+def _make_request_body(function, cmd_line) :
+  """ Return request body calling the function """
+  if function == "sleep" :
+    arguments = "{{\"ms\":{}}}".format(
+        cmd_line.get_switch_as_int(ARG_SLEEP_MS, 10))
+  elif function == "cpu" :
+    arguments = "{{\"rounds\":{}}}".format(
+        cmd_line.get_switch_as_int(ARG_CPU_ROUNDS, 1000))
+  elif function == "db" :
+    arguments = "{{\"rows\":{},\"latency_ms\":{}}}".format(
+        cmd_line.get_switch_as_int(ARG_DB_ROWS, 10),
+        cmd_line.get_switch_as_int(ARG_DB_LATENCY_MS, 2))
+  else :
+    arguments = "{\"text\":\"Hello, world!\"}"
+
+  return "{{\"{}\":{}}}".format(function, arguments).encode("utf-8")
+
+def _get_commit() :
+  """ Return commit of the package or None """
+  try :
+    return subprocess.run(
+        [ "git", "rev-parse", "--short", "HEAD" ],
+        cwd = os.path.dirname(os.path.abspath(__file__)),
+        stdout = subprocess.PIPE, stderr = subprocess.DEVNULL,
+        check = True).stdout.decode("ascii").strip()
+  except :
+    return None
+
+def run_load_test(function, body, workers, host, port, clients, concurrency,
+                  rate, duration) :
+  """ Return result of load test as Value or None if web-server failed """
+  result = run_web_server(
+      host, port, _load_test_session_factory,
+      db = _MockDBConnector if function == "db" else None,
+      workers = workers)
+  if err_failure(result) :
+    return None
+
+  # Let worker processes bind the port
+  time.sleep(1.0)
+  latencies, error_counter = run_clients(
+      "http://{}:{}/api".format(host, port), clients, concurrency, duration,
+      body, rate)
+  stop_web_server()
+
+  result = Value(dict())
+  result["function"] = Value(function)
+  result["workers"] = Value(workers)
+  result["clients"] = Value(clients)
+  result["concurrency"] = Value(concurrency)
+  if rate is not None :
+    result["rate"] = Value(float(rate))
+
+  result["duration"] = Value(duration)
+  result["requests"] = Value(len(latencies))
+  result["errors"] = Value(error_counter)
+  result["rps"] = Value(len(latencies) / duration)
+  latency = Value(dict())
+  if len(latencies) > 0 :
+    latency["mean"] = Value(sum(latencies) / len(latencies))
+    latency["max"] = Value(latencies[-1])
+
+  for percent in _PERCENTILES :
+    latency["p{:g}".format(percent)] = \
+        Value(get_percentile(latencies, percent))
+
+  result["latency"] = latency
+  return result
+
+def main() :
+  cmd_line = CommandLine()
+  function = cmd_line.get_switch(ARG_FUNCTION, "echo")
+  if function not in _FUNCTION_MAP :
+    print("Unknown function '{}', functions: {}".format(
+        function, ", ".join(_FUNCTION_MAP.keys())))
+    return
+
+  rate = cmd_line.get_switch(ARG_RATE)
+  result = run_load_test(
+      function, _make_request_body(function, cmd_line),
+      cmd_line.get_switch_as_int(ARG_WORKERS, 1),
+      cmd_line.get_switch(ARG_HOST, "127.0.0.1"),
+      cmd_line.get_switch_as_int(ARG_PORT, 8080),
+      cmd_line.get_switch_as_int(ARG_CLIENTS, 2),
+      cmd_line.get_switch_as_int(ARG_CONCURRENCY, 32),
+      float(rate) if rate is not None else None,
+      cmd_line.get_switch_as_int(ARG_DURATION, 10))
+  if result is None :
+    print("Web-server failed")
+    return
+
+  latency = result["latency"]
+  print("{:>10} {:>12} {:>8} {:>10} {:>10} {:>10} {:>10}".format(
+      "function", "rps", "errors", "p50, ms", "p90, ms", "p99, ms",
+      "p99.9, ms"))
+  print("{:>10} {:>12.1f} {:>8d} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}"
+        .format(function, result["rps"].value, result["errors"].value,
+                latency["p50"].value * 1e3, latency["p90"].value * 1e3,
+                latency["p99"].value * 1e3, latency["p99.9"].value * 1e3))
+
+  output = cmd_line.get_switch(ARG_OUTPUT)
+  if output is None :
+    return
+
+  commit = _get_commit()
+  if commit is not None :
+    result["commit"] = Value(commit)
+
+  result["created_at"] = Value(
+      datetime.datetime.now(tz = datetime.timezone.utc).isoformat())
+  result["python"] = Value(platform.python_version())
+  result["platform"] = Value(platform.platform())
+  error, json = serialize_value_to_json(result)
+  if err_failure(error) :
+    print("Result can't be serialized: {}".format(error))
+    return
+
+  with open(output, "w") as output_file :
+    output_file.write(json)
+
+  print("Result is saved to {}".format(output))
+
+if __name__ == "__main__" :
+  main()
@@ -0,0 +1,167 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Benchmark of per-request overhead of sessions
+
+  Requests are handled in-process without network: a bare aiohttp handler
+  and WebServer's request handler with a session which only sets a response.
+  The difference is the framework overhead per request (creating, running
+  and counting a session). Both handlers are warmed up, then measured in
+  interleaved repeats, medians of repeats are reported.
+
+  Example:
+  ``python -m python_utilities.benchmark.session_overhead --requests=100000
+  --repeats=7``
+"""
+
+import asyncio
+import statistics
+import time
+
+from aiohttp import http
+from aiohttp import http_parser
+from aiohttp import web
+from multidict import CIMultiDict
+from multidict import CIMultiDictProxy
+from yarl import URL
+from ..base.cmd_line_util import *
+from ..base.errors import *
+from ..net.session_factory import *
+from ..net.session_in import *
+from ..net.web_server import *
+
+#
+# Command line argument names
+#
+ARG_REQUESTS = "requests"
+ARG_REPEATS = "repeats"
+
+#
+# Class _NullSession
+#
+class _NullSession (SessionIn) :
+  """ Session only sets an empty response """
+  def __init__(self, web_server) :
+    SessionIn.__init__(self, web_server, "null")
+
+  async def _do_work(self) :
+    await self.set_response(web.Response())
+    return Error(errOk)
+
+async def _null_session_factory(web_server, request) :
+  return _NullSession(web_server)
+
+#
+# Class _Transport
+#
+class _Transport :
+  """ Transport of a request without network """
+  def get_extra_info(self, name, default = None) :
+    return default
+
+  def is_closing(self) :
+    return False
+
+#
+# Class _Writer
+#
+class _Writer :
+  """ Writer drops a response """
+  buffer_size = 0
+  output_size = 0
+
+  def __init__(self, transport) :
+    self.transport = transport
+
+  def enable_chunking(self) :
+    pass
+
+  def enable_compression(self, encoding = "deflate") :
+    pass
+
+  async def write_headers(self, status_line, headers) :
+    pass
+
+  async def write(self, chunk) :
+    pass
+
+  async def write_eof(self, chunk = b"") :
+    pass
+
+  async def drain(self) :
+    pass
+
+#
+# Class _Protocol
+#
+class _Protocol :
+  """ Protocol of a request without network """
+  def __init__(self, transport, writer) :
+    self.transport = transport
+    self.writer = writer
+
+async def _bare_handler(request) :
+  response = web.Response()
+  await response.prepare(request)
+  return response
+
+#
+# Benchmark
+#
+async def _measure(handler, make_request, requests) :
+  """ Return time of handling a request in seconds """
+  message = http_parser.RawRequestMessage(
+      "GET", "/", http.HttpVersion11, CIMultiDictProxy(CIMultiDict()), (),
+      False, None, False, False, URL("/"))
+  transport = _Transport()
+  writer = _Writer(transport)
+  protocol = _Protocol(transport, writer)
+  request_list = [ make_request(message, None, protocol, writer, None)
+                   for i in range(requests) ]
+  begin_time = time.perf_counter()
+  for request in request_list :
+    await handler(request)
+
+  return (time.perf_counter() - begin_time) / requests
+
+def main() :
+  cmd_line = CommandLine()
+  requests = cmd_line.get_switch_as_int(ARG_REQUESTS, 100000)
+  repeats = cmd_line.get_switch_as_int(ARG_REPEATS, 7)
+
+  web_server = WebServer("127.0.0.1", 0)
+  web_server.init_activity_counters()
+  set_session_factory(_null_session_factory)
+
+  handlers = (_bare_handler, web_server._request_handler)
+  # Requests are created like by web-server, a mocked request records calls
+  make_request = web_server._make_request
+
+  async def run() :
+    # Warm up caches of counters and of the interpreter
+    for handler in handlers :
+      await _measure(handler, make_request, 1000)
+
+    # Repeats are interleaved, so drift of the machine affects both handlers
+    times = [ list(), list() ]
+    for i in range(repeats) :
+      for handler, handler_times in zip(handlers, times) :
+        handler_times.append(
+            await _measure(handler, make_request, requests))
+
+    return times
+
+  bare_times, session_times = asyncio.run(run())
+  bare_time = statistics.median(bare_times)
+  session_time = statistics.median(session_times)
+  overhead = statistics.median(
+      [ session - bare for bare, session in zip(bare_times, session_times) ])
+  print("{:>12} {:>12} {:>12}".format("bare, us", "session, us",
+                                      "overhead, us"))
+  print("{:>12.2f} {:>12.2f} {:>12.2f}".format(
+      bare_time * 1e6, session_time * 1e6, overhead * 1e6))
+
+if __name__ == "__main__" :
+  main()
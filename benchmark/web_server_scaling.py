@@ -0,0 +1,67 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Benchmark of web-server scaling by worker processes
+
+  Web-server with an echo ApiSession function is run with every number of
+  workers from ``--workers`` and is loaded by client processes. Requests per
+  second are printed for every number of workers.
+
+  Example:
+  ``python -m python_utilities.benchmark.web_server_scaling --workers=1,2,4``
+"""
+
+import time
+
+from ..base.cmd_line_util import *
+from ..base.errors import *
+from ..net.web_server import *
+from .bench_util import *
+
+#
+# Benchmark
+#
+def run_benchmark(workers, host, port, clients, concurrency, duration) :
+  """ Return requests per second and number of failed requests """
+  result = run_web_server(host, port, echo_session_factory, workers = workers)
+  if err_failure(result) :
+    return None, None
+
+  # Let worker processes bind the port
+  time.sleep(1.0)
+  latencies, error_counter = run_clients(
+      "http://{}:{}/api".format(host, port), clients, concurrency, duration)
+  stop_web_server()
+  return len(latencies) / duration, error_counter
+
+def main() :
+  cmd_line = CommandLine()
+  workers_list = [ int(item) for item in
+                   cmd_line.get_switch(ARG_WORKERS, "1,2,4").split(",") ]
+  clients = cmd_line.get_switch_as_int(ARG_CLIENTS, 4)
+  concurrency = cmd_line.get_switch_as_int(ARG_CONCURRENCY, 32)
+  duration = cmd_line.get_switch_as_int(ARG_DURATION, 10)
+  host = cmd_line.get_switch(ARG_HOST, "127.0.0.1")
+  port = cmd_line.get_switch_as_int(ARG_PORT, 8080)
+
+  base_rps = None
+  print("{:>8} {:>12} {:>8} {:>8}".format("workers", "rps", "scaling",
+                                          "errors"))
+  for workers in workers_list :
+    rps, error_counter = run_benchmark(
+        workers, host, port, clients, concurrency, duration)
+    if rps is None :
+      print("{:>8} {:>12}".format(workers, "failed"))
+      continue
+
+    if base_rps is None :
+      base_rps = rps / workers
+
+    print("{:>8d} {:>12.1f} {:>8.2f} {:>8d}".format(
+        workers, rps, rps / base_rps if base_rps > 0 else 0.0,
+        error_counter))
+
+if __name__ == "__main__" :
+  main()
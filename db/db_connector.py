@@ -38,6 +38,7 @@ class DBConnector :
     # Statistics members
     self.__created_at = datetime.datetime.now(tz = datetime.timezone.utc)
     self.__count_time_flag = None
+    self.__counter_handles = dict()
 
     log_print_inf(
         "DB connector is created. "
@@ -76,6 +77,7 @@ class DBConnector :
       return
 
     self.__count_time_flag = None
+    self.__counter_handles = dict()
 
     for key in ActivityCounter.get_all_counter_names() :
      if not isinstance(key, tuple) or len(key) == 0 or key[0] != self.uid :
@@ -100,6 +102,19 @@ class DBConnector :
         self.__count_time_flag,
         count_error_flag)
 
+  # Returns statistics counter of the db-connector by name tuple
+  def get_counter(
+      self, name_as_tuple, count_time_flag = None, count_error_flag = False) :
+    """ Return the counter handle, it's resolved once and cached """
+    result = self.__counter_handles.get(name_as_tuple)
+    if result is None :
+      result = self.add_counter(
+          name_as_tuple, count_time_flag, count_error_flag)
+      if result is not None :
+        self.__counter_handles[name_as_tuple] = result
+
+    return result
+
   # Returns all statistics counters as Value
   def get_counters_as_value(self) :
     if self.__count_time_flag is None :
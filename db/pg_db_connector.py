@@ -10,7 +10,6 @@ from aiopg.sa import create_engine
 from sqlalchemy.dialects import postgresql
 from ..base.errors import *
 from ..base.log import *
-from ..base.uid_util import *
 from .db_connector import *
 
 # Export
@@ -28,7 +27,7 @@ class PgDBConnector (DBConnector) :
     DBConnector.__init__(self, user, password, database, host, port)
 
     self.__query_counter = None
-    self.__query_ids = set()
+    self.__query_details = dict()
 
   @log_async_function_body()
   async def deinit(self) :
@@ -55,57 +54,37 @@ class PgDBConnector (DBConnector) :
     except :
       log_print_vrb("Can't convert SQL query to string ({})", sys.exc_info()[1])
 
-    # Generate query id if it needs
-    query_uid = None
-    if self.__query_counter is not None :
-      query_uid = create_uid()
+    # Get a counter of the query
+    counter = None
+    if self.__query_counter is not None and query_str is not None :
+      query_hash = hashlib.sha256(query_str.encode("utf-8")).hexdigest()
+      counter = self.__query_details.get(query_hash)
+      if counter is None :
+        log_print_imp("SQL query (id - {}): \n{}", query_hash, query_str)
+        counter = self.get_counter(("query_details", query_hash), None, True)
+        self.__query_details[query_hash] = counter
 
     try :
       async with self._engine.acquire() as connection:
-        # Start counter
-        query_hash = None
-        counter = None
-        if self.__query_counter is not None :
-          self.__query_counter.start(query_uid)
-          if query_str is not None :
-            query_hash = hashlib.sha256(query_str.encode("utf-8")).hexdigest()
-            counter = self.add_counter(
-                ["query_details", query_hash], None, True)
-            counter.start(query_uid)
-            if query_hash not in self.__query_ids :
-              log_print_imp("SQL query (id - {}): \n{}", query_hash, query_str)
-              self.__query_ids.add(query_hash)
-
-        # Execute a query
-        db_result = await connection.execute(query)
-        result = None
-        if db_result.returns_rows :
-          result = list()
-          row = await db_result.fetchone()
-          while row is not None :
-            row_values = dict()
-            for column, value in row.items() :
-              row_values[column] = value
-
-            result.append(row_values)
+        with activity_scope(self.__query_counter), activity_scope(counter) :
+          # Execute a query
+          db_result = await connection.execute(query)
+          result = None
+          if db_result.returns_rows :
+            result = list()
             row = await db_result.fetchone()
+            while row is not None :
+              row_values = dict()
+              for column, value in row.items() :
+                row_values[column] = value
 
-        # Stop counter
-        if self.__query_counter is not None :
-          self.__query_counter.stop(query_uid)
-          if counter is not None :
-            counter.stop(query_uid)
+              result.append(row_values)
+              row = await db_result.fetchone()
 
         return Error(errOk), result
     except :
       error = Error(errExecuteFailed, sys.exc_info()[1])
       log_print_err("Query executing failed", error_code = error)
-      # Stop counter
-      if self.__query_counter is not None :
-        self.__query_counter.stop(query_uid, True)
-        if counter is not None :
-          counter.stop(query_uid, True)
-
       return error, None
 
     error = Error(errUnknown, "Unknown state has been reached")
@@ -134,9 +113,10 @@ class PgDBConnector (DBConnector) :
   # Initializes activity counters
   def init_activity_counters(self, count_time_flag = True) :
     super().init_activity_counters(count_time_flag)
-    self.__query_counter = self.add_counter([_QUERY_COUNTER_NAME], None, True)
+    self.__query_counter = self.get_counter((_QUERY_COUNTER_NAME,), None, True)
 
   # Denitializes activity counters
   def deinit_activity_counters(self) :
     self.__query_counter = None
+    self.__query_details = dict()
     super().deinit_activity_counters()
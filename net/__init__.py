@@ -7,9 +7,35 @@ from .net_util import *
 from .session_in import *
 from .session_out import *
 from .api_session import *
+from .api_web_socket_session import *
+from .api_result_cache import *
+from .api_single_flight import *
+from .api_scheduler import *
+from .metrics_session import *
+from .session_router import *
+from .response_compressor import *
+from .request_admission import *
+from .load_shedder import *
+from .rate_limiter import *
+from .static_file_session import *
+from .socket_handoff import *
+from .listener import *
 
 __all__ = (web_server.__all__ +
            net_util.__all__ +
            session_in.__all__ +
            session_out.__all__ +
-           api_session.__all__)
+           api_session.__all__ +
+           api_web_socket_session.__all__ +
+           api_result_cache.__all__ +
+           api_single_flight.__all__ +
+           api_scheduler.__all__ +
+           metrics_session.__all__ +
+           session_router.__all__ +
+           response_compressor.__all__ +
+           request_admission.__all__ +
+           load_shedder.__all__ +
+           rate_limiter.__all__ +
+           static_file_session.__all__ +
+           socket_handoff.__all__ +
+           listener.__all__)
@@ -0,0 +1,152 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize a cache of results of idempotent ApiSession functions
+"""
+
+import collections
+import hashlib
+import json
+import time
+
+# Export
+__all__ = ('ApiResultCache',)
+
+#: Default time to live of results (in seconds)
+_DEFAULT_TTL = 60.0
+
+#: Default maximal number of results
+_DEFAULT_MAX_SIZE = 1024
+
+#
+# Class ApiResultCache
+#
+class ApiResultCache :
+  """
+    Cache of serialized results of an ApiSession function
+
+    Results are stored as json fragments keyed by name of function, API
+    version and hash of arguments in canonical form (keys of dictionaries
+    are sorted), so the order of arguments doesn't matter. A hit skips both
+    the function and serializing of its result. Results are evicted after
+    ``ttl`` seconds and by LRU when there are more than ``max_size`` results
+    or their total length exceeds ``max_bytes``. Only successful results are
+    cached.
+
+    A cache is passed to ApiSession for every idempotent function:
+
+    .. code-block:: python
+
+      result_cache_map = { "get_items" : ApiResultCache(ttl = 10.0) }
+
+      async def session_factory(web_server, request) :
+        return ApiSession(web_server, 1, "api", function_map,
+                          result_cache_map = result_cache_map)
+
+    :param ttl: time to live of results in seconds
+    :type ttl: float
+    :param max_size: maximal number of results
+    :type max_size: int
+    :param max_bytes: maximal total length of results or None
+    :type max_bytes: int
+  """
+  def __init__(self, ttl = _DEFAULT_TTL, max_size = _DEFAULT_MAX_SIZE,
+               max_bytes = None) :
+    self._ttl = ttl
+    self._max_size = max_size
+    self._max_bytes = max_bytes
+    # key -> (expire time, order number, json fragment)
+    self._items = collections.OrderedDict()
+    self._bytes = 0
+    self._hit_counter = 0
+    self._miss_counter = 0
+
+  @staticmethod
+  def make_key(function, api_version, arguments) :
+    """ Return key of result or None if arguments can't be serialized """
+    try :
+      canonical_json = json.dumps(
+          arguments.to_real_value(), sort_keys = True,
+          separators = (",", ":"))
+    except (TypeError, ValueError) :
+      return None
+
+    return function, api_version, \
+           hashlib.sha1(canonical_json.encode()).digest()
+
+  def get(self, key) :
+    """
+      Return order number and json fragment of result or None, key None is
+      counted as a miss
+    """
+    item = self._items.get(key) if key is not None else None
+    if item is not None :
+      if item[0] > time.monotonic() :
+        self._items.move_to_end(key)
+        self._hit_counter += 1
+        return item[1], item[2]
+
+      self._remove(key)
+
+    self._miss_counter += 1
+    return None
+
+  def put(self, key, order_number, fragment) :
+    """ Store json fragment of result """
+    if self._max_bytes is not None and len(fragment) > self._max_bytes :
+      return
+
+    if key in self._items :
+      self._remove(key)
+
+    self._items[key] = (time.monotonic() + self._ttl, order_number, fragment)
+    self._bytes += len(fragment)
+    while len(self._items) > self._max_size or \
+          (self._max_bytes is not None and self._bytes > self._max_bytes) :
+      self._remove(next(iter(self._items)))
+
+  def clear(self) :
+    """ Remove all results """
+    self._items.clear()
+    self._bytes = 0
+
+  @property
+  def bytes(self) :
+    """ Total length of results """
+    return self._bytes
+
+  @property
+  def hit_counter(self) :
+    """ Number of hits """
+    return self._hit_counter
+
+  @property
+  def max_bytes(self) :
+    """ Maximal total length of results """
+    return self._max_bytes
+
+  @property
+  def max_size(self) :
+    """ Maximal number of results """
+    return self._max_size
+
+  @property
+  def miss_counter(self) :
+    """ Number of misses """
+    return self._miss_counter
+
+  @property
+  def size(self) :
+    """ Number of results """
+    return len(self._items)
+
+  @property
+  def ttl(self) :
+    """ Time to live of results in seconds """
+    return self._ttl
+
+  def _remove(self, key) :
+    item = self._items.pop(key)
+    self._bytes -= len(item[2])
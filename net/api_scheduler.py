@@ -0,0 +1,202 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize scheduling of ApiSession function calls by priority classes
+"""
+
+import asyncio
+import collections
+
+from ..base.log import *
+
+# Export
+__all__ = ('PRIORITY_HIGH', 'PRIORITY_LOW', 'PRIORITY_NORMAL', 'ApiScheduler',
+           'api_function',)
+
+#
+# Priority classes
+#
+PRIORITY_HIGH = "high"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+
+#: Default weights of priority classes
+_DEFAULT_WEIGHTS = {
+  PRIORITY_HIGH : 8,
+  PRIORITY_NORMAL : 4,
+  PRIORITY_LOW : 1,
+}
+
+#
+# Function api_function
+#
+def api_function(priority = PRIORITY_NORMAL, max_concurrency = None) :
+  """
+    Decorator annotates ApiSession function by priority class and maximal
+    number of its concurrent calls
+
+    .. code-block:: python
+
+      @api_function(priority = PRIORITY_LOW, max_concurrency = 4)
+      async def build_report(session, arguments) :
+        ...
+  """
+  def decorator(fun) :
+    fun.api_priority = priority
+    fun.api_max_concurrency = max_concurrency
+    return fun
+
+  return decorator
+
+#
+# Class ApiScheduler
+#
+class ApiScheduler :
+  """
+    Scheduler of ApiSession function calls
+
+    A call is started at once if the number of running calls is less than
+    ``max_concurrency`` and the number of running calls of the function is
+    less than its ``max_concurrency`` from api_function. Otherwise the call
+    waits in the queue of its priority class. Free slots are given to queues
+    by smooth weighted round-robin, so a burst of low priority calls can't
+    starve high priority ones. Functions without annotation have normal
+    priority and no limit. Calls of a priority class which isn't in
+    ``weights`` wait in the normal class or, if there is no such class, in
+    the class of the lowest weight. The scheduler is shared by sessions:
+
+    .. code-block:: python
+
+      scheduler = ApiScheduler(max_concurrency = 64)
+
+      async def session_factory(web_server, request) :
+        return ApiSession(web_server, 1, "api", function_map,
+                          scheduler = scheduler)
+
+    :param max_concurrency: maximal number of running calls or None
+    :type max_concurrency: int
+    :param weights: weights of priority classes
+    :type weights: dict
+    :raise ValueError: if weights are empty
+  """
+  def __init__(self, max_concurrency = None, weights = None) :
+    self._max_concurrency = max_concurrency
+    self._weights = dict(weights if weights is not None else _DEFAULT_WEIGHTS)
+    if len(self._weights) == 0 :
+      raise ValueError("Weights of priority classes are empty")
+
+    # Priority class of calls of unknown classes
+    self._default_priority = PRIORITY_NORMAL \
+        if PRIORITY_NORMAL in self._weights else \
+        min(self._weights, key = self._weights.get)
+
+    self._in_flight = 0
+    # function -> number of running calls
+    self._function_in_flight = collections.Counter()
+    # priority class -> waiting calls: [future, function, max concurrency]
+    self._queues = { priority : collections.deque()
+                     for priority in self._weights.keys() }
+    # Current weights of smooth weighted round-robin
+    self._current_weights = { priority : 0 for priority in self._weights }
+
+  async def acquire(self, function, fun, queue_counter = None) :
+    """
+      Wait for a slot to call the function
+
+      :param function: name of function
+      :param fun: function from function map
+      :param queue_counter: activity counter of waiting or None
+    """
+    priority = getattr(fun, "api_priority", PRIORITY_NORMAL)
+    max_concurrency = getattr(fun, "api_max_concurrency", None)
+    if self._can_start(function, max_concurrency) :
+      self._start(function)
+      return
+
+    waiter = [ asyncio.get_event_loop().create_future(), function,
+               max_concurrency ]
+    queue = self._queues.get(priority)
+    if queue is None :
+      queue = self._queues[self._default_priority]
+    queue.append(waiter)
+    try :
+      with activity_scope(queue_counter) :
+        await waiter[0]
+    except asyncio.CancelledError :
+      if waiter[0].done() and not waiter[0].cancelled() :
+        self.release(function)
+      elif waiter in queue :
+        queue.remove(waiter)
+
+      raise
+
+  def release(self, function) :
+    """ Release a slot of the function """
+    self._in_flight -= 1
+    self._function_in_flight[function] -= 1
+    self._dispatch()
+
+  @property
+  def in_flight(self) :
+    """ Number of running calls """
+    return self._in_flight
+
+  @property
+  def max_concurrency(self) :
+    """ Maximal number of running calls """
+    return self._max_concurrency
+
+  @property
+  def queue_sizes(self) :
+    """ Numbers of waiting calls by priority classes """
+    return { priority : len(queue) for priority, queue in self._queues.items() }
+
+  @property
+  def weights(self) :
+    """ Weights of priority classes """
+    return dict(self._weights)
+
+  def _can_start(self, function, max_concurrency) :
+    return \
+        (self._max_concurrency is None or
+         self._in_flight < self._max_concurrency) and \
+        (max_concurrency is None or
+         self._function_in_flight[function] < max_concurrency)
+
+  def _start(self, function) :
+    self._in_flight += 1
+    self._function_in_flight[function] += 1
+
+  def _dispatch(self) :
+    while self._max_concurrency is None or \
+          self._in_flight < self._max_concurrency :
+      # Find the first runnable call of every priority class
+      runnable = dict()
+      for priority, queue in self._queues.items() :
+        for waiter in queue :
+          # Skip a cancelled call, it's removed by its task
+          if not waiter[0].done() and self._can_start(waiter[1], waiter[2]) :
+            runnable[priority] = waiter
+            break
+
+      if len(runnable) == 0 :
+        return
+
+      # Choose priority class by smooth weighted round-robin
+      total_weight = 0
+      chosen = None
+      for priority in runnable.keys() :
+        weight = self._weights[priority]
+        total_weight += weight
+        self._current_weights[priority] += weight
+        if chosen is None or \
+           self._current_weights[priority] > self._current_weights[chosen] :
+          chosen = priority
+
+      self._current_weights[chosen] -= total_weight
+      waiter = runnable[chosen]
+      self._queues[chosen].remove(waiter)
+      self._start(waiter[1])
+      waiter[0].set_result(True)
@@ -3,12 +3,17 @@
 # found in the LICENSE file.
 
 import aiohttp
+import asyncio
 import sys
+import time
 
 from aiohttp import web
 from ..base.errors import *
 from ..base.log import *
 from ..base.value import *
+from .api_result_cache import *
+from .api_scheduler import *
+from .api_single_flight import *
 from .net_util import *
 from .session_in import *
 
@@ -24,15 +29,25 @@ _DEFAULF_CHARSET = "utf-8"
 class ApiSession (SessionIn) :
   def __init__(
       self, web_server, server_api_version, session_prefix, function_map,
-      function_dependency_map = None, charset = _DEFAULF_CHARSET) :
+      function_dependency_map = None, charset = _DEFAULF_CHARSET,
+      max_concurrency = None, result_cache_map = None,
+      single_flight_map = None, scheduler = None, server_timing = False) :
     SessionIn.__init__(self, web_server, session_prefix)
 
     self._server_api_version = server_api_version
     self._api_version = 0
     self._function_map = function_map
-    self._function_dependency_map = function_dependency_map
+    self._function_dependency_map = function_dependency_map or dict()
     self._charset = charset
     self._request_charset = None
+    self._max_concurrency = max_concurrency
+    self._result_cache_map = result_cache_map or dict()
+    self._single_flight_map = single_flight_map or dict()
+    self._scheduler = scheduler
+    self._server_timing = server_timing
+    # Phases of request processing: (name, time in ns)
+    self._phases = list()
+    self._phase_time = None
 
   @property
   def api_version(self) :
@@ -58,16 +73,46 @@ class ApiSession (SessionIn) :
     """ Function map """
     return self._function_map
 
+  @property
+  def max_concurrency(self) :
+    """ Maximal number of concurrently called functions of request """
+    return self._max_concurrency
+
+  @property
+  def phases(self) :
+    """ Phases of request processing: name and time in nanoseconds """
+    return self._phases
+
   @property
   def request_charset(self) :
     """ Request charset """
     return self._request_charset
 
+  @property
+  def result_cache_map(self) :
+    """ Result cache map """
+    return self._result_cache_map
+
+  @property
+  def scheduler(self) :
+    """ Scheduler of function calls """
+    return self._scheduler
+
   @property
   def server_api_version(self) :
     """ Server API version """
     return self._server_api_version
 
+  @property
+  def server_timing(self) :
+    """ Return True if phase timings are sent in Server-Timing header """
+    return self._server_timing
+
+  @property
+  def single_flight_map(self) :
+    """ Single-flight map """
+    return self._single_flight_map
+
   async def _get_response_body(self) :
     """ Form result's body """
     # Check API version
@@ -114,6 +159,8 @@ class ApiSession (SessionIn) :
                     error_code = self._error_code)
       return error_to_json(self.error)
 
+    self._end_phase("read")
+
     # Decode body to json
     self._request_charset = self.request.charset
     json = body.decode(self._request_charset or self._charset)
@@ -121,8 +168,11 @@ class ApiSession (SessionIn) :
        self._request_charset.lower() != self._charset :
       json = json.encode(self._charset).decode(self._charset)
 
+    self._end_phase("decode")
+
     # Parse body
     error, api_request = deserialize_json_to_value(json, None, self._charset)
+    self._end_phase("parse")
     if err_failure(error) :
       self._error_code = error
       log_print_err(None, error_code = self._error_code)
@@ -133,73 +183,260 @@ class ApiSession (SessionIn) :
       log_print_err(None, error_code = self._error_code)
       return error_to_json(self.error)
 
-    # Process request
-    result = Value(dict())
+    error, body = await self._process_api_request(api_request)
+    if err_failure(error) :
+      self._error_code = error
+
+    return body
+
+  async def _process_api_request(self, api_request) :
+    """
+      Call functions of API request and form json of their results
+
+      :return: error of the failed function and json
+    """
+    # Plan calls
+    calls = list()
+    planned = dict()
+    failed_call = None
     for function in api_request.value :
       function_lower = function.lower()
 
       ## Check dependencies
-      if function_lower in self._function_dependency_map :
-        for dependency in self._function_dependency_map[function_lower] :
-          if dependency not in result :
-           self._error_code = Error(
-               errFuncFailed,
-               "Before calling \"{}\" to have to call \"{}\"".format(
-                   function, dependency))
-           log_print_err(None, error_code = self._error_code)
-           result[function] = error_to_value(self.error)
-           break
-
-      if err_failure(self._error_code) :
+      dependencies = list()
+      for dependency in self._function_dependency_map.get(function_lower, ()) :
+        if dependency not in planned :
+          failed_call = (function, Error(
+              errFuncFailed,
+              "Before calling \"{}\" to have to call \"{}\"".format(
+                  function, dependency)))
+          break
+
+        dependencies.append(planned[dependency])
+
+      if failed_call is not None :
         break
 
       ## Check function to be present
       if function_lower not in self._function_map :
-        self._error_code = \
-            Error(errInvalidParameter,
-                  "Unknow function - \"{}\"".format(function))
-        log_print_err(None, error_code = self._error_code)
-        result[function] = error_to_value(self.error)
+        failed_call = (function, Error(
+            errInvalidParameter, "Unknow function - \"{}\"".format(function)))
         break
 
-      ## Call function
-      ### Start counter
-      counter = self.web_server.add_counter(
-          [self.counter_name, "api", function_lower], None, True)
-      if counter is not None : counter.start(self.uid)
+      planned[function_lower] = len(calls)
+      calls.append((function, function_lower, dependencies))
+
+    # Process request
+    result = dict()
+    error, function = await self._call_functions(api_request, calls, result)
+    self._end_phase("call")
+    if err_success(error) and failed_call is not None :
+      function, error = failed_call
+
+    if err_failure(error) :
+      log_print_err(None, error_code = error)
+      result[function] = error_to_value(error)
+
+    # Generate json
+    fragments = list()
+    for function, function_result in result.items() :
+      if isinstance(function_result, Value) :
+        serialize_error, fragment = \
+            serialize_value_to_json(function_result, self._charset)
+        if err_failure(serialize_error) :
+          log_print_err(None, error_code = serialize_error)
+          return serialize_error, error_to_json(serialize_error)
+
+        function_result = (function_result.order_number, fragment)
+
+      fragments.append((function_result[0], function, function_result[1]))
+
+    fragments.sort(key = lambda item: (item[0], item[1]))
+    return error, "{" + ",".join(
+        [ "\"" + function + "\":" + fragment
+          for order_number, function, fragment in fragments ]) + "}"
+
+  async def _call_functions(self, api_request, calls, result) :
+    """
+      Call functions of request
+
+      Functions are called concurrently as soon as functions they depend on
+      are completed successfully, at most ``max_concurrency`` functions at
+      once. A function isn't called if a function it depends on has failed
+      or if a function before it in request has failed. Results are put to
+      result in order of request up to the first failed function, functions
+      after it are cancelled.
+
+      :return: error and name of failed function
+    """
+    if len(calls) == 1 :
+      function, function_lower, dependencies = calls[0]
+      error, function_result = await self._call_function(
+          function_lower, api_request[function])
+      if err_failure(error) :
+        return error, function
+
+      result[function] = function_result
+      return Error(errOk), None
+
+    semaphore = None
+    if self._max_concurrency is not None :
+      semaphore = asyncio.Semaphore(self._max_concurrency)
+
+    tasks = list()
+    # Index of the first failed function in request
+    first_failed_index = len(calls)
+
+    async def call(index, function, function_lower, dependencies) :
+      nonlocal first_failed_index
+      if len(dependencies) > 0 :
+        await asyncio.wait([ tasks[dependency] for dependency in dependencies ])
+        for dependency in dependencies :
+          if err_failure(tasks[dependency].result()[0]) :
+            return Error(
+                errFuncFailed,
+                "Function \"{}\" has failed before calling \"{}\"".format(
+                    calls[dependency][0], function)), None
+
+      if semaphore is None :
+        error, function_result = await call_function(
+            index, function, function_lower)
+      else :
+        async with semaphore :
+          error, function_result = await call_function(
+              index, function, function_lower)
 
+      if err_failure(error) :
+        first_failed_index = min(first_failed_index, index)
+
+      return error, function_result
+
+    async def call_function(index, function, function_lower) :
+      if index > first_failed_index :
+        return Error(
+            errFuncFailed,
+            "Function \"{}\" has failed before calling \"{}\"".format(
+                calls[first_failed_index][0], function)), None
+
+      return await self._call_function(function_lower, api_request[function])
+
+    for index, (function, function_lower, dependencies) in enumerate(calls) :
+      tasks.append(asyncio.ensure_future(
+          call(index, function, function_lower, dependencies)))
+
+    try :
+      for index, task in enumerate(tasks) :
+        function = calls[index][0]
+        error, function_result = await task
+        if err_failure(error) :
+          return error, function
+
+        result[function] = function_result
+    finally :
+      pending_tasks = [ task for task in tasks if not task.done() ]
+      for task in pending_tasks :
+        task.cancel()
+
+      if len(pending_tasks) > 0 :
+        await asyncio.wait(pending_tasks)
+
+    return Error(errOk), None
+
+  async def _call_function(self, function_lower, arguments) :
+    """
+      Call function, join its identical executing call or get its result from
+      cache
+
+      :return: error and result as Value or as order number and json fragment
+               for cached functions
+    """
+    cache = self._result_cache_map.get(function_lower)
+    single_flight = self._single_flight_map.get(function_lower)
+    if cache is None and single_flight is None :
+      return await self._call_function_body(function_lower, arguments)
+
+    key = ApiResultCache.make_key(function_lower, self._api_version, arguments)
+    if cache is not None :
+      item = cache.get(key)
+      self._increment_counter(
+          "cache", function_lower, "miss" if item is None else "hit")
+      if item is not None :
+        return Error(errOk), item
+
+    if single_flight is None or key is None :
+      return await self._call_uncached_function(
+          function_lower, arguments, cache, key)
+
+    self._increment_counter(
+        "single_flight", function_lower,
+        "coalesced" if single_flight.is_in_flight(key) else "executed")
+    return await single_flight.call(
+        key, lambda: self._call_uncached_function(
+            function_lower, arguments, cache, key))
+
+  async def _call_uncached_function(self, function_lower, arguments, cache,
+                                    key) :
+    """ Call function and put its result to cache """
+    error, function_result = \
+        await self._call_function_body(function_lower, arguments)
+    if cache is None or err_failure(error) or \
+       not isinstance(function_result, Value) :
+      return error, function_result
+
+    error, fragment = serialize_value_to_json(function_result, self._charset)
+    if err_failure(error) :
+      return error, None
+
+    item = (function_result.order_number, fragment)
+    if key is not None :
+      cache.put(key, *item)
+
+    return Error(errOk), item
+
+  async def _call_function_body(self, function_lower, arguments) :
+    """ Call function by scheduler and count its activity """
+    if self._scheduler is None :
+      return await self._call_function_now(function_lower, arguments)
+
+    await self._scheduler.acquire(
+        function_lower, self._function_map[function_lower],
+        self.web_server.get_counter(
+            (self.counter_name, "queue", function_lower), None, True))
+    try :
+      return await self._call_function_now(function_lower, arguments)
+    finally :
+      self._scheduler.release(function_lower)
+
+  async def _call_function_now(self, function_lower, arguments) :
+    """ Call function and count its activity """
+    counter = self.web_server.get_counter(
+        (self.counter_name, "api", function_lower), None, True)
+    with activity_scope(counter) as scope :
       try :
         error, function_result = await self._function_map[function_lower](
-            self, api_request[function])
+            self, arguments)
+      except asyncio.CancelledError :
+        raise
       except :
         error = Error(errException, sys.exc_info()[1])
+        function_result = None
         log_print_err(
             "Exception has occured during calling function '{}''",
             function_lower, error_code = error)
 
-      ### Stop counter
-      if counter is not None : counter.stop(self.uid, err_failure(error))
-
-      ### Check result
-      if err_failure(error) :
-        self._error_code = error
-        log_print_err(None, error_code = self._error_code)
-        result[function] = error_to_value(self.error)
-        break
-
-      result[function] = function_result
+      scope.error_flag = err_failure(error)
 
-    # Generate json
-    error, result_body = serialize_value_to_json(result, self._charset)
-    if err_failure(error) :
-      self._error_code = error
-      log_print_err(None, error_code = self._error_code)
-      return error_to_json(self.error)
+    return error, function_result
 
-    return result_body
+  def _increment_counter(self, *name) :
+    """ Count an event by the counter of session """
+    counter = self.web_server.get_counter((self.counter_name,) + name, False)
+    if counter is not None :
+      counter.increment()
 
   async def _do_work(self) :
     """ Main function for work """
+    self._phase_time = time.monotonic_ns()
     body = ""
     # Check request
     if self.request is None:
@@ -218,11 +455,48 @@ class ApiSession (SessionIn) :
       body = await self._get_response_body()
 
     body_binary = body.encode(self._charset)
+    self._end_phase("serialize")
 
     # Create response
     response = web.Response()
     response.content_type = "application/json"
     response.charset = self._charset
     response.body = body_binary
-    await self.set_response(response)
+    if self._server_timing :
+      response.headers["Server-Timing"] = ", ".join(
+          [ "{};dur={:.3f}".format(phase, time_ns / 1e6)
+            for phase, time_ns in self._phases ])
+
+    error = await self.set_response(response)
+    self._end_phase("prepare")
+
+    # aiohttp writes the body after the handler, so it's written here to
+    # measure the write
+    if err_success(error) :
+      try :
+        await response.write_eof()
+      except ConnectionError :
+        log_print_wrn("Connection is closed while a response is sent",
+                      error_code = Error(errRequestFailed, sys.exc_info()[1]))
+
+    self._end_phase("write")
+    self._record_phases()
     return Error(errOk)
+
+  def _end_phase(self, phase) :
+    """ Finish a phase of request processing """
+    now = time.monotonic_ns()
+    self._phases.append((phase, now - self._phase_time))
+    self._phase_time = now
+
+  def _record_phases(self) :
+    """ Record phase timings by counters of route """
+    route = getattr(self.request, "route_path", None) or \
+            self._session_uid_prefix
+    for phase, time_ns in self._phases :
+      counter = self.web_server.get_counter(
+          (self.counter_name, "phase", route, phase), None)
+      if counter is None :
+        return
+
+      counter.record(time_ns)
@@ -0,0 +1,93 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize coalescing of identical in-flight ApiSession function calls
+"""
+
+import asyncio
+
+# Export
+__all__ = ('ApiSingleFlight',)
+
+#
+# Class ApiSingleFlight
+#
+class ApiSingleFlight :
+  """
+    Single-flight of ApiSession function calls
+
+    The first call by a key is executed as a task, concurrent calls by the
+    same key await the same task and get the same result, the result mustn't
+    be changed by callers. A cancelled caller doesn't cancel the task while
+    other callers are waiting for it, the task is cancelled when all its
+    callers are cancelled.
+
+    A single-flight is passed to ApiSession for every idempotent function:
+
+    .. code-block:: python
+
+      single_flight = ApiSingleFlight()
+      single_flight_map = { "get_items" : single_flight }
+
+      async def session_factory(web_server, request) :
+        return ApiSession(web_server, 1, "api", function_map,
+                          single_flight_map = single_flight_map)
+  """
+  def __init__(self) :
+    # key -> [task, number of callers]
+    self._flights = dict()
+    self._call_counter = 0
+    self._coalesced_counter = 0
+
+  def is_in_flight(self, key) :
+    """ Return True if a call by the key is executing """
+    return key in self._flights
+
+  async def call(self, key, coroutine_function) :
+    """
+      Execute ``coroutine_function()`` or join its execution by the key
+
+      :return: result of coroutine
+    """
+    flight = self._flights.get(key)
+    if flight is None :
+      flight = [ asyncio.ensure_future(coroutine_function()), 0 ]
+      self._flights[key] = flight
+      flight[0].add_done_callback(
+          lambda task: self._complete(key, flight, task))
+    else :
+      self._coalesced_counter += 1
+
+    self._call_counter += 1
+    flight[1] += 1
+    try :
+      return await asyncio.shield(flight[0])
+    finally :
+      flight[1] -= 1
+      if flight[1] == 0 and not flight[0].done() :
+        flight[0].cancel()
+
+  @property
+  def call_counter(self) :
+    """ Number of calls """
+    return self._call_counter
+
+  @property
+  def coalesced_counter(self) :
+    """ Number of calls joined to executing ones """
+    return self._coalesced_counter
+
+  @property
+  def in_flight(self) :
+    """ Number of executing calls """
+    return len(self._flights)
+
+  def _complete(self, key, flight, task) :
+    if self._flights.get(key) is flight :
+      del self._flights[key]
+
+    # Retrieve exception if nobody waits for the result
+    if not task.cancelled() :
+      task.exception()
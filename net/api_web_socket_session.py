@@ -0,0 +1,272 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize ApiSession function calls over a WebSocket connection
+"""
+
+import aiohttp
+import asyncio
+import sys
+
+from aiohttp import web
+from ..base.errors import *
+from ..base.log import *
+from ..base.value import *
+from .api_session import *
+
+# Export
+__all__ = ('ApiWebSocketSession',)
+
+#: API version field in query of url
+_API_VERSION_FIELD = "api_version"
+
+#: Default maximal number of messages processed at once
+_DEFAULT_MAX_IN_FLIGHT = 64
+
+#
+# Class ApiWebSocketSession
+#
+class ApiWebSocketSession (ApiSession) :
+  """
+    Session calls functions of ApiSession by messages of a WebSocket
+    connection
+
+    API version is set once by ``api_version`` field of url's query. Every
+    text message is a json object with an id chosen by client - a number, a
+    string or null - and a request in the format of ApiSession:
+
+    .. code-block:: javascript
+
+      {"id": 17, "request": {"get_user": {"user_id": 5}}}
+
+    and it's answered by a message with the same id and the response body of
+    ApiSession:
+
+    .. code-block:: javascript
+
+      {"id": 17, "response": {"get_user": {"name": "Ann"}}}
+
+    Messages are processed concurrently, so responses can come in any order.
+    At most ``max_in_flight`` messages are processed at once, reading of the
+    connection is paused until one of them is completed.
+
+    .. code-block:: python
+
+      router.add_exact("/api/ws", ApiWebSocketSession, 1, "ws", function_map,
+                       function_dependency_map)
+
+    :param web_server: web-server - owner of session
+    :param server_api_version: server API version
+    :param session_prefix: session UID prefix
+    :param function_map: function map
+    :param function_dependency_map: function dependency map
+    :param charset: session charset
+    :param max_in_flight: maximal number of messages processed at once
+    :type max_in_flight: int
+    :param heartbeat: interval of pings in seconds or None
+    :type heartbeat: float
+    :param api_session_args: other arguments of ApiSession
+  """
+  def __init__(
+      self, web_server, server_api_version, session_prefix, function_map,
+      function_dependency_map = None, charset = "utf-8",
+      max_in_flight = _DEFAULT_MAX_IN_FLIGHT, heartbeat = None,
+      **api_session_args) :
+    ApiSession.__init__(
+        self, web_server, server_api_version, session_prefix, function_map,
+        function_dependency_map, charset, **api_session_args)
+
+    self._max_in_flight = max_in_flight
+    self._heartbeat = heartbeat
+    self._web_socket = None
+    self._send_lock = None
+    self._message_counter = 0
+
+  @property
+  def counter_name(self) :
+    return "api_web_socket_session"
+
+  @property
+  def heartbeat(self) :
+    """ Interval of pings in seconds """
+    return self._heartbeat
+
+  @property
+  def max_in_flight(self) :
+    """ Maximal number of messages processed at once """
+    return self._max_in_flight
+
+  @property
+  def message_counter(self) :
+    """ Number of received messages """
+    return self._message_counter
+
+  @property
+  def web_socket(self) :
+    """ WebSocket response of connection """
+    return self._web_socket
+
+  async def _do_work(self) :
+    """ Main function for work """
+    # Check request
+    if self.request is None:
+      self._error_code = \
+          Error(errObjNotInit, "Web-request hasn't been initialized")
+      log_print_err(None, error_code = self._error_code)
+      return await self._set_error_response(400)
+
+    if err_failure(self.request.processing_error) :
+      self._error_code = self.request.processing_error
+      log_print_err(None, error_code = self._error_code)
+      return await self._set_error_response(400)
+
+    # Check API version
+    try :
+      self._api_version = int(self.request.query.get(_API_VERSION_FIELD, 0))
+    except :
+      self._error_code = Error(errCannotReadAPIVersion, sys.exc_info()[1])
+      log_print_err("Error occured during reading API version",
+                    error_code = self._error_code)
+      return await self._set_error_response(400)
+
+    if self._api_version > self._server_api_version :
+      self._error_code = \
+          Error(
+              errAPIVersionNotSupported,
+              "Client is from future - Server API version: {}; "
+              "Client API version: {}".format(
+                  self._server_api_version, self._api_version))
+      log_print_err(None, error_code = self._error_code)
+      return await self._set_error_response(400)
+    elif self._api_version == 0 :
+      self._error_code = \
+          Error(errCannotReadAPIVersion, "Can't find API version in request")
+      log_print_err(None, error_code = self._error_code)
+      return await self._set_error_response(400)
+
+    log_print_inf("Request API version: {}", self._api_version)
+
+    # Open connection
+    web_socket = web.WebSocketResponse(heartbeat = self._heartbeat)
+    if not web_socket.can_prepare(self.request).ok :
+      self._error_code = \
+          Error(errInvalidParameter, "Request isn't a WebSocket handshake")
+      log_print_err(None, error_code = self._error_code)
+      return await self._set_error_response(400)
+
+    self._web_socket = web_socket
+    self._send_lock = asyncio.Lock()
+    error = await self.set_response(web_socket)
+    if err_failure(error) :
+      return error
+
+    # Process messages
+    semaphore = asyncio.Semaphore(self._max_in_flight)
+    tasks = set()
+
+    def complete(task) :
+      tasks.discard(task)
+      semaphore.release()
+
+    try :
+      while True :
+        await semaphore.acquire()
+        message = await web_socket.receive()
+        if message.type == aiohttp.WSMsgType.TEXT :
+          self._message_counter += 1
+          task = asyncio.ensure_future(self._process_message(message.data))
+          tasks.add(task)
+          task.add_done_callback(complete)
+          continue
+
+        semaphore.release()
+        if message.type == aiohttp.WSMsgType.BINARY :
+          await self._send_message(
+              "null", Error(errInvalidParameter,
+                            "Binary messages aren't supported"))
+        elif message.type == aiohttp.WSMsgType.ERROR :
+          self._error_code = \
+              Error(errRequestFailed, web_socket.exception())
+          log_print_err(None, error_code = self._error_code)
+          break
+        elif message.type in (aiohttp.WSMsgType.CLOSE,
+                              aiohttp.WSMsgType.CLOSING,
+                              aiohttp.WSMsgType.CLOSED) :
+          break
+    finally :
+      pending_tasks = list(tasks)
+      for task in pending_tasks :
+        task.cancel()
+
+      if len(pending_tasks) > 0 :
+        await asyncio.wait(pending_tasks)
+
+      await web_socket.close()
+
+    return Error(errOk)
+
+  def _end_phase(self, phase) :
+    """ Phases aren't measured for messages """
+
+  async def _process_message(self, data) :
+    """ Call functions of message and send response """
+    counter = self.web_server.get_counter(
+        (self.counter_name, "message"), None, True)
+    with activity_scope(counter) as scope :
+      error, message = deserialize_json_to_value(data, None, self._charset)
+      if err_failure(error) :
+        log_print_err(None, error_code = error)
+        scope.error_flag = True
+        await self._send_message("null", error)
+        return
+
+      # Id of message is sent back as is, an invalid id is sent as null
+      message_id = "null"
+      if message.value_type == Type.DICTIONARY and "id" in message.value :
+        id_type = message["id"].value_type
+        if id_type in (Type.INTEGER, Type.DOUBLE, Type.STRING) :
+          error, message_id = \
+              serialize_value_to_json(message["id"], self._charset)
+          if err_failure(error) :
+            message_id = "null"
+        elif id_type != Type.NONE :
+          error = Error(errInvalidParameter, "Message id is invalid")
+
+      if err_success(error) and (message.value_type != Type.DICTIONARY or
+         "request" not in message.value or
+         message["request"].value_type != Type.DICTIONARY) :
+        error = Error(errInvalidParameter, "Message is invalid")
+
+      if err_failure(error) :
+        log_print_err(None, error_code = error)
+        scope.error_flag = True
+        await self._send_message(message_id, error)
+        return
+
+      error, body = await self._process_api_request(message["request"])
+      scope.error_flag = err_failure(error)
+      await self._send_message(message_id, body)
+
+  async def _send_message(self, message_id, body) :
+    """ Send response body or error of message """
+    if isinstance(body, Error) :
+      body = error_to_json(body)
+
+    try :
+      async with self._send_lock :
+        await self._web_socket.send_str(
+            "{\"id\":" + message_id + ",\"response\":" + body + "}")
+    except ConnectionError :
+      log_print_wrn("Connection is closed while a message is sent",
+                    error_code = Error(errRequestFailed, sys.exc_info()[1]))
+
+  async def _set_error_response(self, status) :
+    """ Answer handshake request by error """
+    response = web.Response(status = status)
+    response.content_type = "application/json"
+    response.charset = self._charset
+    response.body = error_to_json(self.error).encode(self._charset)
+    await self.set_response(response)
+    return Error(errOk)
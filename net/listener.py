@@ -0,0 +1,255 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize listeners of web-server: TCP, unix domain sockets and
+  pre-opened sockets
+"""
+
+import errno
+import os
+import socket
+import stat
+import urllib.parse
+
+try :
+  import grp
+except ImportError :
+  grp = None
+
+# Export
+__all__ = ('Listener', 'get_systemd_listeners', 'parse_listeners',)
+
+#: The first file descriptor passed by systemd
+_SYSTEMD_FIRST_FD = 3
+
+#: Default backlog of listening sockets
+_DEFAULT_BACKLOG = 100
+
+#
+# Class Listener
+#
+class Listener :
+  """
+    Listening socket of web-server
+
+    A listener is a TCP address (``host`` and ``port``), a unix domain
+    socket (``path`` with optional ``mode`` and ``group`` of the socket file)
+    or a pre-opened listening socket (``fd``). A listener is described by a
+    string for the command line:
+
+    * ``[tcp:]host:port``, for example ``0.0.0.0:8080`` or ``[::1]:8080``
+    * ``unix:path[?mode=660&group=www-data]``
+    * ``fd:number``
+    * ``systemd`` - all sockets passed by systemd socket activation
+
+    .. code-block:: python
+
+      run_web_server(
+          None, None, session_factory,
+          listeners = parse_listeners("unix:/run/api.sock?mode=660,:8080"))
+
+    :param host: host of TCP listener
+    :param port: port of TCP listener
+    :param path: path of unix domain socket
+    :param mode: permissions of unix domain socket file (for example 0o660)
+    :param group: group of unix domain socket file
+    :param fd: file descriptor of pre-opened listening socket
+  """
+  def __init__(self, host = None, port = None, path = None, mode = None,
+               group = None, fd = None) :
+    self._host = host
+    self._port = port
+    self._path = path
+    self._mode = mode
+    self._group = group
+    self._fd = fd
+    self._socket = None
+    # Process which has created the socket file and its inode
+    self._owner_pid = None
+    self._inode = None
+
+  def __str__(self) :
+    if self._path is not None :
+      return "unix:" + self._path
+    elif self._fd is not None :
+      return "fd:{}".format(self._fd)
+
+    return "{}:{}".format(self._host or "", self._port)
+
+  def open_socket(self) :
+    """
+      Open the listening socket of unix domain socket or pre-opened listener,
+      it's opened once and is inherited by forked workers
+
+      :return: socket or None for TCP listener
+    """
+    if self._socket is not None :
+      return self._socket
+
+    if self._fd is not None :
+      self._socket = socket.socket(fileno = self._fd)
+    elif self._path is not None :
+      # Remove the socket file left by a stopped process
+      if os.path.exists(self._path) and \
+         stat.S_ISSOCK(os.stat(self._path).st_mode) :
+        if _is_unix_socket_served(self._path) :
+          raise OSError(
+              errno.EADDRINUSE,
+              "Unix domain socket is served by another process", self._path)
+
+        os.unlink(self._path)
+
+      unix_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      try :
+        unix_socket.bind(self._path)
+        if self._mode is not None :
+          os.chmod(self._path, self._mode)
+
+        if self._group is not None :
+          os.chown(self._path, -1, grp.getgrnam(self._group).gr_gid)
+
+        unix_socket.listen(_DEFAULT_BACKLOG)
+      except :
+        unix_socket.close()
+        raise
+
+      self._socket = unix_socket
+      self._owner_pid = os.getpid()
+      self._inode = os.stat(self._path).st_ino
+
+    return self._socket
+
+  async def create_server(self, event_loop, protocol_factory,
+                          reuse_port = False, backlog = _DEFAULT_BACKLOG) :
+    """ Create asyncio server of listener """
+    listening_socket = self.open_socket()
+    if listening_socket is None :
+      return await event_loop.create_server(
+          protocol_factory, self._host, self._port, backlog = backlog,
+          reuse_port = reuse_port or None)
+
+    # Socket is closed by server, so server gets its duplicate
+    listening_socket = listening_socket.dup()
+    if listening_socket.family == socket.AF_UNIX :
+      return await event_loop.create_unix_server(
+          protocol_factory, sock = listening_socket, backlog = backlog)
+
+    return await event_loop.create_server(
+        protocol_factory, sock = listening_socket, backlog = backlog)
+
+  def close(self, remove_file = True) :
+    """ Close the socket and remove the socket file created by process """
+    if self._socket is None :
+      return
+
+    self._socket.close()
+    self._socket = None
+    if not remove_file or self._owner_pid != os.getpid() :
+      return
+
+    try :
+      if os.stat(self._path).st_ino == self._inode :
+        os.unlink(self._path)
+    except OSError :
+      pass
+
+  @property
+  def fd(self) :
+    """ File descriptor of pre-opened listening socket """
+    return self._fd
+
+  @property
+  def group(self) :
+    """ Group of unix domain socket file """
+    return self._group
+
+  @property
+  def host(self) :
+    """ Host of TCP listener """
+    return self._host
+
+  @property
+  def mode(self) :
+    """ Permissions of unix domain socket file """
+    return self._mode
+
+  @property
+  def path(self) :
+    """ Path of unix domain socket """
+    return self._path
+
+  @property
+  def port(self) :
+    """ Port of TCP listener """
+    return self._port
+
+#
+# Function get_systemd_listeners
+#
+def get_systemd_listeners() :
+  """ Return listeners of sockets passed by systemd socket activation """
+  if os.environ.get("LISTEN_PID") != str(os.getpid()) :
+    return list()
+
+  try :
+    count = int(os.environ.get("LISTEN_FDS", "0"))
+  except ValueError :
+    return list()
+
+  return [ Listener(fd = fd) for fd in range(
+               _SYSTEMD_FIRST_FD, _SYSTEMD_FIRST_FD + count) ]
+
+#
+# Function parse_listeners
+#
+def parse_listeners(specs) :
+  """
+    Parse comma separated listener descriptions
+
+    :return: list of Listener
+    :raise ValueError: if a description is invalid
+  """
+  result = list()
+  for spec in specs.split(",") :
+    spec = spec.strip()
+    if len(spec) == 0 :
+      continue
+
+    if spec == "systemd" :
+      listeners = get_systemd_listeners()
+      if len(listeners) == 0 :
+        raise ValueError("systemd hasn't passed sockets")
+
+      result.extend(listeners)
+    elif spec[:3] == "fd:" :
+      result.append(Listener(fd = int(spec[3:])))
+    elif spec[:5] == "unix:" :
+      path, _, query = spec[5:].partition("?")
+      params = dict(urllib.parse.parse_qsl(query))
+      mode = params.get("mode")
+      result.append(Listener(
+          path = path, mode = int(mode, 8) if mode is not None else None,
+          group = params.get("group")))
+    else :
+      if spec[:4] == "tcp:" :
+        spec = spec[4:]
+
+      host, _, port = spec.rpartition(":")
+      result.append(Listener(host = host.strip("[]") or None, port = int(port)))
+
+  return result
+
+#
+# Help functions
+#
+def _is_unix_socket_served(path) :
+  """ Check that a process accepts connections of unix domain socket """
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client :
+    try :
+      client.connect(path)
+    except ConnectionRefusedError :
+      return False
+
+  return True
@@ -0,0 +1,197 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize load shedding by limits of concurrent requests
+"""
+
+import asyncio
+import collections
+
+from ..base.log import *
+
+# Export
+__all__ = ('LoadShedder',)
+
+#: Default timeout of waiting in queue (in seconds)
+_DEFAULT_QUEUE_TIMEOUT = 1.0
+
+#: Default value of Retry-After header (in seconds)
+_DEFAULT_RETRY_AFTER = 1
+
+#
+# Class _RouteLimit
+#
+class _RouteLimit :
+  """ Limit of concurrent requests by path prefix """
+  __slots__ = ('path_prefix', 'max_in_flight', 'in_flight')
+
+  def __init__(self, path_prefix, max_in_flight) :
+    self.path_prefix = path_prefix
+    self.max_in_flight = max_in_flight
+    self.in_flight = 0
+
+#
+# Class LoadShedder
+#
+class LoadShedder :
+  """
+    Limits of concurrent requests of web-server
+
+    A request is admitted if the number of processed requests is less than
+    ``max_in_flight`` and the number of processed requests of its route (the
+    longest matching path prefix) is less than the route limit. Otherwise
+    the request waits in a queue of ``max_queue`` requests at most for
+    ``queue_timeout`` seconds. Requests which aren't admitted are answered by
+    WebServer with 503 and Retry-After of ``retry_after`` seconds.
+
+    .. code-block:: python
+
+      load_shedder = LoadShedder(max_in_flight = 256, max_queue = 512)
+      load_shedder.add_route("/api/report", 8)
+      run_web_server(host, port, session_factory,
+                     load_shedder = load_shedder)
+
+    :param max_in_flight: maximal number of processed requests or None
+    :type max_in_flight: int
+    :param max_queue: maximal number of waiting requests
+    :type max_queue: int
+    :param queue_timeout: timeout of waiting in seconds
+    :type queue_timeout: float
+    :param retry_after: value of Retry-After header in seconds
+    :type retry_after: int
+  """
+  def __init__(self, max_in_flight = None, max_queue = 0,
+               queue_timeout = _DEFAULT_QUEUE_TIMEOUT,
+               retry_after = _DEFAULT_RETRY_AFTER) :
+    self._max_in_flight = max_in_flight
+    self._max_queue = max_queue
+    self._queue_timeout = queue_timeout
+    self._retry_after = retry_after
+    self._in_flight = 0
+    # Route limits sorted by length of path prefix in descending order
+    self._routes = list()
+    self._default_route = _RouteLimit("", None)
+    # Waiting requests: [future, route limit]
+    self._queue = collections.deque()
+    self._shed_counter = 0
+    self._timeout_counter = 0
+
+  def add_route(self, path_prefix, max_in_flight) :
+    """ Add a limit of concurrent requests by path prefix """
+    self._routes.append(_RouteLimit(path_prefix, max_in_flight))
+    self._routes.sort(key = lambda route: -len(route.path_prefix))
+
+  async def acquire(self, path, queue_counter = None) :
+    """
+      Admit request by path
+
+      :param queue_counter: activity counter of waiting in queue or None
+      :return: route limit (to release it) or None if request is shed and
+               reason - "queue_full" or "queue_timeout"
+    """
+    route = self._default_route
+    for item in self._routes :
+      if path.startswith(item.path_prefix) :
+        route = item
+        break
+
+    if self._can_admit(route) :
+      self._admit(route)
+      return route, None
+
+    if len(self._queue) >= self._max_queue :
+      self._shed_counter += 1
+      return None, "queue_full"
+
+    waiter = [ asyncio.get_event_loop().create_future(), route ]
+    self._queue.append(waiter)
+    try :
+      with activity_scope(queue_counter) as scope :
+        await asyncio.wait((waiter[0],), timeout = self._queue_timeout)
+        scope.error_flag = not waiter[0].done()
+    except asyncio.CancelledError :
+      if waiter[0].done() :
+        self.release(route)
+      else :
+        self._queue.remove(waiter)
+        waiter[0].cancel()
+
+      raise
+
+    if not waiter[0].done() :
+      self._queue.remove(waiter)
+      waiter[0].cancel()
+      self._shed_counter += 1
+      self._timeout_counter += 1
+      return None, "queue_timeout"
+
+    return route, None
+
+  def release(self, route) :
+    """ Release a request admitted by acquire """
+    self._in_flight -= 1
+    route.in_flight -= 1
+    if len(self._queue) == 0 :
+      return
+
+    for waiter in list(self._queue) :
+      if self._max_in_flight is not None and \
+         self._in_flight >= self._max_in_flight :
+        break
+
+      if self._can_admit(waiter[1]) :
+        self._queue.remove(waiter)
+        self._admit(waiter[1])
+        waiter[0].set_result(True)
+
+  @property
+  def in_flight(self) :
+    """ Number of processed requests """
+    return self._in_flight
+
+  @property
+  def max_in_flight(self) :
+    """ Maximal number of processed requests """
+    return self._max_in_flight
+
+  @property
+  def max_queue(self) :
+    """ Maximal number of waiting requests """
+    return self._max_queue
+
+  @property
+  def queue_size(self) :
+    """ Number of waiting requests """
+    return len(self._queue)
+
+  @property
+  def queue_timeout(self) :
+    """ Timeout of waiting in seconds """
+    return self._queue_timeout
+
+  @property
+  def retry_after(self) :
+    """ Value of Retry-After header in seconds """
+    return self._retry_after
+
+  @property
+  def shed_counter(self) :
+    """ Number of shed requests """
+    return self._shed_counter
+
+  @property
+  def timeout_counter(self) :
+    """ Number of requests shed by timeout of waiting """
+    return self._timeout_counter
+
+  def _admit(self, route) :
+    self._in_flight += 1
+    route.in_flight += 1
+
+  def _can_admit(self, route) :
+    return \
+        (self._max_in_flight is None or
+         self._in_flight < self._max_in_flight) and \
+        (route.max_in_flight is None or route.in_flight < route.max_in_flight)
@@ -0,0 +1,84 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize a session exposing activity counters to Prometheus
+"""
+
+import aiohttp
+import time
+
+from aiohttp import web
+from ..base.errors import *
+from ..base.log import *
+from .session_in import *
+
+# Export
+__all__ = ('MetricsSession',)
+
+#
+# Session prefix
+#
+_SESSION_PREFIX = "metrics" #: Metrics session prefix
+
+#: Default interval of regenerating the snapshot (in seconds)
+_DEFAULT_SCRAPE_INTERVAL = 15.0
+
+#
+# Class MetricsSession
+#
+class MetricsSession (SessionIn) :
+  """
+    Session serves all activity counters in Prometheus text format
+
+    The counters are formatted at most once per ``scrape_interval`` seconds,
+    other scrapes get the cached snapshot. The session is mounted by a session
+    factory, for example:
+
+    .. code-block:: python
+
+      async def session_factory(web_server, request) :
+        if request.path == "/metrics" :
+          return MetricsSession(web_server)
+        ...
+
+    :param web_server: web-server - owner of session
+    :param scrape_interval: minimal interval of regenerating the snapshot
+    :type scrape_interval: float
+  """
+  # Cached snapshot shared by all sessions
+  __snapshot = None
+  __snapshot_time = None
+
+  def __init__(self, web_server, scrape_interval = _DEFAULT_SCRAPE_INTERVAL) :
+    SessionIn.__init__(self, web_server, _SESSION_PREFIX)
+
+    self._scrape_interval = scrape_interval
+
+  @classmethod
+  def get_snapshot(cls, scrape_interval = _DEFAULT_SCRAPE_INTERVAL) :
+    """ Return the snapshot of counters regenerating it if it's outdated """
+    now = time.monotonic()
+    if cls.__snapshot is None or \
+       now - cls.__snapshot_time >= scrape_interval :
+      cls.__snapshot = get_counters_as_prometheus().encode("utf-8")
+      cls.__snapshot_time = now
+
+    return cls.__snapshot
+
+  async def _do_work(self) :
+    """ Main function for work """
+    response = web.Response(body = self.get_snapshot(self._scrape_interval))
+    response.headers[aiohttp.hdrs.CONTENT_TYPE] = PROMETHEUS_CONTENT_TYPE
+    await self.set_response(response)
+    return Error(errOk)
+
+  @property
+  def counter_name(self) :
+    return "metrics_session"
+
+  @property
+  def scrape_interval(self) :
+    """ Minimal interval of regenerating the snapshot """
+    return self._scrape_interval
@@ -17,13 +17,22 @@ __all__ = ('get_request_raw_header', 'dump_request', 'dump_response',)
 # Function get_request_raw_header
 #
 def get_request_raw_header(request, name) :
-  """ Return raw header value of request by header name """
-  name = name.lower()
-  for header in request.raw_headers :
-    if header[0].decode("utf-8").lower() == name:
-      return header[1].decode("utf-8")
+  """
+    Return raw header value of request by header name
 
-  return ""
+    Headers are indexed by lowercased names on the first lookup, the index
+    is kept in ``request.raw_header_index``.
+  """
+  index = getattr(request, "raw_header_index", None)
+  if index is None :
+    index = dict()
+    for header in request.raw_headers :
+      index.setdefault(
+          header[0].decode("utf-8").lower(), header[1].decode("utf-8"))
+
+    request.raw_header_index = index
+
+  return index.get(name.lower(), "")
 
 #
 # Function dump_request
@@ -0,0 +1,160 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize rate limiting of clients by token buckets
+"""
+
+import math
+import socket
+import struct
+import time
+
+from aiohttp import hdrs
+
+# Export
+__all__ = ('RateLimiter',)
+
+#: Default interval of compacting the table of buckets (in seconds)
+_DEFAULT_COMPACT_INTERVAL = 60.0
+
+#
+# Class RateLimiter
+#
+class RateLimiter :
+  """
+    Rate limiter of clients
+
+    Every client has a token bucket of ``burst`` tokens which is refilled by
+    ``rate`` tokens per second, a request takes a token. A client is
+    identified by the value of ``key_header`` header or by the remote
+    address. Requests of unix domain sockets have no remote address, they
+    come from a local proxy usually, so their client is identified by the
+    last address of X-Forwarded-For (added by the proxy) or by the user of
+    the peer process. Buckets which have been refilled completely are
+    removed from the table every ``compact_interval`` seconds. Limited
+    requests are answered by WebServer with 429 and Retry-After.
+
+    .. code-block:: python
+
+      rate_limiter = RateLimiter(rate = 50.0, burst = 100)
+      run_web_server(host, port, session_factory,
+                     rate_limiter = rate_limiter)
+
+    :param rate: number of requests per second
+    :type rate: float
+    :param burst: maximal number of requests at once
+    :type burst: int
+    :param key_header: name of header with client key or None
+    :type key_header: str
+    :param compact_interval: interval of compacting the table in seconds
+    :type compact_interval: float
+  """
+  def __init__(self, rate, burst, key_header = None,
+               compact_interval = _DEFAULT_COMPACT_INTERVAL) :
+    self._rate = float(rate)
+    self._burst = float(burst)
+    self._key_header = key_header
+    self._compact_interval = compact_interval
+    # key -> [tokens, time of update]
+    self._buckets = dict()
+    self._next_compact_time = time.monotonic() + compact_interval
+    self._limited_counter = 0
+
+  def get_key(self, request) :
+    """ Return key of client of request """
+    if self._key_header is not None :
+      key = request.headers.get(self._key_header)
+      if key is not None :
+        return key
+
+    remote = request.remote
+    if remote :
+      return remote
+
+    # Unix domain socket
+    forwarded_for = request.headers.get(hdrs.X_FORWARDED_FOR)
+    if forwarded_for is not None :
+      return forwarded_for.rsplit(",", 1)[-1].strip()
+
+    return _get_peer_user(request)
+
+  def check(self, request) :
+    """
+      Take a token of client of request
+
+      :return: None if request is allowed, otherwise seconds to retry after
+    """
+    now = time.monotonic()
+    if now >= self._next_compact_time :
+      self.compact(now)
+
+    key = self.get_key(request)
+    bucket = self._buckets.get(key)
+    if bucket is None :
+      self._buckets[key] = [ self._burst - 1.0, now ]
+      return None
+
+    tokens = min(self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+    bucket[1] = now
+    if tokens >= 1.0 :
+      bucket[0] = tokens - 1.0
+      return None
+
+    bucket[0] = tokens
+    self._limited_counter += 1
+    return max(1, math.ceil((1.0 - tokens) / self._rate))
+
+  def compact(self, now = None) :
+    """ Remove buckets which have been refilled completely """
+    if now is None :
+      now = time.monotonic()
+
+    self._buckets = {
+        key : bucket for key, bucket in self._buckets.items()
+        if bucket[0] + (now - bucket[1]) * self._rate < self._burst }
+    self._next_compact_time = now + self._compact_interval
+
+  @property
+  def burst(self) :
+    """ Maximal number of requests at once """
+    return self._burst
+
+  @property
+  def clients(self) :
+    """ Number of clients in the table """
+    return len(self._buckets)
+
+  @property
+  def key_header(self) :
+    """ Name of header with client key """
+    return self._key_header
+
+  @property
+  def limited_counter(self) :
+    """ Number of limited requests """
+    return self._limited_counter
+
+  @property
+  def rate(self) :
+    """ Number of requests per second """
+    return self._rate
+
+#
+# Help functions
+#
+def _get_peer_user(request) :
+  """ Return key of user of peer process of unix domain socket or None """
+  peer_socket = request.transport.get_extra_info("socket") \
+                if request.transport is not None else None
+  if peer_socket is None or not hasattr(socket, "SO_PEERCRED") :
+    return None
+
+  try :
+    pid, uid, gid = struct.unpack("3i", peer_socket.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+  except OSError :
+    return None
+
+  return "uid:{}".format(uid)
@@ -0,0 +1,156 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize admission checks of requests before reading their bodies
+"""
+
+import aiohttp
+
+from ..base.errors import *
+from .net_util import *
+
+# Export
+__all__ = ('RequestAdmission',)
+
+#: API version field in Content-Type
+_API_VERSION_FIELD = "api_version"
+
+#
+# Class _AdmissionRule
+#
+class _AdmissionRule :
+  """ Admission rule of requests by path prefix """
+  __slots__ = ('path_prefix', 'methods', 'allow', 'content_types',
+               'max_api_version', 'max_content_length')
+
+  def __init__(self, path_prefix, methods, content_types, max_api_version,
+               max_content_length) :
+    self.path_prefix = path_prefix
+    self.methods = \
+        frozenset(item.upper() for item in methods) \
+        if methods is not None else None
+    self.allow = ", ".join(sorted(self.methods)) if methods is not None else ""
+    self.content_types = \
+        frozenset(item.lower() for item in content_types) \
+        if content_types is not None else None
+    self.max_api_version = max_api_version
+    self.max_content_length = max_content_length
+
+#
+# Class RequestAdmission
+#
+class RequestAdmission :
+  """
+    Admission checks of requests
+
+    Checks are done by WebServer before a session is created and before any
+    byte of body is read, they use the request line and headers only. A
+    request is checked by the rule with the longest matching path prefix:
+    method, media type of Content-Type, API version from Content-Type (as
+    ApiSession reads it) and Content-Length. Requests without a rule are
+    admitted.
+
+    .. code-block:: python
+
+      admission = RequestAdmission()
+      admission.add_rule("/api", methods = ("POST",),
+                         content_types = ("application/json",),
+                         max_api_version = 1)
+      run_web_server(host, port, session_factory, admission = admission)
+  """
+  def __init__(self) :
+    # Rules sorted by length of path prefix in descending order
+    self._rules = list()
+
+  def add_rule(self, path_prefix, methods = None, content_types = None,
+               max_api_version = None, max_content_length = None) :
+    """
+      Add a rule of requests by path prefix
+
+      :param path_prefix: path prefix of requests
+      :param methods: allowed methods or None
+      :param content_types: allowed media types of Content-Type or None
+      :param max_api_version: maximal API version, if it's set then API
+                              version is required
+      :param max_content_length: maximal Content-Length or None
+    """
+    self._rules.append(_AdmissionRule(
+        path_prefix, methods, content_types, max_api_version,
+        max_content_length))
+    self._rules.sort(key = lambda rule: -len(rule.path_prefix))
+    return Error(errOk)
+
+  def check(self, request) :
+    """
+      Check request
+
+      :return: error, HTTP status and value of Allow header of rejection
+    """
+    path = request.path
+    rule = None
+    for item in self._rules :
+      if path.startswith(item.path_prefix) :
+        rule = item
+        break
+
+    if rule is None :
+      return Error(errOk), None, None
+
+    if rule.methods is not None and request.method not in rule.methods :
+      return _reject(405, rule.allow, errMethodNotSupported,
+                     "Method isn't supported - {}", request.method)
+
+    content_length = request.content_length
+    if content_length is not None and rule.max_content_length is not None and \
+       content_length > rule.max_content_length :
+      return _reject(413, None, errInvalidParameter,
+                     "Request is too large - {} bytes (maximum: {})",
+                     content_length, rule.max_content_length)
+
+    if rule.content_types is None and rule.max_api_version is None :
+      return Error(errOk), None, None
+
+    fields = get_request_raw_header(
+        request, aiohttp.hdrs.CONTENT_TYPE).split(";")
+    if rule.content_types is not None and \
+       fields[0].strip().lower() not in rule.content_types :
+      return _reject(415, None, errInvalidParameter,
+                     "Content type isn't supported - '{}'", fields[0])
+
+    if rule.max_api_version is None :
+      return Error(errOk), None, None
+
+    api_version = 0
+    for field in fields[1:] :
+      field = field.strip()
+      if field.lower()[:len(_API_VERSION_FIELD)] != _API_VERSION_FIELD :
+        continue
+
+      try :
+        api_version = int(field[len(_API_VERSION_FIELD) + 1:])
+      except ValueError :
+        return _reject(400, None, errCannotReadAPIVersion,
+                       "API version is invalid - '{}'", field)
+
+      break
+
+    if api_version == 0 :
+      return _reject(400, None, errCannotReadAPIVersion,
+                     "Can't find API version in request")
+
+    if api_version > rule.max_api_version :
+      return _reject(400, None, errAPIVersionNotSupported,
+                     "Client is from future - Server API version: {}; "
+                     "Client API version: {}",
+                     rule.max_api_version, api_version)
+
+    return Error(errOk), None, None
+
+#
+# Help functions
+#
+def _reject(status, allow, error_code, message, *args) :
+  # Rejections are counted and logged by WebServer
+  return Error(error_code, message.format(*args)), status, allow
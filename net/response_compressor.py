@@ -0,0 +1,186 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize negotiated compression of responses
+"""
+
+import aiohttp
+import asyncio
+import gzip
+import sys
+import zlib
+
+try :
+  import brotli
+except ImportError :
+  brotli = None
+
+try :
+  import zstandard
+except ImportError :
+  zstandard = None
+
+from aiohttp import web
+from ..base.errors import *
+from ..base.log import *
+
+# Export
+__all__ = ('ResponseCompressor',)
+
+#: Default minimal size of compressed body
+_DEFAULT_MIN_SIZE = 1024
+
+#: Default minimal size of body compressed in thread pool
+_DEFAULT_EXECUTOR_MIN_SIZE = 128 * 1024
+
+#: Default compression level
+_DEFAULT_LEVEL = 6
+
+#: Statuses of responses without body
+_STATUSES_WITHOUT_BODY = frozenset((204, 304))
+
+#
+# Compression functions
+#
+def _compress_gzip(data, level) :
+  return gzip.compress(data, compresslevel = min(level, 9), mtime = 0)
+
+def _compress_deflate(data, level) :
+  return zlib.compress(data, min(level, 9))
+
+def _compress_brotli(data, level) :
+  return brotli.compress(data, quality = min(level, 11))
+
+def _compress_zstd(data, level) :
+  return zstandard.ZstdCompressor(level = level).compress(data)
+
+#: Encodings in order of preference
+_ENCODINGS = tuple(
+    (name, fun) for name, fun, available in (
+        ("br", _compress_brotli, brotli is not None),
+        ("zstd", _compress_zstd, zstandard is not None),
+        ("gzip", _compress_gzip, True),
+        ("deflate", _compress_deflate, True)) if available)
+
+#
+# Class ResponseCompressor
+#
+class ResponseCompressor :
+  """
+    Compressor of response bodies by Accept-Encoding of request
+
+    Bodies of ``min_size`` bytes and more are compressed by the best encoding
+    accepted by client: br (brotli) and zstd if their modules are installed,
+    gzip, deflate. Bodies of ``executor_min_size`` bytes and more are
+    compressed in a thread pool to not block the event loop. The compressor
+    is set to WebServer by ``response_compressor`` and is applied by
+    SessionIn.set_response.
+
+    :param min_size: minimal size of compressed body in bytes
+    :type min_size: int
+    :param level: compression level, it's limited by 9 for gzip and deflate
+                  and by 11 for brotli
+    :type level: int
+    :param executor_min_size: minimal size of body compressed in thread pool
+    :type executor_min_size: int
+    :param encodings: allowed encodings or None for all available ones
+    :param executor: thread pool or None for default executor of event loop
+  """
+  def __init__(self, min_size = _DEFAULT_MIN_SIZE, level = _DEFAULT_LEVEL,
+               executor_min_size = _DEFAULT_EXECUTOR_MIN_SIZE,
+               encodings = None, executor = None) :
+    self._min_size = min_size
+    self._level = level
+    self._executor_min_size = executor_min_size
+    self._executor = executor
+    self._encodings = tuple(
+        item for item in _ENCODINGS
+        if encodings is None or item[0] in encodings)
+    self._compress_funs = dict(self._encodings)
+
+  def choose_encoding(self, accept_encoding) :
+    """ Return the best encoding accepted by Accept-Encoding or None """
+    qualities = dict()
+    for item in accept_encoding.split(",") :
+      fields = item.split(";")
+      name = fields[0].strip().lower()
+      quality = 1.0
+      for field in fields[1:] :
+        field = field.strip()
+        if field[:2] == "q=" :
+          try :
+            quality = float(field[2:])
+          except ValueError :
+            quality = 0.0
+
+      qualities[name] = quality
+
+    result = None
+    best_quality = 0.0
+    for name, fun in self._encodings :
+      quality = qualities.get(name, qualities.get("*", 0.0))
+      if quality > best_quality :
+        result = name
+        best_quality = quality
+
+    return result
+
+  async def compress_response(self, request, response) :
+    """ Compress body of response if it's acceptable """
+    if not isinstance(response, web.Response) or \
+       not isinstance(response.body, bytes) or \
+       len(response.body) < self._min_size or \
+       response.status in _STATUSES_WITHOUT_BODY or \
+       aiohttp.hdrs.CONTENT_ENCODING in response.headers :
+      return Error(errOk)
+
+    vary = response.headers.get(aiohttp.hdrs.VARY)
+    if vary is None :
+      response.headers[aiohttp.hdrs.VARY] = aiohttp.hdrs.ACCEPT_ENCODING
+    elif aiohttp.hdrs.ACCEPT_ENCODING.lower() not in vary.lower() :
+      response.headers[aiohttp.hdrs.VARY] = \
+          vary + ", " + aiohttp.hdrs.ACCEPT_ENCODING
+
+    encoding = self.choose_encoding(
+        request.headers.get(aiohttp.hdrs.ACCEPT_ENCODING, ""))
+    if encoding is None :
+      return Error(errOk)
+
+    fun = self._compress_funs[encoding]
+    body = response.body
+    try :
+      if len(body) >= self._executor_min_size :
+        body = await asyncio.get_event_loop().run_in_executor(
+            self._executor, fun, body, self._level)
+      else :
+        body = fun(body, self._level)
+    except :
+      error = Error(errFuncFailed, sys.exc_info()[1])
+      log_print_err("Compression by '{}' failed", encoding, error_code = error)
+      return error
+
+    response.body = body
+    response.headers[aiohttp.hdrs.CONTENT_ENCODING] = encoding
+    return Error(errOk)
+
+  @property
+  def encodings(self) :
+    """ Allowed encodings in order of preference """
+    return tuple(name for name, fun in self._encodings)
+
+  @property
+  def executor_min_size(self) :
+    """ Minimal size of body compressed in thread pool """
+    return self._executor_min_size
+
+  @property
+  def level(self) :
+    """ Compression level """
+    return self._level
+
+  @property
+  def min_size(self) :
+    """ Minimal size of compressed body """
+    return self._min_size
@@ -20,15 +20,19 @@ class Session :
   """
   def __init__(self, web_server, parent_session_uid, session_uid_prefix) :
     self._web_server = web_server
-    self._uid = create_uid(parent_session_uid, session_uid_prefix,
-                           web_server.get_new_session_number())
+    # UID is created on the first request
+    self._uid = None
+    self._parent_session_uid = parent_session_uid
+    self._session_uid_prefix = session_uid_prefix
+    self._session_number = web_server.get_new_session_number()
     self._active = False
     self._cache_control = ""
     self._error_code = Error(errOk)
     self._request = None
     self._response = None
     self._run_completed_event = None
-    log_print_inf("Network session UID: {}".format(self._uid))
+    if get_log_level() >= LOG_LEVEL_INFO :
+      log_print_inf("Network session UID: {}", self.uid)
 
   @log_async_function_body()
   async def call_soon(self) :
@@ -40,17 +44,13 @@ class Session :
   @log_async_function_body()
   async def run(self) :
     """ Run execution of session """
-    # Start counter
-    counter = self.web_server.add_counter([self.counter_name], None, True)
-    if counter is not None : counter.start(self.uid)
-
-    #  Do main work
-    self._active = True
-    result = await self._do_work()
-    self._active = False
-
-    # Stop counter
-    if counter is not None : counter.stop(self.uid, err_failure(self.error))
+    counter = self.web_server.get_session_counter(self)
+    with activity_scope(counter) as scope :
+      #  Do main work
+      self._active = True
+      result = await self._do_work()
+      self._active = False
+      scope.error_flag = err_failure(self.error)
 
     # Signal that work have been done if it is necessary
     if self._run_completed_event is not None :
@@ -105,6 +105,10 @@ class Session :
   @property
   def uid(self) :
     """ Session UID """
+    if self._uid is None :
+      self._uid = create_uid(self._parent_session_uid,
+                             self._session_uid_prefix, self._session_number)
+
     return self._uid
 
   @property
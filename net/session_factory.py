@@ -24,7 +24,7 @@ def set_session_factory(session_factory) :
 async def create_session(web_server, request) :
   global _session_factory
 
-  log_print_vrb("Url's path: {}".format(request.path))
+  log_print_vrb("Url's path: {}", request.path)
 
   result = None
   if _session_factory is not None :
@@ -37,8 +37,9 @@ class SessionIn (Session) :
       return error
 
     self._request = request
-    await async_log_print_file(
-        LOG_LEVEL_VERBOSE, "request", dump_request, self._request)
+    if get_log_level() >= LOG_LEVEL_VERBOSE :
+      await async_log_print_file(
+          LOG_LEVEL_VERBOSE, "request", dump_request, self._request)
     return Error(errOk)
 
   async def set_response(self, response) :
@@ -64,11 +65,16 @@ class SessionIn (Session) :
     if self._cache_control is not None and len(self._cache_control) > 0 :
       response.headers[aiohttp.hdrs.CACHE_CONTROL] = self._cache_control
 
+    compressor = self._web_server.response_compressor
+    if compressor is not None :
+      await compressor.compress_response(self.request, response)
+
     await response.prepare(self.request)
     response.version = self.request.version
     self._response = response
-    await async_log_print_file(
-        LOG_LEVEL_VERBOSE, "response", dump_response, self._response)
+    if get_log_level() >= LOG_LEVEL_VERBOSE :
+      await async_log_print_file(
+          LOG_LEVEL_VERBOSE, "response", dump_response, self._response)
     return Error(errOk)
 
   @property
@@ -69,15 +69,12 @@ class SessionOut (Session) :
       return self._error_code
 
     # Run request
-    ## Start counter
-    counter = self.web_server.add_counter(
-        [self.counter_name, "request"], None, True)
-    if counter is not None : counter.start(self.uid)
-
-    ## Start request
+    counter = self.web_server.get_counter(
+        (self.counter_name, "request"), None, True)
     error = Error(errOk)
     try :
-      async with aiohttp.ClientSession() as session :
+      async with activity_scope(counter) as scope, \
+                 aiohttp.ClientSession() as session :
         response = await session.request(
             self.method,
             self.url,
@@ -100,15 +97,13 @@ class SessionOut (Session) :
             ssl_context = ssl_context,
             proxy_headers = proxy_headers)
         log_print_inf("Requested url: {}", response.request_info.url)
-        await self._set_response(response)
+        error = await self._set_response(response)
+        scope.error_flag = err_failure(error)
     except :
       self._error_code = error = Error(errRequestFailed, sys.exc_info()[1])
       log_print_err("Error occured during asking \'{}\'", self.url,
                     error_code = error)
 
-    ## Stop counter
-    if counter is not None : counter.stop(self.uid, err_failure(error))
-
     return error
 
   @log_async_function_body()
@@ -0,0 +1,188 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize a router of incoming requests to sessions
+"""
+
+from ..base.errors import *
+from ..base.log import *
+
+# Export
+__all__ = ('SessionRouter',)
+
+#
+# Class _Route
+#
+class _Route :
+  """ Route to a session class """
+  __slots__ = ('path', 'session_class', 'args', 'kwargs')
+
+  def __init__(self, path, session_class, args, kwargs) :
+    self.path = path
+    self.session_class = session_class
+    self.args = args
+    self.kwargs = kwargs
+
+#
+# Class _Node
+#
+class _Node :
+  """ Node of routes' trie by path segments """
+  __slots__ = ('children', 'param_name', 'param_child', 'route',
+               'prefix_route')
+
+  def __init__(self) :
+    self.children = dict()
+    self.param_name = None
+    self.param_child = None
+    self.route = None
+    self.prefix_route = None
+
+#
+# Class SessionRouter
+#
+class SessionRouter :
+  """
+    Router maps url paths to session classes
+
+    Routes are added before the web-server starts and are compiled into
+    a dictionary of exact paths and a trie of path segments on adding, so
+    dispatch cost depends on the number of path segments only. A route
+    conflicting with added ones isn't added and its error is returned.
+    A matched session is created as ``session_class(web_server, *args,
+    **kwargs)``, parameters of the path are set to ``request.route_params``
+    and the path of route is set to ``request.route_path``. If no route
+    matches then the factory returns None and ErrorSession is created.
+
+    Routes are chosen in order: an exact route, a parameterized route (a
+    literal segment is preferred to a parameter, there is no backtracking),
+    the longest prefix route.
+
+    .. code-block:: python
+
+      router = SessionRouter()
+      router.add_exact("/metrics", MetricsSession)
+      router.add_route("/api/{version}", ApiSession, 1, "api", function_map)
+      router.add_prefix("/static", StaticSession)
+      run_web_server(host, port, router.session_factory)
+  """
+  def __init__(self) :
+    self._routes = list()
+    self._exact_routes = dict()
+    self._root = _Node()
+
+  def add_exact(self, path, session_class, *args, **kwargs) :
+    """ Add a route matching the path only """
+    return self._add("exact", path, session_class, args, kwargs)
+
+  def add_prefix(self, prefix, session_class, *args, **kwargs) :
+    """ Add a route matching the path and all paths under it """
+    return self._add("prefix", prefix, session_class, args, kwargs)
+
+  def add_route(self, pattern, session_class, *args, **kwargs) :
+    """ Add a route with parameters - ``/api/{name}/items/{id}`` """
+    return self._add("pattern", pattern, session_class, args, kwargs)
+
+  def compile(self) :
+    """ Compile routes into the dispatch tables """
+    exact_routes = dict()
+    root = _Node()
+    for kind, path, route in self._routes :
+      if kind == "exact" :
+        exact_routes[_normalize_path(path)] = route
+        continue
+
+      node = root
+      for segment in _split_path(path) :
+        if kind == "pattern" and len(segment) > 2 and \
+           segment[0] == "{" and segment[-1] == "}" :
+          name = segment[1:-1]
+          if node.param_child is None :
+            node.param_name = name
+            node.param_child = _Node()
+          elif node.param_name != name :
+            error = Error(
+                errInvalidParameter,
+                "Parameter '{}' conflicts with '{}' in route '{}'".format(
+                    name, node.param_name, path))
+            log_print_err(None, error_code = error)
+            return error
+
+          node = node.param_child
+        else :
+          child = node.children.get(segment)
+          if child is None :
+            child = node.children[segment] = _Node()
+
+          node = child
+
+      if kind == "prefix" :
+        node.prefix_route = route
+      else :
+        node.route = route
+
+    self._exact_routes = exact_routes
+    self._root = root
+    return Error(errOk)
+
+  def resolve(self, path) :
+    """
+      Find a route by path
+
+      :return: route (or None) and dictionary of path parameters
+    """
+    segments = _split_path(path)
+    route = self._exact_routes.get("/" + "/".join(segments))
+    if route is not None :
+      return route, dict()
+
+    node = self._root
+    params = dict()
+    prefix_route = node.prefix_route
+    for segment in segments :
+      child = node.children.get(segment)
+      if child is None and node.param_child is not None :
+        params[node.param_name] = segment
+        child = node.param_child
+
+      if child is None :
+        return prefix_route, dict()
+
+      node = child
+      if node.prefix_route is not None :
+        prefix_route = node.prefix_route
+
+    if node.route is not None :
+      return node.route, params
+
+    return prefix_route, dict()
+
+  async def session_factory(self, web_server, request) :
+    """ Session factory function for run_web_server """
+    route, params = self.resolve(request.path)
+    if route is None :
+      return None
+
+    request.route_params = params
+    request.route_path = route.path
+    return route.session_class(web_server, *route.args, **route.kwargs)
+
+  def _add(self, kind, path, session_class, args, kwargs) :
+    self._routes.append(
+        (kind, path, _Route(path, session_class, args, kwargs)))
+    error = self.compile()
+    if err_failure(error) :
+      self._routes.pop()
+
+    return error
+
+#
+# Help functions
+#
+def _split_path(path) :
+  return [ segment for segment in path.split("/") if len(segment) > 0 ]
+
+def _normalize_path(path) :
+  return "/" + "/".join(_split_path(path))
@@ -0,0 +1,133 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize handoff of listening sockets to a new process by a unix
+  socket (SCM_RIGHTS)
+"""
+
+import array
+import os
+import socket
+import sys
+
+from ..base.errors import *
+from ..base.log import *
+
+# Export
+__all__ = ('bind_handoff_socket', 'receive_sockets', 'send_sockets',
+           'unlink_handoff_socket',)
+
+#: Maximal number of sockets in a handoff
+_MAX_SOCKETS = 64
+
+#
+# Function bind_handoff_socket
+#
+def bind_handoff_socket(handoff_path) :
+  """
+    Create a listening unix socket which hands off sockets to a new process
+
+    A socket of the previous process at the path is replaced, it keeps
+    working until that process stops.
+
+    :return: error and socket
+  """
+  try :
+    if os.path.exists(handoff_path) :
+      os.unlink(handoff_path)
+
+    handoff_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try :
+      handoff_socket.bind(handoff_path)
+      handoff_socket.listen(1)
+      handoff_socket.setblocking(False)
+    except :
+      handoff_socket.close()
+      raise
+  except :
+    error = Error(errCannotInitServer, sys.exc_info()[1])
+    log_print_err("Can't bind handoff socket '{}'", handoff_path,
+                  error_code = error)
+    return error, None
+
+  return Error(errOk), handoff_socket
+
+#
+# Function unlink_handoff_socket
+#
+def unlink_handoff_socket(handoff_socket, handoff_path) :
+  """ Close the handoff socket and remove its path if it isn't replaced """
+  try :
+    inode = os.fstat(handoff_socket.fileno()).st_ino
+    if os.path.exists(handoff_path) and \
+       os.stat(handoff_path).st_ino == inode :
+      os.unlink(handoff_path)
+  except OSError :
+    pass
+
+  handoff_socket.close()
+
+#
+# Function send_sockets
+#
+def send_sockets(connection, sockets) :
+  """
+    Send listening sockets by a connection of the handoff socket
+
+    :return: error
+  """
+  fds = [ sock.fileno() for sock in sockets ]
+  try :
+    connection.setblocking(True)
+    connection.sendmsg(
+        [ str(len(fds)).encode("ascii") ],
+        [ (socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds)) ])
+  except :
+    error = Error(errRequestFailed, sys.exc_info()[1])
+    log_print_err("Can't hand off listening sockets", error_code = error)
+    return error
+
+  return Error(errOk)
+
+#
+# Function receive_sockets
+#
+def receive_sockets(handoff_path, timeout = 5.0) :
+  """
+    Receive listening sockets from the process serving the handoff path
+
+    :return: error and list of sockets, None with wrnObjNotFound if nobody
+             serves the path
+  """
+  if not os.path.exists(handoff_path) :
+    return Error(wrnObjNotFound, "Handoff socket isn't found"), None
+
+  fds = array.array("i")
+  try :
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection :
+      connection.settimeout(timeout)
+      try :
+        connection.connect(handoff_path)
+      except (ConnectionRefusedError, FileNotFoundError) :
+        return Error(wrnObjNotFound, sys.exc_info()[1]), None
+
+      message, ancdata, flags, address = connection.recvmsg(
+          16, socket.CMSG_LEN(_MAX_SOCKETS * fds.itemsize))
+      for level, kind, data in ancdata :
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS :
+          fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+
+    if len(fds) == 0 or len(fds) != int(message.decode("ascii")) :
+      raise ValueError("Invalid handoff message")
+  except :
+    for fd in fds :
+      os.close(fd)
+
+    error = Error(errRequestFailed, sys.exc_info()[1])
+    log_print_err("Can't receive listening sockets", error_code = error)
+    return error, None
+
+  log_print_imp("{} listening sockets are received", len(fds))
+  return Error(errOk), [ socket.socket(fileno = fd) for fd in fds ]
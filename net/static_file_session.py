@@ -0,0 +1,455 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize a session serving static files by sendfile
+"""
+
+import aiohttp
+import asyncio
+import collections
+import email.utils
+import mimetypes
+import os
+import stat
+import sys
+
+from aiohttp import web
+from ..base.errors import *
+from ..base.log import *
+from .session_in import *
+
+# Export
+__all__ = ('FileDescriptorCache', 'StaticFileSession')
+
+#
+# Session prefix
+#
+_SESSION_PREFIX = "static" #: Static file session prefix
+
+#: Default maximal number of open files in cache
+_DEFAULT_MAX_FILES = 256
+
+#: Size of chunk when sendfile isn't available
+_CHUNK_SIZE = 256 * 1024
+
+#: Default content type
+_DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+#
+# Class _FileEntry
+#
+class _FileEntry :
+  """ Open file with its properties """
+  __slots__ = ('file', 'key', 'size', 'mtime', 'etag', 'last_modified',
+               'content_type', 'users', 'evicted')
+
+  def __init__(self, file, file_stat, path) :
+    self.file = file
+    self.key = _get_file_key(file_stat)
+    self.size = file_stat.st_size
+    self.mtime = int(file_stat.st_mtime)
+    self.etag = "\"{:x}-{:x}\"".format(
+        file_stat.st_mtime_ns, file_stat.st_size)
+    self.last_modified = email.utils.formatdate(self.mtime, usegmt = True)
+    self.content_type = \
+        mimetypes.guess_type(path)[0] or _DEFAULT_CONTENT_TYPE
+    self.users = 0
+    self.evicted = False
+
+#
+# Class FileDescriptorCache
+#
+class FileDescriptorCache :
+  """
+    Cache of open files of StaticFileSession
+
+    A file is checked by stat on every request and is reopened if it has
+    been changed. At most ``max_files`` files are kept open, the least
+    recently used file is closed when nobody sends it. The cache is shared by
+    sessions of the event loop. It doesn't touch the file system, files are
+    checked and opened by sessions in the executor of the loop.
+
+    :param max_files: maximal number of open files
+    :type max_files: int
+  """
+  def __init__(self, max_files = _DEFAULT_MAX_FILES) :
+    self._max_files = max_files
+    # path -> file entry
+    self._entries = collections.OrderedDict()
+    self._hit_counter = 0
+    self._miss_counter = 0
+
+  def acquire(self, path, file_stat) :
+    """
+      Return the open file entry of path, it's released by release
+
+      :param file_stat: current stat of the file
+      :return: entry or None if the file isn't open or has been changed
+    """
+    entry = self._entries.get(path)
+    if entry is not None :
+      if entry.key == _get_file_key(file_stat) :
+        self._hit_counter += 1
+        self._entries.move_to_end(path)
+        entry.users += 1
+        return entry
+
+      self._evict(path)
+
+    self._miss_counter += 1
+    return None
+
+  def add(self, path, entry) :
+    """ Add the open file entry of path, it's released by release """
+    if path in self._entries :
+      self._evict(path)
+
+    entry.users += 1
+    self._entries[path] = entry
+    while len(self._entries) > self._max_files :
+      self._evict(next(iter(self._entries)))
+
+  def release(self, entry) :
+    """ Release the file entry """
+    entry.users -= 1
+    if entry.evicted and entry.users == 0 :
+      entry.file.close()
+
+  def clear(self) :
+    """ Close all files which aren't used """
+    for path in list(self._entries.keys()) :
+      self._evict(path)
+
+  @property
+  def hit_counter(self) :
+    """ Number of requests served by an open file """
+    return self._hit_counter
+
+  @property
+  def max_files(self) :
+    """ Maximal number of open files """
+    return self._max_files
+
+  @property
+  def miss_counter(self) :
+    """ Number of opened files """
+    return self._miss_counter
+
+  @property
+  def size(self) :
+    """ Number of open files """
+    return len(self._entries)
+
+  def _evict(self, path) :
+    entry = self._entries.pop(path)
+    entry.evicted = True
+    if entry.users == 0 :
+      entry.file.close()
+
+#
+# Class _FileResponse
+#
+class _FileResponse (web.StreamResponse) :
+  """ Response sends a range of file by sendfile on preparing """
+  def __init__(self, entry, offset, count, status) :
+    web.StreamResponse.__init__(self, status = status)
+
+    self._entry = entry
+    self._offset = offset
+    self._count = count
+    self._started = False
+
+  async def prepare(self, request) :
+    # Response is prepared again by aiohttp after the handler
+    if self._started :
+      return await web.StreamResponse.prepare(self, request)
+
+    self._started = True
+    writer = await web.StreamResponse.prepare(self, request)
+    if request.method == "HEAD" or self._count == 0 :
+      return writer
+
+    try :
+      # Headers can be buffered by writer until the first write
+      send_headers = getattr(writer, "send_headers", None)
+      if send_headers is not None :
+        send_headers()
+
+      await writer.drain()
+      try :
+        await asyncio.get_event_loop().sendfile(
+            request.transport, self._entry.file, self._offset, self._count,
+            fallback = False)
+      except (NotImplementedError, asyncio.SendfileNotAvailableError) :
+        # pread doesn't use the position of the shared file
+        await self._send_by_chunks(writer)
+
+      await web.StreamResponse.write_eof(self)
+    except ConnectionError :
+      log_print_wrn("Connection is closed while a file is sent",
+                    error_code = Error(errRequestFailed, sys.exc_info()[1]))
+
+    return writer
+
+  async def _send_by_chunks(self, writer) :
+    loop = asyncio.get_event_loop()
+    fd = self._entry.file.fileno()
+    offset = self._offset
+    end = self._offset + self._count
+    while offset < end :
+      chunk = await loop.run_in_executor(
+          None, os.pread, fd, min(_CHUNK_SIZE, end - offset), offset)
+      if len(chunk) == 0 :
+        break
+
+      await writer.write(chunk)
+      offset += len(chunk)
+
+#
+# Class StaticFileSession
+#
+class StaticFileSession (SessionIn) :
+  """
+    Session serves files of a directory
+
+    The url path without ``url_prefix`` is a file path relative to
+    ``root_path``, paths outside of the root are not found. Files are sent by
+    sendfile without reading them to memory (by chunks if sendfile isn't
+    available). GET and HEAD requests, a single byte range (Range and
+    If-Range) and conditional requests by ETag and Last-Modified
+    (If-None-Match and If-Modified-Since) are supported.
+
+    .. code-block:: python
+
+      fd_cache = FileDescriptorCache()
+      router.add_prefix("/files", StaticFileSession, "/srv/files", "/files",
+                        fd_cache)
+
+    :param web_server: web-server - owner of session
+    :param root_path: root directory of files
+    :param url_prefix: url path prefix of files
+    :param fd_cache: cache of open files (FileDescriptorCache) or None
+  """
+  def __init__(self, web_server, root_path, url_prefix = "", fd_cache = None) :
+    SessionIn.__init__(self, web_server, _SESSION_PREFIX)
+
+    self._root_path = os.path.realpath(root_path)
+    self._url_prefix = url_prefix.rstrip("/")
+    self._fd_cache = fd_cache
+
+  @property
+  def counter_name(self) :
+    return "static_file_session"
+
+  @property
+  def fd_cache(self) :
+    """ Cache of open files """
+    return self._fd_cache
+
+  @property
+  def root_path(self) :
+    """ Root directory of files """
+    return self._root_path
+
+  @property
+  def url_prefix(self) :
+    """ Url path prefix of files """
+    return self._url_prefix
+
+  def get_file_path(self, url_path) :
+    """ Return file path of url path or None if it's outside of root """
+    if url_path[:len(self._url_prefix)] != self._url_prefix :
+      return None
+
+    # A path with a null byte is rejected by the file system by ValueError
+    try :
+      path = os.path.realpath(os.path.join(
+          self._root_path, url_path[len(self._url_prefix):].lstrip("/")))
+    except ValueError :
+      return None
+
+    if os.path.commonpath((self._root_path, path)) != self._root_path :
+      return None
+
+    return path
+
+  async def _do_work(self) :
+    """ Main function for work """
+    if self.request.method not in ("GET", "HEAD") :
+      self._error_code = Error(
+          errMethodNotSupported,
+          "Method isn't supported - {}".format(self.request.method))
+      log_print_err(None, error_code = self._error_code)
+      response = web.Response(text = "Method Not Allowed", status = 405,
+                              charset = "utf-8")
+      response.headers[aiohttp.hdrs.ALLOW] = "GET, HEAD"
+      await self.set_response(response)
+      return Error(errOk)
+
+    # The file system is accessed by the executor not to block the loop
+    event_loop = asyncio.get_event_loop()
+    path, file_stat = await event_loop.run_in_executor(
+        None, self._stat_file, self.request.path)
+    entry = None
+    if file_stat is not None :
+      try :
+        if self._fd_cache is not None :
+          entry = self._fd_cache.acquire(path, file_stat)
+
+        if entry is None :
+          entry = await event_loop.run_in_executor(None, _open_file, path)
+          if self._fd_cache is not None :
+            self._fd_cache.add(path, entry)
+      except OSError :
+        log_print_err("Can't open file '{}'", path,
+                      error_code = Error(errObjNotFound, sys.exc_info()[1]))
+
+    if entry is None :
+      self._error_code = Error(
+          errObjNotFound, "File isn't found - {}".format(self.request.path))
+      log_print_err(None, error_code = self._error_code)
+      await self.set_response(web.Response(
+          text = "Not Found", status = 404, charset = "utf-8"))
+      return Error(errOk)
+
+    try :
+      await self.set_response(self._make_response(entry))
+    finally :
+      if self._fd_cache is not None :
+        self._fd_cache.release(entry)
+      else :
+        entry.file.close()
+
+    return Error(errOk)
+
+  def _make_response(self, entry) :
+    """ Create response by conditional and range headers """
+    headers = self.request.headers
+    offset = 0
+    count = entry.size
+    status = 200
+    if _is_not_modified(headers, entry) :
+      response = web.Response(status = 304)
+      response.headers[aiohttp.hdrs.ETAG] = entry.etag
+      response.headers[aiohttp.hdrs.LAST_MODIFIED] = entry.last_modified
+      return response
+
+    if aiohttp.hdrs.RANGE in headers and _is_range_valid(headers, entry) :
+      byte_range = _parse_range(headers[aiohttp.hdrs.RANGE], entry.size)
+      if byte_range is False :
+        response = web.Response(status = 416)
+        response.headers[aiohttp.hdrs.CONTENT_RANGE] = \
+            "bytes */{}".format(entry.size)
+        return response
+
+      if byte_range is not None :
+        status = 206
+        offset, count = byte_range
+
+    response = _FileResponse(entry, offset, count, status)
+    response.headers[aiohttp.hdrs.ETAG] = entry.etag
+    response.headers[aiohttp.hdrs.LAST_MODIFIED] = entry.last_modified
+    response.headers[aiohttp.hdrs.ACCEPT_RANGES] = "bytes"
+    response.content_type = entry.content_type
+    response.content_length = count
+    if status == 206 :
+      response.headers[aiohttp.hdrs.CONTENT_RANGE] = "bytes {}-{}/{}".format(
+          offset, offset + count - 1, entry.size)
+
+    return response
+
+  def _stat_file(self, url_path) :
+    """ Return file path of url path and its stat or None if it isn't a file """
+    path = self.get_file_path(url_path)
+    if path is None :
+      return None, None
+
+    try :
+      file_stat = os.stat(path)
+    except (OSError, ValueError) :
+      return path, None
+
+    return path, file_stat if stat.S_ISREG(file_stat.st_mode) else None
+
+#
+# Help functions
+#
+def _get_file_key(file_stat) :
+  """ Return key of file version """
+  return (file_stat.st_dev, file_stat.st_ino, file_stat.st_size,
+          file_stat.st_mtime_ns)
+
+def _open_file(path) :
+  """
+    Open file and return its entry
+
+    :raise OSError: if the file can't be opened
+  """
+  file = open(path, "rb")
+  try :
+    return _FileEntry(file, os.fstat(file.fileno()), path)
+  except :
+    file.close()
+    raise
+
+def _is_not_modified(headers, entry) :
+  """ Check If-None-Match and If-Modified-Since """
+  if_none_match = headers.get(aiohttp.hdrs.IF_NONE_MATCH)
+  if if_none_match is not None :
+    return any(item.strip() in ("*", entry.etag, "W/" + entry.etag)
+               for item in if_none_match.split(","))
+
+  if_modified_since = headers.get(aiohttp.hdrs.IF_MODIFIED_SINCE)
+  if if_modified_since is not None :
+    try :
+      return entry.mtime <= \
+             email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError) :
+      return False
+
+  return False
+
+def _is_range_valid(headers, entry) :
+  """ Check If-Range """
+  if_range = headers.get(aiohttp.hdrs.IF_RANGE)
+  if if_range is None :
+    return True
+
+  if if_range.strip()[:1] in ("\"", "W") :
+    return if_range.strip() == entry.etag
+
+  return if_range.strip() == entry.last_modified
+
+def _parse_range(value, size) :
+  """
+    Parse a single byte range
+
+    :return: offset and count, None if range is ignored or False if it isn't
+             satisfiable
+  """
+  unit, _, ranges = value.partition("=")
+  if unit.strip().lower() != "bytes" or "," in ranges :
+    return None
+
+  first, _, last = ranges.strip().partition("-")
+  try :
+    if len(first) == 0 :
+      suffix = int(last)
+      if suffix <= 0 :
+        return False
+
+      offset = max(0, size - suffix)
+      return offset, size - offset
+
+    offset = int(first)
+    end = int(last) if len(last) > 0 else size - 1
+  except ValueError :
+    return None
+
+  if offset >= size or end < offset :
+    return False
+
+  end = min(end, size - 1)
+  return offset, end - offset + 1
@@ -4,23 +4,80 @@
 
 import asyncio
 import datetime
+import signal
 import sys
 import threading
+import time
+
+try :
+  import uvloop
+except ImportError :
+  uvloop = None
 
 from aiohttp import abc
+from aiohttp import hdrs
 from aiohttp import http_parser
 from aiohttp import streams
 from aiohttp import web
 from ..base.errors import *
 from ..base.log import *
+from ..base.shared_counter_store import *
 from ..base.uid_util import *
 from ..base.value import *
 from ..base.worker_thread import *
+from .listener import *
+from .load_shedder import *
 from .net_util import *
+from .rate_limiter import *
+from .request_admission import *
 from .session_factory import *
+from .socket_handoff import *
+from .web_server_supervisor import *
 
 # Export
-__all__ = ('WebServer', 'run_web_server', 'stop_web_server',)
+__all__ = ('ARG_SERVER_HOST', 'ARG_SERVER_PORT', 'ARG_REQUEST_MAX_SIZE',
+           'ARG_WORKERS', 'ARG_UVLOOP', 'ARG_DRAIN_TIMEOUT', 'ARG_HANDOFF_PATH',
+           'ARG_LISTEN', 'ARG_KEEPALIVE_TIMEOUT', 'ARG_MAX_CONNECTIONS',
+           'ARG_BACKLOG', 'ARG_READ_BUFFER_SIZE', 'ARG_MAX_HEADER_SIZE',
+           'WebServer', 'run_web_server', 'run_web_server_by_cmd_line',
+           'stop_web_server',)
+
+#
+# Command line argument names
+#
+ARG_SERVER_HOST = "server-host"
+ARG_SERVER_PORT = "server-port"
+ARG_REQUEST_MAX_SIZE = "request-max-size"
+ARG_WORKERS = "workers"
+ARG_UVLOOP = "uvloop"
+ARG_DRAIN_TIMEOUT = "drain-timeout"
+ARG_HANDOFF_PATH = "handoff-path"
+ARG_LISTEN = "listen"
+ARG_KEEPALIVE_TIMEOUT = "keepalive-timeout"
+ARG_MAX_CONNECTIONS = "max-connections"
+ARG_BACKLOG = "backlog"
+ARG_READ_BUFFER_SIZE = "read-buffer-size"
+ARG_MAX_HEADER_SIZE = "max-header-size"
+
+#: Default timeout of draining requests on stopping (in seconds)
+_DEFAULT_DRAIN_TIMEOUT = 5.0
+
+#: Interval of reporting draining progress (in seconds)
+_DRAIN_REPORT_INTERVAL = 1.0
+
+#: Time of stopping a worker after draining (in seconds)
+_WORKER_STOP_MARGIN = 5.0
+
+#
+# Connection defaults
+#
+_DEFAULT_KEEPALIVE_TIMEOUT = 75.0
+_DEFAULT_BACKLOG = 100
+_DEFAULT_READ_BUFFER_SIZE = 2**16
+_DEFAULT_MAX_HEADER_SIZE = 8190
+
+#: Maximal interval of reaping idle connections (in seconds)
+_IDLE_REAP_INTERVAL = 1.0
 
 # Json names
 _JSON_NAME_ID = "__id__"
@@ -31,8 +88,28 @@ _JSON_NAME_VERSION = "__version__"
 # Global variables
 #
 _web_server = None
+_web_server_supervisor = None
+_web_server_listeners = None
 
 
+#
+# Class _AiohttpServer
+#
+class _AiohttpServer (web.Server) :
+  """ Server of aiohttp notifies web-server about connections """
+  def __init__(self, owner, handler, **kwargs) :
+    web.Server.__init__(self, handler, **kwargs)
+
+    self._owner = owner
+
+  def connection_made(self, handler, transport) :
+    web.Server.connection_made(self, handler, transport)
+    self._owner._connection_made(handler, transport)
+
+  def connection_lost(self, handler, exc = None) :
+    web.Server.connection_lost(self, handler, exc)
+    self._owner._connection_lost(handler, exc)
+
 #
 # WebServer
 #
@@ -41,15 +118,40 @@ class WebServer (WorkerThread) :
   def __init__(
       self, server_host, server_port, server_db = None,
       init_fun = None, deinit_fun = None, server_software = None,
-      request_max_size: int = 1024**2) :
+      request_max_size: int = 1024**2, reuse_port: bool = False,
+      use_uvloop: bool = False, response_compressor = None,
+      admission = None, load_shedder = None, rate_limiter = None,
+      drain_timeout: float = _DEFAULT_DRAIN_TIMEOUT, server_sockets = None,
+      handoff_path = None, listeners = None,
+      keepalive_timeout: float = _DEFAULT_KEEPALIVE_TIMEOUT,
+      max_connections: int = None, backlog: int = _DEFAULT_BACKLOG,
+      read_buffer_size: int = _DEFAULT_READ_BUFFER_SIZE,
+      max_header_size: int = _DEFAULT_MAX_HEADER_SIZE) :
     # Initialize thread
     WorkerThread.__init__(self, 0, 1, "WebServerThread")
 
     # Web-server parameters
     self._request_max_size = request_max_size
+    self._reuse_port = reuse_port
+    self._use_uvloop = use_uvloop
+    self._uvloop_used = False
     self._server_host = server_host
     self._server_port = server_port
+    self._listeners = listeners if listeners is not None else \
+                      [ Listener(host = server_host, port = server_port) ]
+    self._keepalive_timeout = keepalive_timeout
+    self._max_connections = max_connections
+    self._backlog = backlog
+    self._read_buffer_size = read_buffer_size
+    self._max_header_size = max_header_size
     self._server_software = server_software
+    self._response_compressor = response_compressor
+    self._admission = admission
+    self._load_shedder = load_shedder
+    self._rate_limiter = rate_limiter
+    self._drain_timeout = drain_timeout
+    self._server_sockets = server_sockets
+    self._handoff_path = handoff_path
 
     # Web-server database
     self._db = server_db
@@ -61,7 +163,18 @@ class WebServer (WorkerThread) :
     # Web-server objects
     self._event_loop = None
     self._aiohttp_server = None
-    self._web_server = None
+    self._servers = list()
+    self._handoff_socket = None
+    self._handoff_task = None
+    self._handed_off = False
+    self._reaper_task = None
+
+    # Open connections: handler -> [number of requests, time of activity]
+    self._connection_states = dict()
+
+    # Requests are being handled and draining flag
+    self._in_flight_requests = 0
+    self._draining = False
 
     # Create UUID web-session and a session counter
     self._uid = create_uid()
@@ -73,8 +186,12 @@ class WebServer (WorkerThread) :
     self._error_mutex = threading.RLock()
 
     # Statistics members
+    self._startup_time = None
+    self._shutdown_time = None
     self.__started_at = None
     self.__count_time_flag = None
+    self.__counter_handles = dict()
+    self.__session_counter_handles = dict()
 
   # Destructor
   def __del__(self) :
@@ -96,6 +213,8 @@ class WebServer (WorkerThread) :
       return
 
     self.__count_time_flag = None
+    self.__counter_handles = dict()
+    self.__session_counter_handles = dict()
 
     for key in ActivityCounter.get_all_counter_names() :
      if not isinstance(key, tuple) or len(key) == 0 or key[0] != self.uid :
@@ -107,7 +226,8 @@ class WebServer (WorkerThread) :
 
   # Adds statistics counter of the web-server
   def add_counter(
-      self, name_as_list, count_time_flag = None, count_error_flag = False) :
+      self, name_as_list, count_time_flag = None, count_error_flag = False,
+      max_age = DEFAULT_MAX_AGE) :
     if self.__count_time_flag is None :
       return None
 
@@ -118,7 +238,33 @@ class WebServer (WorkerThread) :
         count_time_flag
         if count_time_flag is not None else
         self.__count_time_flag,
-        count_error_flag)
+        count_error_flag, max_age)
+
+  # Returns statistics counter of the web-server by name tuple
+  def get_counter(
+      self, name_as_tuple, count_time_flag = None, count_error_flag = False,
+      max_age = DEFAULT_MAX_AGE) :
+    """ Return the counter handle, it's resolved once and cached """
+    result = self.__counter_handles.get(name_as_tuple)
+    if result is None :
+      result = self.add_counter(
+          name_as_tuple, count_time_flag, count_error_flag, max_age)
+      if result is not None :
+        self.__counter_handles[name_as_tuple] = result
+
+    return result
+
+  # Returns statistics counter of sessions by session class
+  def get_session_counter(self, session) :
+    """ Return the counter handle of session, it's cached by session class """
+    session_class = type(session)
+    result = self.__session_counter_handles.get(session_class)
+    if result is None :
+      result = self.get_counter((session.counter_name,), None, True)
+      if result is not None :
+        self.__session_counter_handles[session_class] = result
+
+    return result
 
   # Returns all statistics counters as Value
   def get_counters_as_value(self) :
@@ -161,14 +307,14 @@ class WebServer (WorkerThread) :
       self.start_barrier.wait()
       return False
 
-    # Run loop
+    # Run loop until stop is requested by 'stopping'
     self.start_barrier.wait()
     try :
-      while True :
-        self._event_loop.run_until_complete(asyncio.sleep(1.0))
-        with self.stop_mutex :
-          if self.stop_flag :
-            break
+      with self.stop_mutex :
+        stop_flag = self.stop_flag
+
+      if not stop_flag :
+        self._event_loop.run_forever()
     except :
       with self._error_mutex :
         self._error_code = Error(errInternalServerError, sys.exc_info()[1])
@@ -186,28 +332,71 @@ class WebServer (WorkerThread) :
 
   # Start web_server
   def start(self) :
+    begin_time = time.monotonic()
     self.start_barrier = threading.Barrier(2)
     WorkerThread.start(self)
     self.start_barrier.wait()
     self.start_barrier = None
+    self._startup_time = time.monotonic() - begin_time
+    log_print_imp("Web-server started in {:.6f} s", self._startup_time)
     return self.error
 
   # Stop web-server
   def stop(self) :
     # Stop thread
-    WorkerThread.stopping(self)
+    begin_time = time.monotonic()
+    self.stopping()
     self.join()
+    self._shutdown_time = time.monotonic() - begin_time
+    log_print_imp("Web-server stopped in {:.6f} s", self._shutdown_time)
+
+  # Request to stop the event loop
+  def stopping(self) :
+    with self.stop_mutex :
+      WorkerThread.stopping(self)
+      event_loop = self._event_loop
+      if event_loop is not None :
+        try :
+          event_loop.call_soon_threadsafe(event_loop.stop)
+        except RuntimeError :
+          # The loop has been already closed
+          pass
 
   def get_new_session_number(self) :
     """ Return new session number """
     self._session_counter += 1
     return self._session_counter
 
+  @property
+  def admission(self) :
+    """ Return admission checks of requests or None """
+    return self._admission
+
+  @property
+  def backlog(self) :
+    """ Backlog of listening sockets """
+    return self._backlog
+
+  @property
+  def connections(self) :
+    """ Number of open connections """
+    return len(self._connection_states)
+
   @property
   def db(self) :
     """ Database is associated with web-server """
     return self._db
 
+  @property
+  def drain_timeout(self) :
+    """ Timeout of draining requests on stopping in seconds """
+    return self._drain_timeout
+
+  @property
+  def draining(self) :
+    """ Return True if web-server drains requests on stopping """
+    return self._draining
+
   @property
   def error(self) :
     """ Return web-server error """
@@ -219,11 +408,93 @@ class WebServer (WorkerThread) :
     """ Event loop is created by the web-server """
     return self._event_loop
 
+  @property
+  def handed_off(self) :
+    """
+      Return True if listening sockets have been handed off to a new
+      process, the web-server is stopped then and the process has to exit
+    """
+    return self._handed_off
+
+  @property
+  def handoff_path(self) :
+    """ Path of unix socket handing off listening sockets or None """
+    return self._handoff_path
+
+  @property
+  def in_flight_requests(self) :
+    """ Number of requests are being handled """
+    return self._in_flight_requests
+
+  @property
+  def keepalive_timeout(self) :
+    """ Timeout of idle keep-alive connections in seconds """
+    return self._keepalive_timeout
+
+  @property
+  def listeners(self) :
+    """ Listeners of web-server """
+    return self._listeners
+
+  @property
+  def load_shedder(self) :
+    """ Return limits of concurrent requests or None """
+    return self._load_shedder
+
+  @property
+  def max_connections(self) :
+    """ Maximal number of open connections """
+    return self._max_connections
+
+  @property
+  def max_header_size(self) :
+    """ Maximal size of request line and header field """
+    return self._max_header_size
+
+  @property
+  def rate_limiter(self) :
+    """ Return a rate limiter of clients or None """
+    return self._rate_limiter
+
+  @property
+  def read_buffer_size(self) :
+    """ Size of read buffer of request body """
+    return self._read_buffer_size
+
   @property
   def request_max_size(self):
     """ Return a request maximal size """
     return self._request_max_size
 
+  @property
+  def response_compressor(self) :
+    """ Return a compressor of responses or None """
+    return self._response_compressor
+
+  @property
+  def reuse_port(self) :
+    """ Return True if the listening socket is bound with SO_REUSEPORT """
+    return self._reuse_port
+
+  @property
+  def shutdown_time(self) :
+    """ Return duration of the last stopping in seconds """
+    return self._shutdown_time
+
+  @property
+  def sockets(self) :
+    """ Listening sockets """
+    result = list()
+    for server in self._servers :
+      result.extend(server.sockets or ())
+
+    return result
+
+  @property
+  def startup_time(self) :
+    """ Return duration of starting in seconds """
+    return self._startup_time
+
   @property
   def started_at(self) :
     """ Return a start time of the web-server """
@@ -234,6 +505,11 @@ class WebServer (WorkerThread) :
     """ Return the web-server UID """
     return self._uid
 
+  @property
+  def uvloop_used(self) :
+    """ Return True if the event loop is created by uvloop """
+    return self._uvloop_used
+
   # Static
   def web_server() :
     """ Return the web-server """
@@ -243,7 +519,15 @@ class WebServer (WorkerThread) :
   # Private: initialize server
   def _init_server(self) :
     try :
-      self._event_loop = asyncio.new_event_loop()
+      if self._use_uvloop and uvloop is not None :
+        self._event_loop = uvloop.new_event_loop()
+        self._uvloop_used = True
+      else :
+        if self._use_uvloop :
+          log_print_wrn("uvloop isn't installed, asyncio loop is used")
+
+        self._event_loop = asyncio.new_event_loop()
+
       asyncio.set_event_loop(self._event_loop)
       # Initialize DB
       if self._db is not None :
@@ -259,12 +543,53 @@ class WebServer (WorkerThread) :
           log_print_err("External initialization failed", error_code = error)
           return error
 
+      # Take listening sockets of the previous process
+      server_sockets = self._server_sockets
+      if server_sockets is None and self._handoff_path is not None :
+        error, server_sockets = receive_sockets(self._handoff_path)
+        # Nobody serves the path (warning) - the first process binds ports
+        if err_failure(error) :
+          log_print_err("Listening sockets can't be taken by handoff",
+                        error_code = error)
+          return error
+
       # Initialize web-server
-      self._aiohttp_server = web.Server(
-          self._request_handler, request_factory = self._make_request)
-      asyncio_server = self._event_loop.create_server(
-          self._aiohttp_server, self._server_host, self._server_port)
-      self._web_server = self._event_loop.run_until_complete(asyncio_server)
+      # Idle connections are reaped by web-server, aiohttp closes them later
+      # if reaping is late
+      self._aiohttp_server = _AiohttpServer(
+          self, self._request_handler, request_factory = self._make_request,
+          keepalive_timeout = self._keepalive_timeout + 2 * _IDLE_REAP_INTERVAL,
+          read_bufsize = self._read_buffer_size,
+          max_line_size = self._max_header_size,
+          max_field_size = self._max_header_size)
+      if server_sockets is not None :
+        for server_socket in server_sockets :
+          self._servers.append(self._event_loop.run_until_complete(
+              self._event_loop.create_server(
+                  self._aiohttp_server, sock = server_socket,
+                  backlog = self._backlog)))
+      else :
+        for listener in self._listeners :
+          self._servers.append(self._event_loop.run_until_complete(
+              listener.create_server(
+                  self._event_loop, self._aiohttp_server, self._reuse_port,
+                  self._backlog)))
+
+        log_print_imp("Web-server listens on {}", ", ".join(
+            [ str(listener) for listener in self._listeners ]))
+
+      # Hand off listening sockets to the next process
+      if self._handoff_path is not None :
+        error, self._handoff_socket = \
+            bind_handoff_socket(self._handoff_path)
+        if err_failure(error) :
+          return error
+
+        self._handoff_task = \
+            self._event_loop.create_task(self._serve_handoff())
+
+      self._reaper_task = \
+          self._event_loop.create_task(self._reap_idle_connections())
       self.__started_at = datetime.datetime.now(tz = datetime.timezone.utc)
     except :
       error = Error(errCannotInitServer, sys.exc_info()[1])
@@ -285,19 +610,42 @@ class WebServer (WorkerThread) :
         message, payload, protocol, writer, task, self._event_loop,
         client_max_size = self._request_max_size)
     result.processing_error = Error(errOk)
+    result.route_params = dict()
+    result.route_path = None
+    result.raw_header_index = None
     return result
 
   # Private: deinitialize server
   def _deinit_server(self) :
     try :
-      # Deinitialize web-server
-      if not self._web_server is None :
-        self._web_server.close()
-        self._event_loop.run_until_complete(self._web_server.wait_closed())
+      # Stop handing off sockets and reaping connections
+      for task in (self._handoff_task, self._reaper_task) :
+        if task is not None :
+          task.cancel()
+          self._event_loop.run_until_complete(asyncio.wait([ task ]))
+
+      self._handoff_task = None
+      self._reaper_task = None
+
+      if self._handoff_socket is not None :
+        unlink_handoff_socket(self._handoff_socket, self._handoff_path)
+        self._handoff_socket = None
+
+      # Stop accepting connections and drain requests
+      for server in self._servers :
+        server.close()
 
       if not self._aiohttp_server is None :
+        self._event_loop.run_until_complete(self._drain())
         self._event_loop.run_until_complete(self._aiohttp_server.shutdown())
 
+      for server in self._servers :
+        self._event_loop.run_until_complete(server.wait_closed())
+
+      # Socket files are kept for the process which has taken sockets
+      for listener in self._listeners :
+        listener.close(not self._handed_off)
+
       # Call an external function of deinitialization
       if self._deinit_fun is not None :
         error = self._event_loop.run_until_complete(self._deinit_fun(self))
@@ -314,7 +662,7 @@ class WebServer (WorkerThread) :
         self._event_loop.close()
 
       asyncio.set_event_loop(None)
-      self._web_server = None
+      self._servers = list()
       self._aiohttp_server = None
       self._event_loop = None
     except :
@@ -324,10 +672,141 @@ class WebServer (WorkerThread) :
 
     return Error(errOk)
 
+  # Private: wait for requests to be handled until drain timeout
+  async def _drain(self) :
+    self._draining = True
+    # Idle connections are closed at once, others after their requests
+    for connection in list(self._aiohttp_server.connections) :
+      connection.close()
+
+    begin_time = time.monotonic()
+    deadline = begin_time + self._drain_timeout
+    report_time = begin_time
+    while self._in_flight_requests > 0 :
+      now = time.monotonic()
+      if now >= deadline :
+        log_print_wrn("Draining is timed out, {} requests are cancelled",
+                      self._in_flight_requests)
+        return
+
+      if now >= report_time :
+        log_print_imp("Draining: {} requests in flight, {:.1f} s left",
+                      self._in_flight_requests, deadline - now)
+        report_time = now + _DRAIN_REPORT_INTERVAL
+
+      await asyncio.sleep(0.05)
+
+    log_print_imp("Requests are drained in {:.6f} s",
+                  time.monotonic() - begin_time)
+
+  # Private: hand off listening sockets to a connected process and stop
+  async def _serve_handoff(self) :
+    while True :
+      connection, address = \
+          await self._event_loop.sock_accept(self._handoff_socket)
+      with connection :
+        error = send_sockets(connection, self.sockets)
+
+      if err_success(error) :
+        log_print_imp("Listening sockets are handed off, web-server stops")
+        self._handed_off = True
+        self.stopping()
+        return
+
+  # Private: count a connection, it's closed over the connection limit
+  def _connection_made(self, handler, transport) :
+    if self._max_connections is not None and \
+       len(self._connection_states) >= self._max_connections :
+      transport.close()
+      counter = self.get_counter(("connection", "rejected"), False)
+      if counter is not None :
+        counter.increment()
+
+      return
+
+    self._connection_states[handler] = [ 0, time.monotonic() ]
+    # Connections can be open for any time, so they don't expire
+    counter = self.get_counter(("connection",), None, True, None)
+    if counter is not None :
+      counter.start(id(handler))
+
+  # Private: count a closed connection
+  def _connection_lost(self, handler, exc) :
+    if self._connection_states.pop(handler, None) is None :
+      return
+
+    counter = self.get_counter(("connection",), None, True, None)
+    if counter is not None :
+      counter.stop(id(handler), exc is not None)
+
+  # Private: close connections without requests for keep-alive timeout
+  async def _reap_idle_connections(self) :
+    interval = min(_IDLE_REAP_INTERVAL, self._keepalive_timeout / 2)
+    while True :
+      await asyncio.sleep(interval)
+      idle_time = time.monotonic() - self._keepalive_timeout
+      for handler, state in list(self._connection_states.items()) :
+        if state[0] != 0 or state[1] > idle_time :
+          continue
+
+        # Mark connection as reaped until it's lost
+        state[0] = -1
+        handler.close()
+        counter = self.get_counter(("connection", "idle_reaped"), False)
+        if counter is not None :
+          counter.increment()
+
   # Request handler
   @log_async_function_body()
   async def _request_handler(self, request) :
-    log_print_inf("Url:{} Remote:{}", request.url, request.remote)
+    self._in_flight_requests += 1
+    state = self._connection_states.get(request.protocol)
+    if state is not None :
+      state[0] += 1
+
+    try :
+      response = await self._handle_request(request)
+    finally :
+      self._in_flight_requests -= 1
+      if state is not None :
+        state[0] -= 1
+        state[1] = time.monotonic()
+
+    # Connection is closed after response while draining
+    if self._draining :
+      response.force_close()
+
+    return response
+
+  # Handle request by admission checks, limits and session
+  async def _handle_request(self, request) :
+    if get_log_level() >= LOG_LEVEL_INFO :
+      log_print_inf("Url:{} Remote:{}", request.url, request.remote)
+
+    response = self._admit_request(request)
+    if response is not None :
+      return response
+
+    if self._rate_limiter is not None :
+      retry_after = self._rate_limiter.check(request)
+      if retry_after is not None :
+        return self._limit_request(retry_after)
+
+    route = None
+    if self._load_shedder is not None :
+      route, reason = await self._load_shedder.acquire(
+          request.path, self.get_counter(("load_shedder", "queue"), None, True))
+      if route is None :
+        return self._shed_request(reason)
+
+    try :
+      return await self._run_session(request)
+    finally :
+      if route is not None :
+        self._load_shedder.release(route)
+
+  # Create and run session of request
+  async def _run_session(self, request) :
     try :
       session = await create_session(self, request)
       session.server_software = self._server_software
@@ -347,6 +826,80 @@ class WebServer (WorkerThread) :
 
     return response
 
+  # Admission checks of request before reading its body
+  def _admit_request(self, request) :
+    content_length = request.content_length
+    if content_length is not None and content_length > self._request_max_size :
+      error = Error(
+          errInvalidParameter,
+          "Request is too large - {} bytes (maximum: {})".format(
+              content_length, self._request_max_size))
+      status, allow = 413, None
+    elif self._admission is not None :
+      error, status, allow = self._admission.check(request)
+    else :
+      return None
+
+    if err_success(error) :
+      return None
+
+    # Rejections are counted, they're logged as warnings not to flood the log
+    # of errors by a misbehaving client
+    counter = self.get_counter(("admission", str(status)), False)
+    if counter is not None :
+      counter.increment()
+
+    log_print_wrn("Request is rejected with {}", status, error_code = error)
+
+    response = _make_error_response(error, status)
+    if allow is not None :
+      response.headers[hdrs.ALLOW] = allow
+
+    return response
+
+  # Response to request which exceeds rate limit of client
+  def _limit_request(self, retry_after) :
+    # Limited requests aren't logged to not let a client flood the log
+    counter = self.get_counter(("rate_limiter", "limited"), False)
+    if counter is not None :
+      counter.increment()
+
+    response = _make_error_response(
+        Error(errTooManyRequests, "Rate limit is exceeded"), 429)
+    response.headers[hdrs.RETRY_AFTER] = str(retry_after)
+    return response
+
+  # Response to request which is shed by overload
+  def _shed_request(self, reason) :
+    # Shed requests aren't logged to not load the overloaded server more
+    counter = self.get_counter(("load_shedder", "shed", reason), False)
+    if counter is not None :
+      counter.increment()
+
+    response = _make_error_response(
+        Error(errServiceUnavailable, "Server is overloaded"), 503)
+    response.headers[hdrs.RETRY_AFTER] = str(self._load_shedder.retry_after)
+    return response
+
+#
+# Help functions
+#
+def _make_error_response(error, status) :
+  return web.Response(
+      text = error_to_json(error), status = status,
+      content_type = "application/json", charset = "utf-8")
+
+def _get_switch_as_int(cmd_line, name, default, min_value) :
+  """ Return error and value of integer switch, default if there is none """
+  result = cmd_line.get_switch_as_int(name, default)
+  if cmd_line.has_switch(name) and (result is None or result < min_value) :
+    error = Error(errInvalidParameter, "Switch '{}' is invalid - {}".format(
+        name, cmd_line.get_switch(name)))
+    log_print_err(None, error_code = error)
+    return error, None
+
+  return Error(errOk), result
+
 #
 # Run web-server
 #
@@ -354,13 +907,84 @@ class WebServer (WorkerThread) :
 def run_web_server(
     server_host, server_port, session_factory, db = None,
     init_fun = None, deinit_fun = None, server_software = None,
-    request_max_size: int = 1024**2) :
+    request_max_size: int = 1024**2, workers: int = 1,
+    counter_store = None, use_uvloop: bool = False, **web_server_args) :
+  """
+    Run web-server
+
+    If ``workers`` is more than 1 then worker processes are forked, it has
+    to be called by the main thread then. Every worker runs own web-server
+    bound to the same port with SO_REUSEPORT and with activity counters.
+    ``db`` can be a function which creates a db-connector of a worker.
+    If ``counter_store`` (SharedCounterStore) is set then workers publish
+    their activity counters into it. If ``use_uvloop`` is set then uvloop is
+    used when it's installed. Other keyword arguments are passed to WebServer
+    (for example, ``response_compressor``).
+
+    On stopping the web-server stops accepting connections and drains
+    requests up to ``drain_timeout`` seconds. If ``handoff_path`` is set then
+    a new process started with the same path takes listening sockets of the
+    running one, which drains its requests and stops, so a restart doesn't
+    drop connections. Handoff is supported by a single process only, workers
+    are restarted without losing the port by SO_REUSEPORT. Handoff stops the
+    web-server thread only, the process keeps running: the caller has to
+    watch ``WebServer.handed_off`` (or the end of the web-server thread),
+    call ``stop_web_server`` and exit.
+
+    ``listeners`` (list of Listener) replaces ``server_host`` and
+    ``server_port`` by several TCP addresses, unix domain sockets and
+    pre-opened sockets. Unix domain sockets are opened before workers are
+    forked and are shared by them.
+
+    Connections are tuned by ``keepalive_timeout`` (idle connections are
+    closed after it), ``max_connections`` (new connections over the limit of
+    a worker are closed at once), ``backlog`` of listening sockets,
+    ``read_buffer_size`` and ``max_header_size``. Open, rejected and reaped
+    idle connections are counted by activity counters.
+  """
   global _web_server
+  global _web_server_supervisor
+  global _web_server_listeners
 
   set_session_factory(session_factory)
+  if workers > 1 :
+    if web_server_args.pop("handoff_path", None) is not None :
+      log_print_wrn("Handoff of listening sockets isn't supported by workers")
+
+    # Only TCP sockets are bound by every worker with SO_REUSEPORT
+    _web_server_listeners = web_server_args.get("listeners")
+    try :
+      for listener in _web_server_listeners or () :
+        listener.open_socket()
+    except :
+      result = Error(errCannotInitServer, sys.exc_info()[1])
+      log_print_err("Web-server failed on opening listeners",
+                    error_code = result)
+      stop_web_server()
+      return result
+
+    def worker_fun(worker_index) :
+      return _run_web_server_worker(
+          worker_index, server_host, server_port, db, init_fun, deinit_fun,
+          server_software, request_max_size, counter_store, use_uvloop,
+          web_server_args)
+
+    # Workers are killed only if they haven't drained requests in time
+    _web_server_supervisor = WebServerSupervisor(
+        workers, worker_fun, web_server_args.get(
+            "drain_timeout", _DEFAULT_DRAIN_TIMEOUT) + _WORKER_STOP_MARGIN)
+    result = _web_server_supervisor.start()
+    if err_failure(result) :
+      log_print_err("Web-server failed on starting", error_code = result)
+      _web_server_supervisor = None
+      stop_web_server()
+
+    return result
+
   _web_server = WebServer(
-      server_host, server_port, db, init_fun, deinit_fun, server_software,
-      request_max_size)
+      server_host, server_port, db if not callable(db) else db(), init_fun,
+      deinit_fun, server_software, request_max_size, use_uvloop = use_uvloop,
+      **web_server_args)
   result = _web_server.start()
   if err_failure(result) :
     log_print_err("Web-server failed on starting", result)
@@ -368,14 +992,141 @@ def run_web_server(
 
   return result
 
+#
+# Run web-server by command line
+#
+def run_web_server_by_cmd_line(
+    cmd_line, session_factory, db = None, init_fun = None, deinit_fun = None,
+    server_software = None, counter_store = None) :
+  """ Run web-server with parameters from command line """
+  listeners = None
+  if cmd_line.has_switch(ARG_LISTEN) :
+    try :
+      listeners = parse_listeners(cmd_line.get_switch(ARG_LISTEN))
+    except :
+      result = Error(errInvalidParameter, sys.exc_info()[1])
+      log_print_err("Listeners are invalid", error_code = result)
+      return result
+
+  try :
+    drain_timeout = float(
+        cmd_line.get_switch(ARG_DRAIN_TIMEOUT, _DEFAULT_DRAIN_TIMEOUT))
+    keepalive_timeout = float(
+        cmd_line.get_switch(ARG_KEEPALIVE_TIMEOUT, _DEFAULT_KEEPALIVE_TIMEOUT))
+  except :
+    result = Error(errInvalidParameter, sys.exc_info()[1])
+    log_print_err("Timeouts are invalid", error_code = result)
+    return result
+
+  use_uvloop = cmd_line.get_switch_as_bool(ARG_UVLOOP)
+  if use_uvloop is None :
+    result = Error(errInvalidParameter, "Switch '{}' is invalid - {}".format(
+        ARG_UVLOOP, cmd_line.get_switch(ARG_UVLOOP)))
+    log_print_err(None, error_code = result)
+    return result
+
+  # Integer switches: name, default value, minimal value
+  int_switches = dict()
+  for name, default, min_value in (
+      (ARG_SERVER_PORT, 8080, 0),
+      (ARG_REQUEST_MAX_SIZE, 1024**2, 1),
+      (ARG_WORKERS, 1, 1),
+      (ARG_MAX_CONNECTIONS, None, 1),
+      (ARG_BACKLOG, _DEFAULT_BACKLOG, 0),
+      (ARG_READ_BUFFER_SIZE, _DEFAULT_READ_BUFFER_SIZE, 1),
+      (ARG_MAX_HEADER_SIZE, _DEFAULT_MAX_HEADER_SIZE, 1)) :
+    result, int_switches[name] = \
+        _get_switch_as_int(cmd_line, name, default, min_value)
+    if err_failure(result) :
+      return result
+
+  return run_web_server(
+      cmd_line.get_switch(ARG_SERVER_HOST, "0.0.0.0"),
+      int_switches[ARG_SERVER_PORT],
+      session_factory, db, init_fun, deinit_fun, server_software,
+      int_switches[ARG_REQUEST_MAX_SIZE],
+      int_switches[ARG_WORKERS],
+      counter_store,
+      use_uvloop,
+      drain_timeout = drain_timeout,
+      handoff_path = cmd_line.get_switch(ARG_HANDOFF_PATH),
+      listeners = listeners,
+      keepalive_timeout = keepalive_timeout,
+      max_connections = int_switches[ARG_MAX_CONNECTIONS],
+      backlog = int_switches[ARG_BACKLOG],
+      read_buffer_size = int_switches[ARG_READ_BUFFER_SIZE],
+      max_header_size = int_switches[ARG_MAX_HEADER_SIZE])
+
 #
 # Stop web-server
 #
 @log_function_body
 def stop_web_server() :
   global _web_server
+  global _web_server_supervisor
+  global _web_server_listeners
+
+  if _web_server_supervisor is not None :
+    _web_server_supervisor.stop()
+    _web_server_supervisor = None
+
+  if _web_server_listeners is not None :
+    for listener in _web_server_listeners :
+      listener.close()
+
+    _web_server_listeners = None
+
+  if _web_server is not None :
+    _web_server.stop()
+    _web_server = None
+
+  return errOk
+
+#
+# Main function of a web-server worker process
+#
+def _run_web_server_worker(
+    worker_index, server_host, server_port, db, init_fun, deinit_fun,
+    server_software, request_max_size, counter_store, use_uvloop,
+    web_server_args) :
+  global _web_server
+
+  # Worker is stopped by the supervisor only
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  signal.pthread_sigmask(signal.SIG_BLOCK, { signal.SIGTERM })
+
+  if callable(db) :
+    db = db()
+
+  _web_server = WebServer(
+      server_host, server_port, db, init_fun, deinit_fun, server_software,
+      request_max_size, reuse_port = True, use_uvloop = use_uvloop,
+      **web_server_args)
+  # Counters of workers are served by their sessions and published to store
+  _web_server.init_activity_counters()
+
+  publisher = None
+  if counter_store is not None and \
+     err_success(counter_store.attach(worker_index)) :
+    counter_store.set_owner_alias(_web_server.uid, "web_server")
+    if db is not None :
+      counter_store.set_owner_alias(db.uid, "db")
+
+    publisher = SharedCounterPublisher(counter_store)
+    publisher.start()
+
+  result = _web_server.start()
+  if err_success(result) :
+    log_print_imp("Worker {} is running", worker_index)
+    signal.sigwait({ signal.SIGTERM })
+  else :
+    log_print_err("Worker {} failed on starting", worker_index,
+                  error_code = result)
 
   _web_server.stop()
   _web_server = None
+  if publisher is not None :
+    publisher.stop()
 
-  return errOk
+  log_print_imp("Worker {} stopped", worker_index)
+  return 0 if err_success(result) else 1
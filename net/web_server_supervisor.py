@@ -0,0 +1,249 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Module realize supervising of web-server worker processes
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+from ..base.errors import *
+from ..base.log import *
+from ..base.worker_thread import *
+
+# Export
+__all__ = ('WebServerSupervisor',)
+
+#
+# Class WebServerSupervisor
+#
+class WebServerSupervisor (WorkerThread) :
+  """
+    Thread supervises worker processes
+
+    Every worker is a forked process which runs ``worker_fun(worker_index)``
+    and exits with its result. A worker which has exited while the supervisor
+    isn't stopping is restarted, a worker which has lived less than
+    ``restart_delay`` seconds is restarted after the delay. Workers are
+    stopped by SIGTERM and are killed if they haven't exited in
+    ``stop_timeout`` seconds.
+
+    A lock held by another thread at forking stays locked in the worker, so
+    locks of the log and of activity counters are recreated in a forked
+    process by their ``os.register_at_fork`` handlers. Workers are forked
+    by the main thread only: the supervisor is started by the main thread,
+    exited workers are reaped and restarted by its SIGCHLD handler, so
+    forking and reaping don't race. Signal handlers can be set by the main
+    thread only, the thread of the supervisor only wakes the handler up by
+    SIGCHLD when a delayed restart is due.
+
+    :param workers: number of worker processes
+    :type workers: int
+    :param worker_fun: function of worker process
+    :param stop_timeout: timeout of graceful stopping of workers in seconds
+    :type stop_timeout: float
+    :param restart_delay: minimal interval between restarts in seconds
+    :type restart_delay: float
+  """
+  def __init__(self, workers, worker_fun, stop_timeout = 10.0,
+               restart_delay = 1.0) :
+    WorkerThread.__init__(self, 0.1, 1, "WebServerSupervisor")
+
+    self._workers = workers
+    self._worker_fun = worker_fun
+    self._stop_timeout = stop_timeout
+    self._restart_delay = restart_delay
+    # pid -> worker index
+    self._pids = dict()
+    # worker index -> time of start or of planned restart
+    self._started_at = dict()
+    self._restarts = dict()
+    self._restart_counter = 0
+    # Handler state: SIGCHLD handler replaced by supervisor, flags of
+    # supervising, of a signal received while supervising and of stopping
+    self._previous_sigchld_handler = None
+    self._supervising = False
+    self._supervise_again = False
+    self._stopping = False
+
+  def start(self) :
+    """ Start worker processes and supervising, it's called by main thread """
+    if threading.current_thread() is not threading.main_thread() :
+      error = Error(errCannotInitServer,
+                    "Workers can be started by the main thread only")
+      log_print_err(None, error_code = error)
+      return error
+
+    self._supervising = True
+    self._previous_sigchld_handler = \
+        signal.signal(signal.SIGCHLD, self._on_sigchld)
+    try :
+      for worker_index in range(self._workers) :
+        error = self._start_worker(worker_index)
+        if err_failure(error) :
+          self._stopping = True
+          self._restore_sigchld_handler()
+          self._stop_workers()
+          return error
+    finally :
+      self._supervising = False
+
+    WorkerThread.start(self)
+    # Workers could exit before the handler was ready to supervise
+    self._on_sigchld(signal.SIGCHLD, None)
+    return Error(errOk)
+
+  def stop(self) :
+    """ Stop supervising and worker processes """
+    self._stopping = True
+    WorkerThread.stopping(self)
+    self.join()
+    self._restore_sigchld_handler()
+    self._stop_workers()
+
+  def do_work(self) :
+    # Wake up the handler of main thread to restart workers
+    if len(self._restarts) > 0 and not self._stopping :
+      signal.pthread_kill(threading.main_thread().ident, signal.SIGCHLD)
+
+    return True
+
+  @property
+  def pids(self) :
+    """ Process IDs of running workers """
+    return list(self._pids.keys())
+
+  @property
+  def restart_counter(self) :
+    """ Number of restarts of workers """
+    return self._restart_counter
+
+  @property
+  def workers(self) :
+    """ Number of worker processes """
+    return self._workers
+
+  def _on_sigchld(self, signal_number, frame) :
+    """ Reap exited workers and restart them, it's called by main thread """
+    if self._stopping :
+      return
+
+    # Signals received while supervising are handled by the outer call
+    if self._supervising :
+      self._supervise_again = True
+      return
+
+    self._supervising = True
+    try :
+      self._supervise_again = True
+      while self._supervise_again and not self._stopping :
+        self._supervise_again = False
+        self._supervise()
+    finally :
+      self._supervising = False
+
+  def _supervise(self) :
+    # Reap exited workers
+    now = time.monotonic()
+    for pid, worker_index in list(self._pids.items()) :
+      try :
+        exited_pid, status = os.waitpid(pid, os.WNOHANG)
+      except ChildProcessError :
+        exited_pid, status = pid, -1
+
+      if exited_pid == 0 :
+        continue
+
+      del self._pids[pid]
+      log_print_err("Worker {} (pid: {}) exited (status: {})",
+                    worker_index, pid, status)
+      started_at = self._started_at.get(worker_index, now)
+      self._restarts[worker_index] = \
+          max(now, started_at + self._restart_delay)
+
+    # Restart workers
+    for worker_index, restart_at in list(self._restarts.items()) :
+      if restart_at > now or self._stopping :
+        continue
+
+      del self._restarts[worker_index]
+      self._restart_counter += 1
+      if err_failure(self._start_worker(worker_index)) :
+        self._restarts[worker_index] = now + self._restart_delay
+
+  def _restore_sigchld_handler(self) :
+    if self._previous_sigchld_handler is None :
+      return
+
+    # Signal handlers can be changed by main thread only, the handler
+    # ignores signals after stopping otherwise
+    if threading.current_thread() is threading.main_thread() :
+      signal.signal(signal.SIGCHLD, self._previous_sigchld_handler)
+      self._previous_sigchld_handler = None
+
+  def _start_worker(self, worker_index) :
+    try :
+      pid = os.fork()
+    except :
+      error = Error(errCannotInitServer, sys.exc_info()[1])
+      log_print_err("Forking worker {} failed", worker_index,
+                    error_code = error)
+      return error
+
+    if pid == 0 :
+      signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+      exit_code = 1
+      try :
+        exit_code = self._worker_fun(worker_index)
+      except :
+        log_print_err("Worker {} failed", worker_index,
+                      error_code = Error(errException, sys.exc_info()[1]))
+      finally :
+        os._exit(exit_code)
+
+    log_print_inf("Worker {} started (pid: {})", worker_index, pid)
+    self._pids[pid] = worker_index
+    self._started_at[worker_index] = time.monotonic()
+    return Error(errOk)
+
+  def _stop_workers(self) :
+    for pid in self._pids.keys() :
+      try :
+        os.kill(pid, signal.SIGTERM)
+      except ProcessLookupError :
+        pass
+
+    deadline = time.monotonic() + self._stop_timeout
+    while len(self._pids) > 0 :
+      for pid in list(self._pids.keys()) :
+        try :
+          exited_pid, status = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError :
+          exited_pid = pid
+
+        if exited_pid != 0 :
+          del self._pids[pid]
+
+      if len(self._pids) == 0 :
+        break
+
+      if time.monotonic() >= deadline :
+        for pid in self._pids.keys() :
+          log_print_err("Worker (pid: {}) is killed", pid)
+          try :
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+          except (ProcessLookupError, ChildProcessError) :
+            pass
+
+        self._pids.clear()
+        break
+
+      time.sleep(0.05)
+
+    self._restarts.clear()
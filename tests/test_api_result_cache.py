@@ -0,0 +1,83 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of ApiResultCache
+
+  Run: ``python -m unittest python_utilities.tests.test_api_result_cache``
+"""
+
+import time
+import unittest
+
+from ..base.errors import *
+from ..base.value import *
+from ..net.api_result_cache import *
+
+#
+# Class ApiResultCacheTest
+#
+class ApiResultCacheTest (unittest.TestCase) :
+  def make_key(self, json, function = "f", api_version = 1) :
+    """ Return key of arguments in json """
+    error, arguments = deserialize_json_to_value(json)
+    self.assertTrue(err_success(error))
+    return ApiResultCache.make_key(function, api_version, arguments)
+
+  def test_canonical_key(self) :
+    key = self.make_key("{\"a\":1,\"b\":{\"c\":[1,2],\"d\":\"x\"}}")
+    self.assertEqual(
+        key, self.make_key("{\"b\":{\"d\":\"x\",\"c\":[1,2]},\"a\":1}"))
+    self.assertNotEqual(
+        key, self.make_key("{\"a\":1,\"b\":{\"c\":[2,1],\"d\":\"x\"}}"))
+    self.assertNotEqual(
+        key, self.make_key("{\"a\":1,\"b\":{\"c\":[1,2],\"d\":\"x\"}}", "g"))
+    self.assertNotEqual(
+        key, self.make_key("{\"a\":1,\"b\":{\"c\":[1,2],\"d\":\"x\"}}", "f", 2))
+
+  def test_hit_and_miss(self) :
+    cache = ApiResultCache()
+    key = self.make_key("{\"a\":1}")
+    self.assertIsNone(cache.get(key))
+    self.assertIsNone(cache.get(None))
+    cache.put(key, 3, "{\"b\":2}")
+    self.assertEqual(cache.get(key), (3, "{\"b\":2}"))
+    self.assertEqual((cache.hit_counter, cache.miss_counter), (1, 2))
+
+  def test_ttl(self) :
+    cache = ApiResultCache(ttl = 0.05)
+    key = self.make_key("{}")
+    cache.put(key, 0, "1")
+    self.assertIsNotNone(cache.get(key))
+    time.sleep(0.1)
+    self.assertIsNone(cache.get(key))
+    self.assertEqual((cache.size, cache.bytes), (0, 0))
+
+  def test_lru(self) :
+    cache = ApiResultCache(max_size = 2)
+    keys = [ self.make_key("{{\"a\":{}}}".format(i)) for i in range(3) ]
+    cache.put(keys[0], 0, "0")
+    cache.put(keys[1], 0, "1")
+    # The least recently used result is evicted
+    cache.get(keys[0])
+    cache.put(keys[2], 0, "2")
+    self.assertEqual(cache.size, 2)
+    self.assertIsNone(cache.get(keys[1]))
+    self.assertIsNotNone(cache.get(keys[0]))
+    self.assertIsNotNone(cache.get(keys[2]))
+
+  def test_max_bytes(self) :
+    cache = ApiResultCache(max_bytes = 5)
+    cache.put("a", 0, "123")
+    cache.put("b", 0, "45")
+    self.assertEqual((cache.size, cache.bytes), (2, 5))
+    cache.put("c", 0, "6")
+    self.assertEqual((cache.size, cache.bytes), (2, 3))
+    self.assertIsNone(cache.get("a"))
+    # A result longer than the limit isn't cached
+    cache.put("d", 0, "123456")
+    self.assertIsNone(cache.get("d"))
+
+if __name__ == "__main__" :
+  unittest.main()
@@ -0,0 +1,107 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of ApiScheduler
+
+  Run: ``python -m unittest python_utilities.tests.test_api_scheduler``
+"""
+
+import asyncio
+import unittest
+
+from ..net.api_scheduler import *
+
+#
+# Class ApiSchedulerTest
+#
+class ApiSchedulerTest (unittest.TestCase) :
+  def dispatch(self, scheduler, funs, calls) :
+    """
+      Queue calls of every function while a call runs and return priority
+      classes in order of starting, a started call releases its slot at once
+    """
+    async def run() :
+      async def blocker() :
+        pass
+
+      await scheduler.acquire("blocker", blocker)
+      started = list()
+
+      async def call(name, fun) :
+        await scheduler.acquire(name, fun)
+        started.append(getattr(fun, "api_priority", PRIORITY_NORMAL))
+        scheduler.release(name)
+
+      tasks = [ asyncio.ensure_future(call(name, fun))
+                for name, fun in funs.items() for i in range(calls) ]
+      await asyncio.sleep(0)
+      scheduler.release("blocker")
+      await asyncio.gather(*tasks)
+      return started
+
+    return asyncio.run(run())
+
+  def make_funs(self, priorities) :
+    """ Return functions annotated by priority classes """
+    funs = dict()
+    for priority in priorities :
+      @api_function(priority = priority)
+      async def fun(session, arguments) :
+        pass
+
+      funs[priority] = fun
+
+    return funs
+
+  def test_weighted_round_robin(self) :
+    scheduler = ApiScheduler(max_concurrency = 1)
+    started = self.dispatch(
+        scheduler, self.make_funs((PRIORITY_LOW, PRIORITY_NORMAL,
+                                   PRIORITY_HIGH)), 26)
+    # While all classes wait the ratio of starts is the ratio of weights
+    first = started[:13]
+    self.assertEqual(first.count(PRIORITY_HIGH), 8)
+    self.assertEqual(first.count(PRIORITY_NORMAL), 4)
+    self.assertEqual(first.count(PRIORITY_LOW), 1)
+    # Smooth round-robin doesn't start a class many times in a row
+    self.assertNotEqual(first[:4], [ PRIORITY_HIGH ] * 4)
+    self.assertEqual(sorted(started), sorted(
+        [ PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH ] * 26))
+
+  def test_custom_weights(self) :
+    scheduler = ApiScheduler(max_concurrency = 1,
+                             weights = { "gold" : 3, "bronze" : 1 })
+    started = self.dispatch(scheduler, self.make_funs(("gold", "bronze")), 20)
+    self.assertEqual(started[:20].count("gold"), 15)
+    self.assertEqual(started[:20].count("bronze"), 5)
+
+  def test_unknown_priority(self) :
+    scheduler = ApiScheduler(max_concurrency = 1,
+                             weights = { "gold" : 3, "bronze" : 1 })
+
+    async def run() :
+      @api_function(priority = "silver")
+      async def fun(session, arguments) :
+        pass
+
+      await scheduler.acquire("a", fun)
+      task = asyncio.ensure_future(scheduler.acquire("b", fun))
+      await asyncio.sleep(0)
+      # A call of unknown class waits in the class of the lowest weight
+      queue_sizes = scheduler.queue_sizes
+      scheduler.release("a")
+      await task
+      return queue_sizes
+
+    self.assertEqual(asyncio.run(run()), { "gold" : 0, "bronze" : 1 })
+    self.assertEqual(scheduler.in_flight, 1)
+
+    scheduler = ApiScheduler(weights = { "gold" : 3, PRIORITY_NORMAL : 1 })
+    self.assertEqual(scheduler._default_priority, PRIORITY_NORMAL)
+    with self.assertRaises(ValueError) :
+      ApiScheduler(weights = dict())
+
+if __name__ == "__main__" :
+  unittest.main()
@@ -0,0 +1,84 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of ApiSession function calls
+
+  Run: ``python -m unittest python_utilities.tests.test_api_session``
+"""
+
+import asyncio
+import time
+import unittest
+
+from ..base.errors import *
+from ..base.value import *
+from ..net.api_session import *
+
+#
+# Class _WebServer
+#
+class _WebServer :
+  """ Web-server without counters """
+  uid = "test"
+
+  def get_new_session_number(self) :
+    return 1
+
+  def get_counter(self, *args) :
+    return None
+
+#
+# Class ApiSessionTest
+#
+class ApiSessionTest (unittest.TestCase) :
+  def setUp(self) :
+    self.called = list()
+
+  def call(self, json, function_dependency_map = None) :
+    """ Return error and json of calling functions of request """
+    async def slow_success(session, arguments) :
+      await asyncio.sleep(0.05)
+      self.called.append("a")
+      return Error(errOk), Value(1)
+
+    async def failure(session, arguments) :
+      self.called.append("b")
+      return Error(errFuncFailed, "Function has failed"), None
+
+    async def success(session, arguments) :
+      self.called.append("c")
+      return Error(errOk), Value(3)
+
+    session = ApiSession(
+        _WebServer(), 1, "test",
+        { "a" : slow_success, "b" : failure, "c" : success },
+        function_dependency_map)
+    error, api_request = deserialize_json_to_value(json)
+    self.assertTrue(err_success(error))
+    session._phase_time = time.monotonic_ns()
+    return asyncio.run(session._process_api_request(api_request))
+
+  def test_failed_dependency(self) :
+    error, json = self.call("{\"a\":{},\"b\":{},\"c\":{}}", { "c" : ("b",) })
+    self.assertTrue(err_failure(error))
+    self.assertEqual(sorted(self.called), [ "a", "b" ])
+    self.assertIn("\"a\":1", json)
+    self.assertNotIn("\"c\"", json)
+
+  def test_function_after_failure(self) :
+    error, json = self.call("{\"b\":{},\"a\":{},\"c\":{}}")
+    self.assertTrue(err_failure(error))
+    self.assertEqual(self.called, [ "b" ])
+    self.assertNotIn("\"a\"", json)
+    self.assertNotIn("\"c\"", json)
+
+  def test_success(self) :
+    error, json = self.call("{\"a\":{},\"c\":{}}", { "c" : ("a",) })
+    self.assertTrue(err_success(error))
+    self.assertEqual(self.called, [ "a", "c" ])
+    self.assertEqual(json, "{\"a\":1,\"c\":3}")
+
+if __name__ == "__main__" :
+  unittest.main()
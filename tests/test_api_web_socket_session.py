@@ -0,0 +1,119 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of ApiWebSocketSession messages
+
+  Run: ``python -m unittest python_utilities.tests.test_api_web_socket_session``
+"""
+
+import aiohttp
+import asyncio
+import json
+import unittest
+
+from ..base.errors import *
+from ..base.value import *
+from ..net.api_web_socket_session import *
+from ..net.session_router import *
+from .web_server_util import *
+
+#: Maximal number of messages processed at once in tests
+_MAX_IN_FLIGHT = 2
+
+#
+# Class ApiWebSocketSessionTest
+#
+class ApiWebSocketSessionTest (unittest.TestCase) :
+  @classmethod
+  def setUpClass(cls) :
+    cls.in_flight = 0
+    cls.max_in_flight = 0
+
+    async def echo(session, arguments) :
+      return Error(errOk), arguments
+
+    async def slow(session, arguments) :
+      cls.in_flight += 1
+      cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+      await asyncio.sleep(0.05)
+      cls.in_flight -= 1
+      return Error(errOk), Value(1)
+
+    router = SessionRouter()
+    router.add_exact(
+        "/ws", ApiWebSocketSession, 1, "ws",
+        { "echo" : echo, "slow" : slow }, max_in_flight = _MAX_IN_FLIGHT)
+    cls.server = TestWebServer(router.session_factory)
+    cls.server.__enter__()
+
+  @classmethod
+  def tearDownClass(cls) :
+    cls.server.__exit__(None, None, None)
+
+  def exchange(self, messages, binary_flag = False) :
+    """ Send messages and return json of responses """
+    async def run() :
+      async with aiohttp.ClientSession() as client :
+        async with client.ws_connect(
+            self.server.url("/ws?api_version=1")) as web_socket :
+          for message in messages :
+            if binary_flag :
+              await web_socket.send_bytes(message.encode())
+            else :
+              await web_socket.send_str(message)
+
+          return [ json.loads(await web_socket.receive_str(timeout = 5))
+                   for message in messages ]
+
+    return asyncio.run(run())
+
+  def test_id(self) :
+    responses = self.exchange(
+        [ "{\"id\":7,\"request\":{\"echo\":{\"a\":1}}}",
+          "{\"id\":\"x\",\"request\":{\"echo\":{}}}" ])
+    responses.sort(key = lambda response : str(response["id"]))
+    self.assertEqual(responses, [
+        { "id" : 7, "response" : { "echo" : { "a" : 1 } } },
+        { "id" : "x", "response" : { "echo" : {} } } ])
+
+  def test_null_id(self) :
+    response, = self.exchange([ "{\"id\":null,\"request\":{\"echo\":{}}}" ])
+    self.assertEqual(response, { "id" : None, "response" : { "echo" : {} } })
+
+  def test_missing_id(self) :
+    response, = self.exchange([ "{\"request\":{\"echo\":{}}}" ])
+    self.assertEqual(response, { "id" : None, "response" : { "echo" : {} } })
+
+  def test_invalid_id(self) :
+    response, = self.exchange([ "{\"id\":[1],\"request\":{\"echo\":{}}}" ])
+    self.assertIsNone(response["id"])
+    self.assertIn("error", response["response"])
+
+  def test_invalid_message(self) :
+    response, = self.exchange([ "{\"id\":3}" ])
+    self.assertEqual(response["id"], 3)
+    self.assertIn("error", response["response"])
+
+    response, = self.exchange([ "{" ])
+    self.assertIsNone(response["id"])
+    self.assertIn("error", response["response"])
+
+  def test_binary_message(self) :
+    response, = self.exchange(
+        [ "{\"id\":1,\"request\":{\"echo\":{}}}" ], True)
+    self.assertIsNone(response["id"])
+    self.assertIn("error", response["response"])
+
+  def test_max_in_flight(self) :
+    type(self).max_in_flight = 0
+    responses = self.exchange(
+        [ "{{\"id\":{},\"request\":{{\"slow\":{{}}}}}}".format(i)
+          for i in range(6) ])
+    self.assertEqual(sorted(response["id"] for response in responses),
+                     list(range(6)))
+    self.assertEqual(type(self).max_in_flight, _MAX_IN_FLIGHT)
+
+if __name__ == "__main__" :
+  unittest.main()
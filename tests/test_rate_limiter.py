@@ -0,0 +1,159 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of RateLimiter
+
+  Run: ``python -m unittest python_utilities.tests.test_rate_limiter``
+"""
+
+import aiohttp
+import asyncio
+import os
+import tempfile
+import unittest
+
+from aiohttp import web
+from multidict import CIMultiDict
+from unittest import mock
+from ..base.errors import *
+from ..net import rate_limiter
+from ..net.listener import *
+from ..net.rate_limiter import *
+from ..net.session_router import *
+from ..net.session_in import *
+from .web_server_util import *
+
+#
+# Class _Time
+#
+class _Time :
+  """ Time module with a clock moved by tests """
+  def __init__(self) :
+    self.now = 1000.0
+
+  def monotonic(self) :
+    return self.now
+
+#
+# Class _Request
+#
+class _Request :
+  """ Request with headers and remote address """
+  def __init__(self, remote = "10.0.0.1", headers = None) :
+    self.remote = remote
+    self.headers = CIMultiDict(headers or dict())
+    self.transport = None
+
+#
+# Class _Session
+#
+class _Session (SessionIn) :
+  """ Session answers by an empty response """
+  def __init__(self, web_server) :
+    SessionIn.__init__(self, web_server, "test")
+
+  async def _do_work(self) :
+    await self.set_response(web.Response(text = ""))
+    return Error(errOk)
+
+#
+# Class TokenBucketTest
+#
+class TokenBucketTest (unittest.TestCase) :
+  def setUp(self) :
+    self.time = _Time()
+    patcher = mock.patch.object(rate_limiter, "time", self.time)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_burst_and_refill(self) :
+    limiter = RateLimiter(rate = 2.0, burst = 3)
+    request = _Request()
+    self.assertEqual([ limiter.check(request) for i in range(3) ],
+                     [ None ] * 3)
+    self.assertEqual(limiter.check(request), 1)
+    self.assertEqual(limiter.limited_counter, 1)
+
+    # A token is refilled in 1 / rate seconds
+    self.time.now += 0.5
+    self.assertIsNone(limiter.check(request))
+    self.assertIsNotNone(limiter.check(request))
+
+    # Tokens aren't refilled over burst
+    self.time.now += 100.0
+    self.assertEqual([ limiter.check(request) for i in range(4) ],
+                     [ None, None, None, 1 ])
+
+    # Other clients have own buckets
+    self.assertIsNone(limiter.check(_Request("10.0.0.2")))
+    self.assertEqual(limiter.clients, 2)
+
+  def test_retry_after(self) :
+    limiter = RateLimiter(rate = 0.1, burst = 1)
+    request = _Request()
+    self.assertIsNone(limiter.check(request))
+    self.assertEqual(limiter.check(request), 10)
+    self.time.now += 4.0
+    self.assertEqual(limiter.check(request), 6)
+
+  def test_compact(self) :
+    limiter = RateLimiter(rate = 1.0, burst = 2, compact_interval = 10.0)
+    limiter.check(_Request("10.0.0.1"))
+    limiter.check(_Request("10.0.0.2"))
+    limiter.check(_Request("10.0.0.2"))
+    self.time.now += 1.5
+    limiter.compact()
+    # The bucket of the first client is full and is removed
+    self.assertEqual(limiter.clients, 1)
+
+  def test_key(self) :
+    limiter = RateLimiter(rate = 1.0, burst = 1, key_header = "X-Api-Key")
+    self.assertEqual(limiter.get_key(_Request()), "10.0.0.1")
+    self.assertEqual(
+        limiter.get_key(_Request(headers = { "x-api-key" : "k" })), "k")
+    self.assertEqual(limiter.get_key(_Request(
+        "", { "X-Forwarded-For" : "1.1.1.1, 2.2.2.2" })), "2.2.2.2")
+
+#
+# Class UnixSocketTest
+#
+class UnixSocketTest (unittest.TestCase) :
+  def setUp(self) :
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    self.path = os.path.join(self.directory.name, "api.sock")
+
+  def get(self, count, headers = None) :
+    """ Return statuses and Retry-After of requests by unix socket """
+    async def run() :
+      result = list()
+      connector = aiohttp.UnixConnector(path = self.path)
+      async with aiohttp.ClientSession(connector = connector) as client :
+        for i in range(count) :
+          async with client.get("http://localhost/",
+                                headers = headers) as response :
+            result.append(
+                (response.status, response.headers.get("Retry-After")))
+
+      return result
+
+    return asyncio.run(run())
+
+  def test_keys(self) :
+    limiter = RateLimiter(rate = 0.5, burst = 1)
+    router = SessionRouter()
+    router.add_prefix("/", _Session)
+    with TestWebServer(router.session_factory, rate_limiter = limiter,
+                       listeners = [ Listener(path = self.path) ]) :
+      self.assertEqual(self.get(2), [ (200, None), (429, "2") ])
+      # Clients of a proxy are keyed by the address added by the proxy
+      headers = { "X-Forwarded-For" : "1.1.1.1, 2.2.2.2" }
+      self.assertEqual(self.get(2, headers), [ (200, None), (429, "2") ])
+
+    self.assertEqual(sorted(limiter._buckets.keys()),
+                     sorted([ "uid:{}".format(os.getuid()), "2.2.2.2" ]))
+
+if __name__ == "__main__" :
+  unittest.main()
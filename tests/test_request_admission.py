@@ -0,0 +1,73 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of RequestAdmission
+
+  Run: ``python -m unittest python_utilities.tests.test_request_admission``
+"""
+
+import aiohttp
+import asyncio
+import unittest
+
+from unittest import mock
+from ..net import web_server
+from ..net.request_admission import *
+from ..net.session_router import *
+from .web_server_util import *
+
+#
+# Class RequestAdmissionTest
+#
+class RequestAdmissionTest (unittest.TestCase) :
+  @classmethod
+  def setUpClass(cls) :
+    admission = RequestAdmission()
+    admission.add_rule("/api", methods = ("POST",),
+                       content_types = ("application/json",),
+                       max_api_version = 2, max_content_length = 100)
+    cls.server = TestWebServer(SessionRouter().session_factory,
+                               admission = admission)
+    cls.server.__enter__()
+
+  @classmethod
+  def tearDownClass(cls) :
+    cls.server.__exit__(None, None, None)
+
+  def request(self, method, path, headers = None, data = None) :
+    """ Return status and Allow header of response """
+    async def run() :
+      async with aiohttp.ClientSession() as client :
+        async with client.request(
+            method, self.server.url(path), headers = headers,
+            data = data) as response :
+          return response.status, response.headers.get("Allow")
+
+    return asyncio.run(run())
+
+  def test_rejections(self) :
+    json_type = { "Content-Type" : "application/json; api_version=1" }
+    with mock.patch.object(web_server, "log_print_err") as log_print_err :
+      self.assertEqual(self.request("GET", "/api/a"), (405, "POST"))
+      self.assertEqual(
+          self.request("POST", "/api/a", json_type, b"x" * 101)[0], 413)
+      self.assertEqual(self.request(
+          "POST", "/api/a", { "Content-Type" : "text/plain" }, b"")[0], 415)
+      self.assertEqual(self.request(
+          "POST", "/api/a", { "Content-Type" : "application/json" },
+          b"")[0], 400)
+      self.assertEqual(self.request(
+          "POST", "/api/a",
+          { "Content-Type" : "application/json; api_version=3" }, b"")[0],
+          400)
+
+    # Rejections are counted, not logged as errors
+    log_print_err.assert_not_called()
+    for status, count in (("405", 1), ("413", 1), ("415", 1), ("400", 2)) :
+      counter = self.server.web_server.get_counter(("admission", status))
+      self.assertEqual(counter.counter, count, status)
+
+if __name__ == "__main__" :
+  unittest.main()
@@ -0,0 +1,105 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of SessionRouter
+
+  Run: ``python -m unittest python_utilities.tests.test_session_router``
+"""
+
+import asyncio
+import unittest
+
+from ..base.errors import *
+from ..net.session_router import *
+
+#
+# Class _Session
+#
+class _Session :
+  """ Session records arguments of its creation """
+  def __init__(self, web_server, *args, **kwargs) :
+    self.web_server = web_server
+    self.args = args
+    self.kwargs = kwargs
+
+#
+# Class _Request
+#
+class _Request :
+  """ Request with a path only """
+  def __init__(self, path) :
+    self.path = path
+    self.route_params = dict()
+    self.route_path = None
+
+#
+# Class SessionRouterTest
+#
+class SessionRouterTest (unittest.TestCase) :
+  def setUp(self) :
+    self.router = SessionRouter()
+    for error in (
+        self.router.add_exact("/metrics", "metrics"),
+        self.router.add_exact("/api/users/me", "me"),
+        self.router.add_route("/api/users/{user_id}", "user"),
+        self.router.add_route("/api/users/{user_id}/items/{item_id}", "item"),
+        self.router.add_prefix("/static", "static"),
+        self.router.add_prefix("/static/images", "images")) :
+      self.assertTrue(err_success(error))
+
+  def resolve(self, path) :
+    """ Return session class of route (or None) and path parameters """
+    route, params = self.router.resolve(path)
+    return route.session_class if route is not None else None, params
+
+  def test_exact(self) :
+    self.assertEqual(self.resolve("/metrics"), ("metrics", dict()))
+    self.assertEqual(self.resolve("//metrics/"), ("metrics", dict()))
+    self.assertEqual(self.resolve("/metrics/x"), (None, dict()))
+
+  def test_param(self) :
+    self.assertEqual(self.resolve("/api/users/5"),
+                     ("user", { "user_id" : "5" }))
+    self.assertEqual(self.resolve("/api/users/5/items/7"),
+                     ("item", { "user_id" : "5", "item_id" : "7" }))
+    self.assertEqual(self.resolve("/api/users/5/items"), (None, dict()))
+    self.assertEqual(self.resolve("/api/users"), (None, dict()))
+
+  def test_exact_before_param(self) :
+    self.assertEqual(self.resolve("/api/users/me"), ("me", dict()))
+
+  def test_prefix(self) :
+    self.assertEqual(self.resolve("/static"), ("static", dict()))
+    self.assertEqual(self.resolve("/static/a.css"), ("static", dict()))
+    self.assertEqual(self.resolve("/static/images/a/b.png"),
+                     ("images", dict()))
+    self.assertEqual(self.resolve("/staticx"), (None, dict()))
+
+  def test_conflict(self) :
+    error = self.router.add_route("/api/users/{id}/orders", "orders")
+    self.assertEqual(error.error_code, errInvalidParameter)
+    # The conflicting route isn't added
+    self.assertEqual(self.resolve("/api/users/5/orders"), (None, dict()))
+    self.assertEqual(self.resolve("/api/users/5"),
+                     ("user", { "user_id" : "5" }))
+    self.assertTrue(err_success(
+        self.router.add_route("/api/users/{user_id}/orders", "orders")))
+    self.assertEqual(self.resolve("/api/users/5/orders"),
+                     ("orders", { "user_id" : "5" }))
+
+  def test_session_factory(self) :
+    self.router.add_exact("/args", _Session, 1, name = "a")
+    request = _Request("/unknown")
+    self.assertIsNone(asyncio.run(self.router.session_factory(None, request)))
+
+    request = _Request("/args")
+    session = asyncio.run(self.router.session_factory("server", request))
+    self.assertEqual((session.web_server, session.args, session.kwargs),
+                     ("server", (1,), { "name" : "a" }))
+    self.assertEqual(request.route_path, "/args")
+    self.assertEqual(request.route_params, dict())
+
+if __name__ == "__main__" :
+  unittest.main()
@@ -0,0 +1,215 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of StaticFileSession and FileDescriptorCache
+
+  Run: ``python -m unittest python_utilities.tests.test_static_file_session``
+"""
+
+import aiohttp
+import asyncio
+import os
+import tempfile
+import unittest
+
+from yarl import URL
+from ..net.session_router import *
+from ..net.static_file_session import *
+from ..net.static_file_session import _is_not_modified
+from ..net.static_file_session import _is_range_valid
+from ..net.static_file_session import _open_file
+from ..net.static_file_session import _parse_range
+from .web_server_util import *
+
+#: Content of the test file
+_DATA = b"0123456789"
+
+#
+# Class HeaderTest
+#
+class HeaderTest (unittest.TestCase) :
+  def setUp(self) :
+    self.directory = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.directory.name, "data.txt")
+    with open(self.path, "wb") as file :
+      file.write(_DATA)
+
+    self.entry = _open_file(self.path)
+
+  def tearDown(self) :
+    self.entry.file.close()
+    self.directory.cleanup()
+
+  def test_parse_range(self) :
+    self.assertEqual(_parse_range("bytes=2-5", 10), (2, 4))
+    self.assertEqual(_parse_range("bytes=2-", 10), (2, 8))
+    self.assertEqual(_parse_range("bytes=5-100", 10), (5, 5))
+    self.assertEqual(_parse_range("bytes=-3", 10), (7, 3))
+    self.assertEqual(_parse_range("bytes=-30", 10), (0, 10))
+    self.assertFalse(_parse_range("bytes=10-", 10))
+    self.assertFalse(_parse_range("bytes=5-2", 10))
+    self.assertFalse(_parse_range("bytes=-0", 10))
+    self.assertIsNone(_parse_range("items=1-2", 10))
+    self.assertIsNone(_parse_range("bytes=1-2,4-5", 10))
+    self.assertIsNone(_parse_range("bytes=a-b", 10))
+
+  def test_if_range(self) :
+    entry = self.entry
+    self.assertTrue(_is_range_valid(dict(), entry))
+    self.assertTrue(_is_range_valid({ "If-Range" : entry.etag }, entry))
+    self.assertFalse(_is_range_valid({ "If-Range" : "\"other\"" }, entry))
+    self.assertTrue(
+        _is_range_valid({ "If-Range" : entry.last_modified }, entry))
+    self.assertFalse(_is_range_valid(
+        { "If-Range" : "Thu, 01 Jan 1970 00:00:00 GMT" }, entry))
+
+  def test_not_modified(self) :
+    entry = self.entry
+    self.assertFalse(_is_not_modified(dict(), entry))
+    self.assertTrue(
+        _is_not_modified({ "If-None-Match" : "\"a\", " + entry.etag }, entry))
+    self.assertTrue(_is_not_modified({ "If-None-Match" : "*" }, entry))
+    self.assertFalse(_is_not_modified({ "If-None-Match" : "\"a\"" }, entry))
+    self.assertTrue(_is_not_modified(
+        { "If-Modified-Since" : entry.last_modified }, entry))
+    self.assertFalse(_is_not_modified(
+        { "If-Modified-Since" : "Thu, 01 Jan 1970 00:00:00 GMT" }, entry))
+    self.assertFalse(
+        _is_not_modified({ "If-Modified-Since" : "yesterday" }, entry))
+
+#
+# Class FileDescriptorCacheTest
+#
+class FileDescriptorCacheTest (unittest.TestCase) :
+  def setUp(self) :
+    self.directory = tempfile.TemporaryDirectory()
+    self.paths = list()
+    for name in ("a", "b") :
+      path = os.path.join(self.directory.name, name)
+      with open(path, "wb") as file :
+        file.write(_DATA)
+
+      self.paths.append(path)
+
+  def tearDown(self) :
+    self.directory.cleanup()
+
+  def test_users_and_eviction(self) :
+    cache = FileDescriptorCache(max_files = 1)
+    path_a, path_b = self.paths
+    self.assertIsNone(cache.acquire(path_a, os.stat(path_a)))
+    entry_a = _open_file(path_a)
+    cache.add(path_a, entry_a)
+    self.assertIs(cache.acquire(path_a, os.stat(path_a)), entry_a)
+    self.assertEqual(entry_a.users, 2)
+    self.assertEqual((cache.hit_counter, cache.miss_counter), (1, 1))
+
+    # The evicted file is closed by its last user
+    entry_b = _open_file(path_b)
+    cache.add(path_b, entry_b)
+    self.assertEqual(cache.size, 1)
+    self.assertTrue(entry_a.evicted)
+    cache.release(entry_a)
+    self.assertFalse(entry_a.file.closed)
+    cache.release(entry_a)
+    self.assertTrue(entry_a.file.closed)
+
+    # A changed file isn't served from the cache
+    cache.release(entry_b)
+    with open(path_b, "ab") as file :
+      file.write(b"+")
+
+    self.assertIsNone(cache.acquire(path_b, os.stat(path_b)))
+    self.assertTrue(entry_b.evicted)
+    self.assertTrue(entry_b.file.closed)
+    self.assertEqual(cache.size, 0)
+
+  def test_clear(self) :
+    cache = FileDescriptorCache()
+    entry = _open_file(self.paths[0])
+    cache.add(self.paths[0], entry)
+    cache.clear()
+    self.assertFalse(entry.file.closed)
+    cache.release(entry)
+    self.assertTrue(entry.file.closed)
+
+#
+# Class StaticFileSessionTest
+#
+class StaticFileSessionTest (unittest.TestCase) :
+  @classmethod
+  def setUpClass(cls) :
+    cls.directory = tempfile.TemporaryDirectory()
+    cls.root_path = os.path.join(cls.directory.name, "root")
+    os.mkdir(cls.root_path)
+    with open(os.path.join(cls.root_path, "data.txt"), "wb") as file :
+      file.write(_DATA)
+
+    with open(os.path.join(cls.directory.name, "secret.txt"), "wb") as file :
+      file.write(b"secret")
+
+    router = SessionRouter()
+    router.add_prefix("/files", StaticFileSession, cls.root_path, "/files",
+                      FileDescriptorCache())
+    cls.server = TestWebServer(router.session_factory)
+    cls.server.__enter__()
+
+  @classmethod
+  def tearDownClass(cls) :
+    cls.server.__exit__(None, None, None)
+    cls.directory.cleanup()
+
+  def get(self, path, headers = None) :
+    """ Return status, headers and body of response, path isn't normalized """
+    async def run() :
+      async with aiohttp.ClientSession() as client :
+        async with client.get(URL(self.server.url(path), encoded = True),
+                              headers = headers) as response :
+          return response.status, response.headers, await response.read()
+
+    return asyncio.run(run())
+
+  def test_file(self) :
+    status, headers, body = self.get("/files/data.txt")
+    self.assertEqual((status, body), (200, _DATA))
+    self.assertEqual(headers["Content-Type"], "text/plain")
+
+    status, headers, body = \
+        self.get("/files/data.txt", { "If-None-Match" : headers["ETag"] })
+    self.assertEqual((status, body), (304, b""))
+
+  def test_range(self) :
+    status, headers, body = \
+        self.get("/files/data.txt", { "Range" : "bytes=2-4" })
+    self.assertEqual((status, body), (206, b"234"))
+    self.assertEqual(headers["Content-Range"], "bytes 2-4/10")
+
+    status, headers, body = \
+        self.get("/files/data.txt", { "Range" : "bytes=20-" })
+    self.assertEqual(status, 416)
+    self.assertEqual(headers["Content-Range"], "bytes */10")
+
+  def test_not_found(self) :
+    for path in ("/files/missing.txt", "/files/", "/files/%00",
+                 "/files/data.txt%00.png") :
+      status, headers, body = self.get(path)
+      self.assertEqual(status, 404, path)
+
+  def test_traversal(self) :
+    status, headers, body = self.get("/files/%2E%2E/secret.txt")
+    self.assertEqual(status, 404)
+
+    session = StaticFileSession(self.server.web_server, self.root_path,
+                                "/files")
+    self.assertIsNone(session.get_file_path("/files/../secret.txt"))
+    self.assertIsNone(session.get_file_path("/files/a/../../secret.txt"))
+    self.assertIsNone(session.get_file_path("/other/data.txt"))
+    self.assertIsNone(session.get_file_path("/files/\0"))
+    self.assertEqual(session.get_file_path("/files/data.txt"),
+                     os.path.join(os.path.realpath(self.root_path),
+                                  "data.txt"))
+
+if __name__ == "__main__" :
+  unittest.main()
@@ -0,0 +1,104 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of WebServer
+
+  Run: ``python -m unittest python_utilities.tests.test_web_server``
+"""
+
+import socket
+import time
+import unittest
+
+from ..base.cmd_line_util import *
+from ..base.errors import *
+from ..net.web_server import *
+from .web_server_util import *
+
+#
+# Class CmdLineTest
+#
+class CmdLineTest (unittest.TestCase) :
+  def run_by_cmd_line(self, *argv) :
+    """ Return error of running web-server by command line """
+    cmd_line = CommandLine()
+    cmd_line.init_from_argv([ "test" ] + list(argv))
+    return run_web_server_by_cmd_line(cmd_line, None)
+
+  def test_invalid_int_switch(self) :
+    for argv in ("--workers=abc", "--workers=0", "--server-port=x",
+                 "--request-max-size=") :
+      error = self.run_by_cmd_line(argv)
+      self.assertEqual(error.error_code, errInvalidParameter, argv)
+
+  def test_invalid_connection_switch(self) :
+    for argv in ("--max-connections=0", "--backlog=-1",
+                 "--read-buffer-size=big", "--max-header-size=1.5") :
+      error = self.run_by_cmd_line(argv)
+      self.assertEqual(error.error_code, errInvalidParameter, argv)
+
+#
+# Class ConnectionTest
+#
+class ConnectionTest (unittest.TestCase) :
+  def wait_for(self, condition, timeout = 3.0) :
+    """ Wait for the condition to be true """
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline :
+      time.sleep(0.02)
+
+    return condition()
+
+  def test_connection_counters(self) :
+    with TestWebServer(None, max_connections = 1,
+                       keepalive_timeout = 0.4) as server :
+      web_server = server.web_server
+      counter = web_server.get_counter(("connection",), None, True, None)
+      rejected = web_server.get_counter(("connection", "rejected"), False)
+      reaped = web_server.get_counter(("connection", "idle_reaped"), False)
+      self.assertIsNone(counter.max_age)
+
+      # The second connection is over the limit and is closed at once
+      first = socket.create_connection(("127.0.0.1", server.port), 3.0)
+      self.assertTrue(self.wait_for(lambda : counter.in_flight == 1))
+      with socket.create_connection(
+          ("127.0.0.1", server.port), 3.0) as second :
+        self.assertEqual(second.recv(1), b"")
+
+      self.assertEqual(rejected.counter, 1)
+      self.assertEqual(counter.in_flight, 1)
+
+      # The idle connection is closed after keep-alive timeout
+      with first :
+        self.assertEqual(first.recv(1), b"")
+
+      self.assertTrue(self.wait_for(lambda : counter.in_flight == 0))
+      self.assertEqual(reaped.counter, 1)
+      self.assertEqual(counter.counter, 1)
+
+#
+# Class StartStopTest
+#
+class StartStopTest (unittest.TestCase) :
+  def test_startup_and_shutdown_time(self) :
+    error = run_web_server("127.0.0.1", 0, None)
+    web_server = WebServer.web_server()
+    if err_failure(error) :
+      stop_web_server()
+
+    self.assertTrue(err_success(error))
+    self.assertLess(web_server.startup_time, 0.5)
+
+    # Stopping doesn't wait for a polling interval of the event loop
+    time.sleep(0.3)
+    begin_time = time.monotonic()
+    stop_web_server()
+    stop_time = time.monotonic() - begin_time
+    self.assertIsNone(WebServer.web_server())
+    self.assertLess(stop_time, 0.2)
+    self.assertLessEqual(web_server.shutdown_time, stop_time)
+
+if __name__ == "__main__" :
+  unittest.main()
@@ -0,0 +1,127 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Tests of WebServerSupervisor worker processes
+
+  Run: ``python -m unittest python_utilities.tests.test_web_server_supervisor``
+"""
+
+import os
+import select
+import signal
+import threading
+import time
+import unittest
+
+from ..base.errors import *
+from ..base.log import *
+from ..net.web_server_supervisor import *
+
+#
+# Class _WebServerSupervisor
+#
+class _WebServerSupervisor (WebServerSupervisor) :
+  """ Supervisor records threads which have forked workers """
+  def __init__(self, *args, **kwargs) :
+    WebServerSupervisor.__init__(self, *args, **kwargs)
+    self.forking_threads = list()
+
+  def _start_worker(self, worker_index) :
+    self.forking_threads.append(threading.current_thread())
+    return WebServerSupervisor._start_worker(self, worker_index)
+
+#
+# Class WebServerSupervisorTest
+#
+class WebServerSupervisorTest (unittest.TestCase) :
+  def setUp(self) :
+    self.read_fd, self.write_fd = os.pipe()
+    self.supervisor = None
+
+  def tearDown(self) :
+    if self.supervisor is not None :
+      self.supervisor.stop()
+
+    os.close(self.read_fd)
+    os.close(self.write_fd)
+
+  def read_lines(self, count, timeout = 5.0) :
+    """ Read lines written by workers, the main thread handles signals """
+    data = b""
+    deadline = time.monotonic() + timeout
+    while data.count(b"\n") < count and time.monotonic() < deadline :
+      ready, _, _ = select.select([ self.read_fd ], [], [], 0.05)
+      if len(ready) > 0 :
+        data += os.read(self.read_fd, 4096)
+
+    return data.decode().splitlines()
+
+  def test_restart_delay(self) :
+    def worker_fun(worker_index) :
+      os.write(self.write_fd, "{}\n".format(time.monotonic()).encode())
+      return 0
+
+    self.supervisor = _WebServerSupervisor(
+        1, worker_fun, stop_timeout = 1.0, restart_delay = 0.3)
+    self.assertTrue(err_success(self.supervisor.start()))
+    started_at = [ float(line) for line in self.read_lines(3) ]
+    self.assertEqual(len(started_at), 3)
+    for i in range(1, len(started_at)) :
+      self.assertGreaterEqual(started_at[i] - started_at[i - 1], 0.25)
+
+    self.assertGreaterEqual(self.supervisor.restart_counter, 2)
+    self.assertTrue(all(
+        thread is threading.main_thread()
+        for thread in self.supervisor.forking_threads))
+
+  def test_fork_by_sigchld_handler(self) :
+    counter = ActivityCounter.add(("test_supervisor",))
+    self.addCleanup(ActivityCounter.pop_counter, ("test_supervisor",))
+
+    def worker_fun(worker_index) :
+      # Locks held by other threads of the parent are free in the worker
+      log_print_inf("Worker {} is running", worker_index)
+      counter.start("worker")
+      counter.stop("worker")
+      os.write(self.write_fd, "{}\n".format(worker_index).encode())
+      time.sleep(30)
+      return 0
+
+    self.supervisor = _WebServerSupervisor(
+        2, worker_fun, stop_timeout = 1.0, restart_delay = 0.0)
+    self.assertTrue(err_success(self.supervisor.start()))
+    self.assertEqual(sorted(self.read_lines(2)), [ "0", "1" ])
+
+    # A thread holds the lock of counter while the worker is restarted
+    lock = counter._ActivityCounter__items_lock
+    lock.acquire()
+    try :
+      pid = self.supervisor.pids[0]
+      os.kill(pid, signal.SIGKILL)
+      lines = self.read_lines(1)
+    finally :
+      lock.release()
+
+    self.assertEqual(len(lines), 1)
+    self.assertEqual(self.supervisor.restart_counter, 1)
+    self.assertEqual(len(self.supervisor.pids), 2)
+    self.assertNotIn(pid, self.supervisor.pids)
+    self.assertEqual(len(self.supervisor.forking_threads), 3)
+    self.assertTrue(all(
+        thread is threading.main_thread()
+        for thread in self.supervisor.forking_threads))
+
+  def test_start_by_other_thread(self) :
+    supervisor = WebServerSupervisor(1, lambda worker_index : 0)
+    results = list()
+    thread = threading.Thread(
+        target = lambda : results.append(supervisor.start()))
+    thread.start()
+    thread.join()
+    self.assertTrue(err_failure(results[0]))
+    self.assertEqual(supervisor.pids, [])
+
+if __name__ == "__main__" :
+  unittest.main()
@@ -0,0 +1,69 @@
+# Copyright 2017-2020 Denis Gushchin. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+  Web-server running in tests
+"""
+
+from ..base.errors import *
+from ..net.session_factory import *
+from ..net.web_server import *
+
+# Export
+__all__ = ('TestWebServer',)
+
+#
+# Class TestWebServer
+#
+class TestWebServer :
+  """
+    Web-server on a free port of localhost, it's started and stopped by
+    ``with``:
+
+    .. code-block:: python
+
+      with TestWebServer(router.session_factory) as web_server :
+        url = web_server.url("/api")
+  """
+  def __init__(self, session_factory, **web_server_args) :
+    self._session_factory = session_factory
+    self._web_server_args = web_server_args
+    self._web_server = None
+
+  def __enter__(self) :
+    set_session_factory(self._session_factory)
+    self._web_server = WebServer("127.0.0.1", 0, **self._web_server_args)
+    self._web_server.init_activity_counters()
+    error = self._web_server.start()
+    if err_failure(error) :
+      self._web_server.stop()
+      raise RuntimeError(str(error))
+
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback) :
+    self.stop()
+    set_session_factory(None)
+
+  def stop(self) :
+    """ Stop web-server """
+    if self._web_server is not None and self._web_server.is_alive() :
+      self._web_server.stop()
+
+    if self._web_server is not None :
+      self._web_server.deinit_activity_counters()
+
+  @property
+  def port(self) :
+    """ Port of web-server """
+    return self._web_server.sockets[0].getsockname()[1]
+
+  @property
+  def web_server(self) :
+    """ WebServer """
+    return self._web_server
+
+  def url(self, path) :
+    """ Url of the path """
+    return "http://127.0.0.1:{}{}".format(self.port, path)